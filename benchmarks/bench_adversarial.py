@@ -0,0 +1,101 @@
+"""
+Benchmark adversarial de los patrones del filtrado local (URLs, <script>,
+javascript: y símbolos intercalados) con cadenas de peor caso de MAX_LENGTH
+caracteres, frente a los patrones anteriores.
+
+Además de medir, comprueba que el coste crece de forma lineal: cada caso se
+repite con una cadena 4 veces más larga y, si el tiempo crece más de
+--max-crecimiento veces, el script termina con código 1. Así una regresión a
+un patrón con retroceso se detecta aunque la máquina sea más rápida o lenta.
+
+Uso:
+    python benchmarks/bench_adversarial.py [--repeticiones N] [--max-crecimiento F]
+"""
+import os
+import re
+import sys
+import argparse
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from moderation.engine import MAX_LENGTH, RE_SYMBOLS, contains_unsafe_content  # noqa: E402
+
+# Patrones anteriores, para comparar
+LEGACY_SYMBOLS = re.compile(r"[a-zA-ZáéíóúüñÁÉÍÓÚÜÑ](?:[^a-zA-ZáéíóúüñÁÉÍÓÚÜÑ0-9\s]){1,}[a-zA-ZáéíóúüñÁÉÍÓÚÜÑ]")
+LEGACY_SCRIPT_TAG = re.compile(r"<\s*script\b", re.IGNORECASE)
+LEGACY_JS_SCHEME = re.compile(r"javascript:\s*", re.IGNORECASE)
+LEGACY_URL = re.compile(
+    r"https?://[\w\-]+(?:\.[\w\-]+)+[/#?]?.*|www\.[\w\-]+(?:\.[\w\-]+)+[/#?]?.*",
+    re.IGNORECASE
+)
+
+
+def legacy_check(text: str) -> tuple:
+    return (
+        LEGACY_SYMBOLS.search(text) is not None,
+        bool(LEGACY_SCRIPT_TAG.search(text) or LEGACY_JS_SCHEME.search(text) or LEGACY_URL.search(text)),
+    )
+
+
+def new_check(text: str) -> tuple:
+    return RE_SYMBOLS.search(text) is not None, contains_unsafe_content(text)
+
+
+def _fill(unit: str, length: int, prefix: str = '') -> str:
+    body = unit * ((length - len(prefix)) // len(unit) + 1)
+    return (prefix + body)[:length]
+
+
+# Nombre -> generador de la cadena para una longitud dada
+CASES = {
+    'benigna': lambda n: _fill('¿Cuántos metros cuadrados tiene el salón de actos? ', n),
+    'url_sin_punto': lambda n: _fill('a', n, 'http://'),
+    'url_prefijos': lambda n: _fill('http://a', n),
+    'url_www_repetido': lambda n: _fill('www.', n),
+    'url_dominio_largo': lambda n: _fill('a.', n, 'www.') + '-',
+    'script_espacios': lambda n: _fill(' ', n, '<'),
+    'script_muchos': lambda n: _fill('< ', n),
+    'menor_que': lambda n: _fill('<', n),
+    'simbolos_sin_cierre': lambda n: _fill('!', n, 'a'),
+    'simbolos_alternos': lambda n: _fill('a!', n),
+    'js_incompleto': lambda n: _fill('javascrip', n),
+}
+
+
+def per_call_us(check, text: str, number: int) -> float:
+    return timeit.timeit(lambda: check(text), number=number) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeticiones', type=int, default=500)
+    parser.add_argument('--max-crecimiento', type=float, default=8.0,
+                        help="crecimiento máximo admitido al multiplicar la longitud por 4")
+    args = parser.parse_args()
+
+    failures = []
+    print(f"{'caso':>20} {'anterior (µs)':>14} {'nuevo (µs)':>11} {'x4 long.':>9}")
+    for name, build in CASES.items():
+        text = build(MAX_LENGTH)
+        long_text = build(MAX_LENGTH * 4)
+        if legacy_check(text) != new_check(text):
+            failures.append(f"{name}: resultado distinto al de los patrones anteriores")
+
+        legacy = per_call_us(legacy_check, text, args.repeticiones)
+        new = per_call_us(new_check, text, args.repeticiones)
+        # Suelo de 1µs para que el ruido en cadenas triviales no cuente como crecimiento
+        growth = per_call_us(new_check, long_text, args.repeticiones) / max(new, 1.0)
+        print(f"{name:>20} {legacy:>14.1f} {new:>11.1f} {growth:>8.1f}x")
+        if growth > args.max_crecimiento:
+            failures.append(f"{name}: crece {growth:.1f}x con 4 veces más texto")
+
+    if failures:
+        print("\nREGRESIÓN:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
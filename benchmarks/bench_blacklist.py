@@ -0,0 +1,85 @@
+"""
+Compara el buscador de BLACKLIST compilado (blacklist.BlacklistMatcher) con
+la implementación anterior (normalizar otra vez, tokenizar y mirar cada token
+en un set) para listas de 10 a 10.000 términos.
+
+Uso:
+    python benchmarks/bench_blacklist.py [--repeticiones N]
+"""
+import os
+import re
+import sys
+import random
+import argparse
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from moderation.blacklist import BlacklistMatcher, LEET_MAP  # noqa: E402
+from moderation.engine import BLACKLIST  # noqa: E402
+from moderation.normalization import normalize_text, _legacy_normalize  # noqa: E402
+
+PREGUNTAS = [
+    '¿Cuántos metros cuadrados tiene el salón de actos?',
+    '¿Se puede alquilar la sala de conferencias para una boda?',
+    '¿Qué horario tiene el museo los domingos por la tarde?',
+    'Hola, ¿hay aparcamiento cerca del muelle de cruceros?',
+    '¿Cuántas personas caben en el auditorio con formato teatro?',
+    'Eres un p0rn0 de mierda',
+    '¿El catering lo pone el museo o podemos traer el nuestro?',
+    'Me encanta la exposición del planetario, ¿cuándo abre la nueva?',
+]
+
+SILABAS = ['ca', 'me', 'ti', 'lo', 'ru', 'sa', 'pe', 'ni', 'go', 'tra', 'bla', 'chi', 'rro', 'ña', 'que']
+
+
+def legacy_contains_blacklisted_word(text: str, blacklist: set) -> bool:
+    """Implementación anterior de contains_blacklisted_word."""
+    norm = _legacy_normalize(text)
+    deleet = norm.translate(LEET_MAP)
+    tokens = re.findall(r"\b\w+\b", deleet)
+    return any(token in blacklist for token in tokens)
+
+
+def synthetic_blacklist(size: int, seed: int = 7) -> set:
+    """BLACKLIST real ampliada con términos sintéticos (un 10% de varias palabras)."""
+    rng = random.Random(seed)
+    terms = set(BLACKLIST)
+    while len(terms) < size:
+        word = ''.join(rng.choice(SILABAS) for _ in range(rng.randint(2, 4)))
+        if rng.random() < 0.1:
+            word += ' ' + ''.join(rng.choice(SILABAS) for _ in range(rng.randint(2, 3)))
+        terms.add(word)
+    return terms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeticiones', type=int, default=2000)
+    args = parser.parse_args()
+
+    normalizadas = [normalize_text(p) for p in PREGUNTAS]
+    n = args.repeticiones
+
+    print(f"{'términos':>9} {'compilar (ms)':>14} {'anterior (µs)':>14} {'compilado (µs)':>15} {'mejora':>7}")
+    for size in (10, 100, 1000, 10000):
+        terms = synthetic_blacklist(size)
+
+        start = timeit.default_timer()
+        matcher = BlacklistMatcher(terms, normalize_text)
+        build_ms = (timeit.default_timer() - start) * 1000
+
+        # Como en is_clean: el texto ya llega normalizado a la comprobación
+        legacy = timeit.timeit(
+            lambda: [legacy_contains_blacklisted_word(t, terms) for t in normalizadas], number=n)
+        compiled = timeit.timeit(
+            lambda: [matcher.find(t) for t in normalizadas], number=n)
+
+        per_legacy = legacy / (n * len(normalizadas)) * 1e6
+        per_compiled = compiled / (n * len(normalizadas)) * 1e6
+        print(f"{size:>9} {build_ms:>14.1f} {per_legacy:>14.2f} {per_compiled:>15.2f} "
+              f"{per_legacy / per_compiled:>6.1f}x")
+
+
+if __name__ == '__main__':
+    main()
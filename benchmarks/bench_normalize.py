@@ -0,0 +1,57 @@
+"""
+Microbenchmark de normalize_text: implementación en una pasada
+(normalization.normalize_text) frente a la de cuatro pasadas anterior, sobre
+preguntas en español realistas (con y sin acentos, mayúsculas y emojis).
+
+Uso:
+    python benchmarks/bench_normalize.py [--repeticiones N]
+"""
+import os
+import sys
+import argparse
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from moderation.normalization import normalize_text, _legacy_normalize  # noqa: E402
+
+CORPUS = {
+    'ascii': [
+        'Cuantos metros cuadrados tiene el salon de actos',
+        'Se puede alquilar la sala de conferencias para una boda?',
+        'Que horario tiene el museo los domingos por la tarde',
+        'Hay aparcamiento cerca del muelle de cruceros?',
+    ],
+    'acentos': [
+        '¿Cuántos metros cuadrados tiene el salón de actos?',
+        '¿Se puede alquilar la sala de conferencias para una boda?',
+        '¿Qué horario tiene el museo los domingos por la tarde?',
+        'Hola, ¿hay aparcamiento cerca del muelle de cruceros? Gracias, Begoña',
+    ],
+    'mixto': [
+        '¡¡HOLA!! ¿Cuántas PERSONAS caben en el auditorio? 🎉🎉',
+        'Me encanta la exposición 😍 ¿cuándo abre la nueva sala de ciencia?',
+        'ｐｏｒｎｏ y otras cosas raras​ con espacios duros',
+        '¿El catering lo pone el museo o podemos traer el nuestro? Muchas gracias ✨',
+    ],
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeticiones', type=int, default=20000)
+    args = parser.parse_args()
+    n = args.repeticiones
+
+    print(f"{'corpus':>8} {'anterior (µs)':>14} {'una pasada (µs)':>16} {'mejora':>7}")
+    for name, texts in CORPUS.items():
+        assert [normalize_text(t) for t in texts] == [_legacy_normalize(t) for t in texts]
+        legacy = timeit.timeit(lambda: [_legacy_normalize(t) for t in texts], number=n)
+        fused = timeit.timeit(lambda: [normalize_text(t) for t in texts], number=n)
+        per_legacy = legacy / (n * len(texts)) * 1e6
+        per_fused = fused / (n * len(texts)) * 1e6
+        print(f"{name:>8} {per_legacy:>14.2f} {per_fused:>16.2f} {per_legacy / per_fused:>6.1f}x")
+
+
+if __name__ == '__main__':
+    main()
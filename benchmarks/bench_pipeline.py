@@ -0,0 +1,258 @@
+"""
+Benchmark de extremo a extremo de los pipelines de moderación
+(moderation.process_pending_questions) y de respuesta (ollama_response.main)
+sin Firestore, Perspective ni Ollama reales: usa los sustitutos locales de
+benchmarks/fakes.py, con latencias y errores configurables.
+
+Para cada tamaño se cargan N preguntas pendientes en el Firestore en memoria,
+se moderan y después se responden las aprobadas (incluida la entrega por
+SFTP a un servidor SSH local). Se mide el rendimiento de cada pipeline y la
+latencia p50/p95/p99 de cada etapa:
+
+    moderación: normalize_text, is_clean, scoring (Perspective, con cuota y
+                reintentos), write_back (cada commit de veredictos)
+    respuesta:  read (lectura de aprobadas), generation (cada pregunta a
+                Ollama), write_back (cada lote de respuestas), delivery
+
+Los resultados se guardan en JSON (por defecto benchmarks/results/
+pipeline-<commit>.json) para comparar entre commits.
+
+Uso:
+    python benchmarks/bench_pipeline.py [--tamanos 10 100 1000] [--salida FICHERO]
+        [--perspective-latencia S] [--perspective-429 P] [--perspective-qps Q]
+        [--firestore-latencia S] [--ollama-token-latencia S]
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import platform
+import tempfile
+import warnings
+import threading
+import contextlib
+import subprocess
+from datetime import datetime, timezone
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+
+# Los módulos usan where() con argumentos posicionales; el aviso no aporta aquí
+warnings.filterwarnings('ignore', message='Detected filter using positional arguments')
+
+from fakes import (  # noqa: E402
+    FakeFirestore, OllamaStub, PerspectiveStub, SSHStub,
+    configure_environment, generate_questions, local_delivery,
+)
+
+ETAPAS = {
+    'moderation': ['normalize_text', 'is_clean', 'scoring', 'write_back'],
+    'response': ['read', 'generation', 'write_back', 'delivery'],
+}
+
+
+def percentil(ordenados, p):
+    """Percentil p (0-100) por rango más cercano de una lista ya ordenada."""
+    if not ordenados:
+        return None
+    indice = max(0, min(len(ordenados) - 1, int(round(p / 100 * len(ordenados))) - 1))
+    return ordenados[indice]
+
+
+def resumen(duraciones):
+    ordenados = sorted(duraciones)
+    total = sum(ordenados)
+    return {
+        'count': len(ordenados),
+        'total_s': total,
+        'mean_ms': total / len(ordenados) * 1000 if ordenados else None,
+        'p50_ms': percentil(ordenados, 50) * 1000 if ordenados else None,
+        'p95_ms': percentil(ordenados, 95) * 1000 if ordenados else None,
+        'p99_ms': percentil(ordenados, 99) * 1000 if ordenados else None,
+    }
+
+
+class Medidor:
+    """
+    Sustituye funciones de los módulos por envoltorios que anotan la duración
+    de cada llamada en su etapa. restaurar() deja los originales.
+    """
+
+    def __init__(self):
+        self.duraciones = {}
+        self._originales = []
+        self._lock = threading.Lock()
+
+    def medir(self, objeto, atributo, etapa):
+        original = getattr(objeto, atributo)
+        duraciones = self.duraciones.setdefault(etapa, [])
+
+        def envoltorio(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                duracion = time.perf_counter() - inicio
+                with self._lock:
+                    duraciones.append(duracion)
+
+        self._originales.append((objeto, atributo, original))
+        setattr(objeto, atributo, envoltorio)
+
+    def restaurar(self):
+        for objeto, atributo, original in reversed(self._originales):
+            setattr(objeto, atributo, original)
+        self._originales.clear()
+
+
+def commit_actual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'desconocido'
+
+
+def ejecutar_tamano(n, args, servicios, modulos):
+    moderation, engine, ollama_response, traspaso = modulos
+    perspective, ollama, ssh = servicios
+
+    fake = FakeFirestore(read_latency=args.firestore_latencia, write_latency=args.firestore_latencia)
+    for i, pregunta in enumerate(generate_questions(n, seed=n)):
+        fake.add('questions', f"q{i:06d}", {
+            'name': pregunta['name'], 'question': pregunta['question'], 'status': 'pending',
+            'timestamp': datetime.now(timezone.utc), 'device_id': f"bench-{i % 97}",
+        })
+    moderation.db = fake.client
+    moderation._verdict_cache = None
+    ollama_response.db = fake.client
+
+    resultado = {'questions': n, 'pipelines': {}}
+
+    # --- Moderación ---
+    medidor = Medidor()
+    medidor.medir(engine, 'normalize_text', 'normalize_text')
+    medidor.medir(engine, 'is_clean', 'is_clean')
+    medidor.medir(moderation, 'score_toxicity', 'scoring')
+    medidor.medir(moderation.VerdictWriter, '_commit', 'write_back')
+    peticiones = perspective.requests
+    inicio = time.perf_counter()
+    try:
+        with open(os.devnull, 'w') as nulo, contextlib.redirect_stdout(nulo):
+            total, aprobadas, rechazadas = moderation.process_pending_questions()
+    finally:
+        medidor.restaurar()
+    segundos = time.perf_counter() - inicio
+    resultado['pipelines']['moderation'] = {
+        'seconds': segundos,
+        'throughput_qps': total / segundos if segundos else None,
+        'approved': aprobadas,
+        'rejected': rechazadas,
+        'perspective_requests': perspective.requests - peticiones,
+        'stages': {etapa: resumen(medidor.duraciones.get(etapa, [])) for etapa in ETAPAS['moderation']},
+    }
+
+    # --- Respuesta ---
+    medidor = Medidor()
+    peticiones = ollama.requests
+    with local_delivery(traspaso, ssh):
+        medidor.medir(ollama_response, 'obtener_preguntas_aprobadas', 'read')
+        medidor.medir(ollama_response, 'answer_with_retry', 'generation')
+        medidor.medir(ollama_response.BatchWriter, '_commit', 'write_back')
+        medidor.medir(traspaso, 'send_and_run', 'delivery')
+        inicio = time.perf_counter()
+        try:
+            with open(os.devnull, 'w') as nulo, contextlib.redirect_stdout(nulo):
+                estadisticas = ollama_response.main(incremental=True)
+        finally:
+            medidor.restaurar()
+    segundos = time.perf_counter() - inicio
+    resultado['pipelines']['response'] = {
+        'seconds': segundos,
+        'throughput_qps': estadisticas['total'] / segundos if segundos else None,
+        **estadisticas,
+        'ollama_requests': ollama.requests - peticiones,
+        'stages': {etapa: resumen(medidor.duraciones.get(etapa, [])) for etapa in ETAPAS['response']},
+    }
+    resultado['firestore'] = {'reads': fake.reads, 'writes': fake.writes}
+    return resultado
+
+
+def imprimir(resultado):
+    print(f"\n=== {resultado['questions']} preguntas ===")
+    for pipeline, datos in resultado['pipelines'].items():
+        print(f"{pipeline}: {datos['seconds']:.2f}s ({datos['throughput_qps']:.1f} preguntas/s)")
+        print(f"  {'etapa':<16}{'n':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+        for etapa, r in datos['stages'].items():
+            if r['count']:
+                print(f"  {etapa:<16}{r['count']:>7}{r['p50_ms']:>10.3f}{r['p95_ms']:>10.3f}{r['p99_ms']:>10.3f}")
+            else:
+                print(f"  {etapa:<16}{0:>7}{'-':>10}{'-':>10}{'-':>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tamanos', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--salida', help="fichero JSON de resultados")
+    parser.add_argument('--perspective-latencia', type=float, default=0.02)
+    parser.add_argument('--perspective-429', type=float, default=0.02,
+                        help="proporción de peticiones a Perspective que responden 429")
+    parser.add_argument('--perspective-qps', type=float, default=500.0,
+                        help="cuota de Perspective (PERSPECTIVE_QPS) durante el benchmark")
+    parser.add_argument('--firestore-latencia', type=float, default=0.005)
+    parser.add_argument('--ollama-prompt-latencia', type=float, default=0.01)
+    parser.add_argument('--ollama-token-latencia', type=float, default=0.001)
+    args = parser.parse_args()
+
+    trabajo = tempfile.mkdtemp(prefix='bench_pipeline_')
+    directorio_inicial = os.getcwd()
+    perspective = PerspectiveStub(latency=args.perspective_latencia, error_rate=args.perspective_429)
+    ollama = OllamaStub(prompt_latency=args.ollama_prompt_latencia, token_latency=args.ollama_token_latencia)
+    ssh = SSHStub(os.path.join(trabajo, 'remoto'))
+    try:
+        configure_environment(trabajo, perspective, ollama, args.perspective_qps)
+        # Veredictos a Firestore como mucho cada medio segundo
+        os.environ['FIRESTORE_FLUSH_INTERVAL'] = '0.5'
+        # ollama_response trabaja con rutas relativas (response/...)
+        os.chdir(trabajo)
+
+        from moderation import engine, moderation
+        from response import ollama_response, traspaso
+        logging.getLogger().setLevel(logging.WARNING)
+        modulos = (moderation, engine, ollama_response, traspaso)
+
+        resultados = []
+        for n in args.tamanos:
+            resultado = ejecutar_tamano(n, args, (perspective, ollama, ssh), modulos)
+            imprimir(resultado)
+            resultados.append(resultado)
+    finally:
+        os.chdir(directorio_inicial)
+        perspective.close()
+        ollama.close()
+        ssh.close()
+        shutil.rmtree(trabajo, ignore_errors=True)
+
+    commit = commit_actual()
+    salida = args.salida or os.path.join(BENCH_DIR, 'results', f"pipeline-{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+    with open(salida, 'w', encoding='utf-8') as f:
+        json.dump({
+            'meta': {
+                'commit': commit,
+                'date': datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'config': vars(args),
+            },
+            'results': resultados,
+        }, f, indent=2, ensure_ascii=False)
+    print(f"\nResultados guardados en {salida}")
+
+
+if __name__ == '__main__':
+    main()
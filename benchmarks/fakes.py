@@ -0,0 +1,774 @@
+"""
+Sustitutos en proceso de los servicios externos, para medir los pipelines sin
+red ni credenciales:
+
+- FakeFirestore: cliente real de google-cloud-firestore cuya API gRPC se
+  sustituye por un almacén en memoria (run_query, commit y batch_write). Las
+  consultas, lotes y conversiones a protobuf son las de la librería; solo la
+  red se simula, con una latencia configurable por llamada. on_snapshot de
+  las consultas también funciona, sin el stream gRPC de Listen.
+- PerspectiveStub: servidor HTTP local que imita comments:analyze, con
+  latencia y proporción de 429 configurables, y su documento de
+  descubrimiento mínimo (para PERSPECTIVE_DISCOVERY_CACHE).
+- OllamaStub: servidor HTTP local que emite /api/chat en NDJSON, token a
+  token, con los campos de estadísticas de Ollama.
+- SSHStub: servidor SSH/SFTP local (paramiko) que acepta cualquier clave,
+  guarda los ficheros en una carpeta y responde a los comandos.
+
+generate_questions produce preguntas realistas con la mezcla pedida de
+limpias, tóxicas, spam, URLs y duplicadas; configure_environment y
+local_delivery hacen que los módulos del repositorio usen los sustitutos.
+"""
+import os
+import json
+import shutil
+import time
+import random
+import socket
+import hashlib
+import threading
+import contextlib
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import paramiko
+from google.api_core.exceptions import NotFound
+from google.auth.credentials import AnonymousCredentials
+from google.cloud import firestore
+from google.cloud.firestore_v1 import _helpers
+from google.cloud.firestore_v1.collection import CollectionReference
+from google.cloud.firestore_v1.document import DocumentSnapshot
+from google.cloud.firestore_v1.query import Query
+from google.cloud.firestore_v1.watch import ChangeType, DocumentChange
+from google.cloud.firestore_v1.types import document as document_types
+from google.cloud.firestore_v1.types import firestore as firestore_types
+from google.cloud.firestore_v1.types import write as write_types
+from google.rpc import status_pb2
+
+# --- Firestore ---
+
+# Operadores de FieldFilter (google.firestore.v1.StructuredQuery.FieldFilter.Operator)
+_OPERADORES = {
+    1: lambda a, b: a < b,
+    2: lambda a, b: a <= b,
+    3: lambda a, b: a > b,
+    4: lambda a, b: a >= b,
+    5: lambda a, b: a == b,
+    6: lambda a, b: a != b,
+    7: lambda a, b: isinstance(a, list) and b in a,
+    8: lambda a, b: a in b,
+    9: lambda a, b: isinstance(a, list) and any(x in b for x in a),
+    10: lambda a, b: a not in b,
+}
+
+_FALTA = object()
+
+
+def _leer_campo(data, ruta):
+    for parte in ruta.split('.'):
+        if not isinstance(data, dict) or parte not in data:
+            return _FALTA
+        data = data[parte]
+    return data
+
+
+def _poner_campo(data, ruta, valor):
+    partes = ruta.split('.')
+    for parte in partes[:-1]:
+        data = data.setdefault(parte, {})
+    data[partes[-1]] = valor
+
+
+def _quitar_campo(data, ruta):
+    partes = ruta.split('.')
+    for parte in partes[:-1]:
+        data = data.get(parte)
+        if not isinstance(data, dict):
+            return
+    data.pop(partes[-1], None)
+
+
+class _FirestoreAPI:
+    """Implementación en memoria de las llamadas gRPC que usan los pipelines."""
+
+    def __init__(self, fake):
+        self._fake = fake
+
+    def run_query(self, request=None, metadata=None, **kwargs):
+        self._fake._esperar(self._fake.read_latency)
+        consulta = request['structured_query']._pb
+        documentos = self._fake._consultar(request['parent'], consulta)
+        ahora = datetime.now(timezone.utc)
+        self._fake.reads += len(documentos)
+        if not documentos:
+            return iter([firestore_types.RunQueryResponse(read_time=ahora)])
+        return iter([
+            firestore_types.RunQueryResponse(document=doc, read_time=ahora)
+            for doc in documentos
+        ])
+
+    def commit(self, request=None, metadata=None, **kwargs):
+        self._fake._esperar(self._fake.write_latency)
+        ahora = datetime.now(timezone.utc)
+        for escritura in request['writes']:
+            codigo = self._fake._aplicar(escritura._pb, ahora)
+            if codigo:
+                raise NotFound(f"No existe {escritura._pb.update.name or escritura._pb.delete}")
+        return firestore_types.CommitResponse(
+            write_results=[write_types.WriteResult(update_time=ahora) for _ in request['writes']],
+            commit_time=ahora,
+        )
+
+    def batch_write(self, request=None, metadata=None, **kwargs):
+        self._fake._esperar(self._fake.write_latency)
+        ahora = datetime.now(timezone.utc)
+        estados = []
+        for escritura in request['writes']:
+            if self._fake._rng.random() < self._fake.write_error_rate:
+                estados.append(status_pb2.Status(code=8, message='RESOURCE_EXHAUSTED (simulado)'))
+                continue
+            codigo = self._fake._aplicar(escritura._pb, ahora)
+            estados.append(status_pb2.Status(code=codigo))
+        return firestore_types.BatchWriteResponse(
+            write_results=[write_types.WriteResult(update_time=ahora) for _ in request['writes']],
+            status=estados,
+        )
+
+
+class _Escucha:
+    """
+    Equivalente de Watch para FakeFirestore: entrega los cambios de los
+    documentos que cumplen la consulta desde un hilo propio, agrupando los
+    que se hayan acumulado mientras el callback estaba ocupado.
+    """
+
+    def __init__(self, fake, query, callback):
+        self._fake = fake
+        self._query = query
+        self._callback = callback
+        consulta = query._to_protobuf()._pb
+        self._coleccion = consulta.from_[0].collection_id
+        self._filtro = consulta.where if consulta.HasField('where') else None
+        self._actuales = {}
+        self._cambios = []
+        self._hay_cambios = threading.Condition()
+        self._activa = True
+        with fake._lock:
+            for doc_id in list(fake.docs.get(self._coleccion, {})):
+                self._registrar(doc_id)
+        threading.Thread(target=self._entregar, name='fake-on-snapshot', daemon=True).start()
+
+    def _registrar(self, doc_id):
+        data = self._fake.docs.get(self._coleccion, {}).get(doc_id)
+        cumple = data is not None and (self._filtro is None or self._fake._cumple(self._filtro, data))
+        if cumple:
+            tipo = ChangeType.MODIFIED if doc_id in self._actuales else ChangeType.ADDED
+            snapshot = DocumentSnapshot(
+                self._query._parent.document(doc_id), dict(data), exists=True,
+                read_time=datetime.now(timezone.utc), create_time=None, update_time=None,
+            )
+            self._actuales[doc_id] = snapshot
+        elif doc_id in self._actuales:
+            tipo, snapshot = ChangeType.REMOVED, self._actuales.pop(doc_id)
+        else:
+            return
+        with self._hay_cambios:
+            self._cambios.append(DocumentChange(tipo, snapshot, -1, -1))
+            self._hay_cambios.notify()
+
+    def cambio(self, coleccion, doc_id):
+        if self._activa and coleccion == self._coleccion:
+            with self._fake._lock:
+                self._registrar(doc_id)
+
+    def _entregar(self):
+        while True:
+            with self._hay_cambios:
+                while self._activa and not self._cambios:
+                    self._hay_cambios.wait()
+                if not self._activa:
+                    return
+                cambios, self._cambios = self._cambios, []
+            with self._fake._lock:
+                documentos = list(self._actuales.values())
+            self._callback(documentos, cambios, datetime.now(timezone.utc))
+
+    def unsubscribe(self):
+        self._activa = False
+        self._fake._oyentes.remove(self.cambio)
+        with self._hay_cambios:
+            self._hay_cambios.notify()
+
+
+class _FakeQuery(Query):
+    def on_snapshot(self, callback):
+        return self._client._fake_store.escuchar(self, callback)
+
+
+class _FakeCollection(CollectionReference):
+    def _query(self):
+        return _FakeQuery(self)
+
+    def on_snapshot(self, callback):
+        return self._query().on_snapshot(callback)
+
+
+class _FakeClient(firestore.Client):
+    def collection(self, *collection_path):
+        return _FakeCollection(*super().collection(*collection_path)._path, client=self)
+
+
+class FakeFirestore:
+    """
+    Almacén en memoria con un cliente de Firestore real delante (`client`).
+    `docs` es {coleccion: {doc_id: dict}}. read_latency y write_latency son
+    los segundos que tarda cada llamada; write_error_rate es la proporción de
+    escrituras de batch_write que fallan con RESOURCE_EXHAUSTED.
+    """
+
+    def __init__(self, read_latency=0.0, write_latency=0.0, write_error_rate=0.0, seed=1):
+        self.read_latency = read_latency
+        self.write_latency = write_latency
+        self.write_error_rate = write_error_rate
+        self.docs = {}
+        self.reads = 0
+        self.writes = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.RLock()
+        self._oyentes = []
+        self.client = _FakeClient(project='bench', credentials=AnonymousCredentials())
+        self.client._firestore_api_internal = _FirestoreAPI(self)
+        self.client._fake_store = self
+        self._prefijo = f"{self.client._database_string}/documents/"
+
+    @staticmethod
+    def _esperar(segundos):
+        if segundos:
+            time.sleep(segundos)
+
+    def add(self, coleccion, doc_id, data):
+        """Crea o sustituye un documento (sin pasar por la API, sin latencia)."""
+        with self._lock:
+            self.docs.setdefault(coleccion, {})[doc_id] = dict(data)
+        self._notificar(coleccion, doc_id)
+
+    def subscribe(self, callback):
+        """callback(coleccion, doc_id) tras cada cambio de un documento."""
+        self._oyentes.append(callback)
+
+    def escuchar(self, query, callback):
+        """on_snapshot de una consulta: callback(documentos, cambios, read_time)."""
+        with self._lock:
+            escucha = _Escucha(self, query, callback)
+            self.subscribe(escucha.cambio)
+        return escucha
+
+    def _notificar(self, coleccion, doc_id):
+        for callback in list(self._oyentes):
+            callback(coleccion, doc_id)
+
+    # --- Consultas ---
+
+    def _consultar(self, parent, consulta):
+        coleccion = consulta.from_[0].collection_id
+        nombre_base = f"{parent}/{coleccion}/"
+        with self._lock:
+            candidatos = [
+                (nombre_base + doc_id, dict(data))
+                for doc_id, data in self.docs.get(coleccion, {}).items()
+                if not consulta.HasField('where') or self._cumple(consulta.where, data)
+            ]
+
+        orden = [(o.field.field_path, o.direction == 2) for o in consulta.order_by]
+        if not any(campo == '__name__' for campo, _ in orden):
+            orden.append(('__name__', orden[-1][1] if orden else False))
+
+        def valores(nombre, data):
+            return [nombre if campo == '__name__' else _leer_campo(data, campo) for campo, _ in orden]
+
+        # Los documentos sin algún campo del orden no salen en la consulta
+        filas = [(valores(n, d), n, d) for n, d in candidatos]
+        filas = [f for f in filas if _FALTA not in f[0]]
+        for i in reversed(range(len(orden))):
+            filas.sort(key=lambda f: f[0][i], reverse=orden[i][1])
+
+        if consulta.HasField('start_at'):
+            filas = [f for f in filas if self._tras_cursor(f[0], orden, consulta.start_at, inicio=True)]
+        if consulta.HasField('end_at'):
+            filas = [f for f in filas if self._tras_cursor(f[0], orden, consulta.end_at, inicio=False)]
+        if consulta.offset:
+            filas = filas[consulta.offset:]
+        if consulta.HasField('limit'):
+            filas = filas[:consulta.limit.value]
+
+        campos = None
+        if consulta.HasField('select'):
+            campos = [f.field_path for f in consulta.select.fields if f.field_path != '__name__']
+
+        resultado = []
+        for _, nombre, data in filas:
+            if campos is not None:
+                proyectado = {}
+                for campo in campos:
+                    valor = _leer_campo(data, campo)
+                    if valor is not _FALTA:
+                        _poner_campo(proyectado, campo, valor)
+                data = proyectado
+            resultado.append(document_types.Document(name=nombre, fields=_helpers.encode_dict(data)))
+        return resultado
+
+    def _valor(self, value_pb):
+        if value_pb.WhichOneof('value_type') == 'reference_value':
+            return value_pb.reference_value
+        return _helpers.decode_value(value_pb, self.client)
+
+    def _cumple(self, filtro, data):
+        tipo = filtro.WhichOneof('filter_type')
+        if tipo == 'composite_filter':
+            resultados = (self._cumple(f, data) for f in filtro.composite_filter.filters)
+            # Operator: AND = 1, OR = 2
+            return all(resultados) if filtro.composite_filter.op == 1 else any(resultados)
+        if tipo == 'unary_filter':
+            valor = _leer_campo(data, filtro.unary_filter.field.field_path)
+            op = filtro.unary_filter.op
+            # IS_NAN = 2, IS_NULL = 3, IS_NOT_NAN = 4, IS_NOT_NULL = 5
+            return {
+                2: valor != valor, 3: valor is None,
+                4: valor is not _FALTA and valor == valor, 5: valor not in (None, _FALTA),
+            }.get(op, False)
+        campo = filtro.field_filter
+        valor = _leer_campo(data, campo.field.field_path)
+        if valor is _FALTA:
+            return False
+        try:
+            return _OPERADORES[campo.op](valor, self._valor(campo.value))
+        except TypeError:
+            return False
+
+    def _tras_cursor(self, valores, orden, cursor, inicio):
+        limite = [self._valor(v) for v in cursor.values]
+        for (campo, descendente), valor, ref in zip(orden, valores, limite):
+            if valor == ref:
+                continue
+            despues = (valor < ref) if descendente else (valor > ref)
+            return despues if inicio else not despues
+        # Igual en todos los campos del cursor: before=True incluye el documento
+        return cursor.before if inicio else not cursor.before
+
+    # --- Escrituras ---
+
+    def _aplicar(self, escritura, ahora):
+        """Aplica un Write; devuelve 0 o el código gRPC del error."""
+        operacion = escritura.WhichOneof('operation')
+        nombre = escritura.update.name if operacion == 'update' else escritura.delete
+        coleccion, doc_id = nombre[len(self._prefijo):].rsplit('/', 1)
+        with self._lock:
+            documentos = self.docs.setdefault(coleccion, {})
+            existe = doc_id in documentos
+            if escritura.HasField('current_document'):
+                condicion = escritura.current_document
+                if condicion.HasField('exists') and condicion.exists != existe:
+                    return 5 if condicion.exists else 6  # NOT_FOUND / ALREADY_EXISTS
+            if operacion == 'delete':
+                documentos.pop(doc_id, None)
+            else:
+                campos = _helpers.decode_dict(escritura.update.fields, self.client)
+                if escritura.HasField('update_mask'):
+                    data = documentos.setdefault(doc_id, {})
+                    for ruta in escritura.update_mask.field_paths:
+                        valor = _leer_campo(campos, ruta)
+                        if valor is _FALTA:
+                            _quitar_campo(data, ruta)
+                        else:
+                            _poner_campo(data, ruta, valor)
+                else:
+                    data = documentos[doc_id] = campos
+                for transformacion in escritura.update_transforms:
+                    # Solo SERVER_TIMESTAMP, el único que usan los pipelines
+                    _poner_campo(data, transformacion.field_path, ahora)
+            self.writes += 1
+        self._notificar(coleccion, doc_id)
+        return 0
+
+
+# --- Servidores HTTP ---
+
+class _Servidor:
+    """Servidor HTTP local en un hilo; url es su dirección base."""
+
+    def __init__(self, handler):
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self._httpd.daemon_threads = True
+        self._httpd.stub = self
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self._httpd.server_port}"
+
+    def close(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _leer_json(self):
+        return json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+
+    def _responder(self, estado, cuerpo, cabeceras=()):
+        datos = json.dumps(cuerpo).encode('utf-8')
+        self.send_response(estado)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(datos)))
+        for nombre, valor in cabeceras:
+            self.send_header(nombre, valor)
+        self.end_headers()
+        self.wfile.write(datos)
+
+
+# Palabras que el stub de Perspective puntúa como tóxicas
+PALABRAS_TOXICAS = {'idiota', 'imbecil', 'imbécil', 'estupido', 'estúpido', 'inutil', 'inútil', 'basura'}
+
+
+class _PerspectiveHandler(_Handler):
+    def do_POST(self):
+        stub = self.server.stub
+        cuerpo = self._leer_json()
+        time.sleep(stub.latency)
+        with stub._lock:
+            stub.requests += 1
+            limitado = stub._rng.random() < stub.error_rate
+            if limitado:
+                stub.rejected += 1
+        if limitado:
+            self._responder(429, {'error': {'code': 429, 'message': 'Quota exceeded', 'status': 'RESOURCE_EXHAUSTED'}})
+            return
+        texto = cuerpo.get('comment', {}).get('text', '')
+        self._responder(200, {'attributeScores': {'TOXICITY': {
+            'summaryScore': {'value': stub.score(texto), 'type': 'PROBABILITY'},
+        }}})
+
+
+class PerspectiveStub(_Servidor):
+    """
+    Imita comments:analyze de Perspective. Cada petición tarda `latency`
+    segundos y una proporción `error_rate` responde 429. El score es
+    determinista: alto si el texto contiene alguna de PALABRAS_TOXICAS y
+    bajo (según un hash del texto) si no.
+    """
+
+    def __init__(self, latency=0.05, error_rate=0.0, seed=1):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.requests = 0
+        self.rejected = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        super().__init__(_PerspectiveHandler)
+
+    @staticmethod
+    def score(texto):
+        palabras = set(texto.lower().replace('¿', ' ').replace('?', ' ').split())
+        if palabras & PALABRAS_TOXICAS:
+            return 0.9
+        return int(hashlib.md5(texto.encode('utf-8')).hexdigest()[:4], 16) / 0xFFFF * 0.25
+
+    def discovery_document(self):
+        """Documento de descubrimiento mínimo que apunta a este servidor."""
+        raiz = f"{self.url}/"
+        return json.dumps({
+            'kind': 'discovery#restDescription', 'discoveryVersion': 'v1',
+            'id': 'commentanalyzer:v1alpha1', 'name': 'commentanalyzer', 'version': 'v1alpha1',
+            'rootUrl': raiz, 'servicePath': '', 'baseUrl': raiz, 'batchPath': 'batch',
+            'protocol': 'rest', 'parameters': {'key': {'type': 'string', 'location': 'query'}},
+            'schemas': {
+                'AnalyzeCommentRequest': {'id': 'AnalyzeCommentRequest', 'type': 'object'},
+                'AnalyzeCommentResponse': {'id': 'AnalyzeCommentResponse', 'type': 'object'},
+            },
+            'resources': {'comments': {'methods': {'analyze': {
+                'id': 'commentanalyzer.comments.analyze', 'path': 'v1alpha1/comments:analyze',
+                'flatPath': 'v1alpha1/comments:analyze', 'httpMethod': 'POST', 'parameters': {},
+                'parameterOrder': [], 'request': {'$ref': 'AnalyzeCommentRequest'},
+                'response': {'$ref': 'AnalyzeCommentResponse'},
+            }}}},
+        })
+
+    def write_discovery(self, path):
+        """Guarda el documento de descubrimiento en path y devuelve path."""
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.discovery_document())
+        return path
+
+
+class _OllamaHandler(_Handler):
+    def do_POST(self):
+        stub = self.server.stub
+        cuerpo = self._leer_json()
+        with stub._lock:
+            stub.requests += 1
+        prompt = ''.join(m.get('content', '') for m in cuerpo.get('messages', []))
+        prompt_tokens = max(1, len(prompt) // 4)
+        num_predict = cuerpo.get('options', {}).get('num_predict')
+        tokens = stub.tokens[:num_predict] if num_predict else stub.tokens
+        time.sleep(stub.prompt_latency)
+        estadisticas = {
+            'prompt_eval_count': prompt_tokens,
+            'prompt_eval_duration': int(stub.prompt_latency * 1e9),
+            'eval_count': len(tokens),
+            'eval_duration': int(len(tokens) * stub.token_latency * 1e9),
+        }
+
+        if not cuerpo.get('stream', True):
+            time.sleep(len(tokens) * stub.token_latency)
+            self._responder(200, {
+                'model': cuerpo.get('model'), 'done': True,
+                'message': {'role': 'assistant', 'content': ''.join(tokens)}, **estadisticas,
+            })
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        def enviar(objeto):
+            linea = (json.dumps(objeto) + '\n').encode('utf-8')
+            self.wfile.write(b'%x\r\n%s\r\n' % (len(linea), linea))
+
+        for token in tokens:
+            time.sleep(stub.token_latency)
+            enviar({'model': cuerpo.get('model'), 'message': {'role': 'assistant', 'content': token}, 'done': False})
+        enviar({'model': cuerpo.get('model'), 'message': {'role': 'assistant', 'content': ''},
+                'done': True, **estadisticas})
+        self.wfile.write(b'0\r\n\r\n')
+
+
+class OllamaStub(_Servidor):
+    """
+    Imita /api/chat de Ollama: espera prompt_latency segundos (evaluación del
+    prompt) y emite `tokens` uno a uno cada token_latency segundos, en NDJSON
+    si se pide stream y en una sola respuesta si no.
+    """
+
+    RESPUESTA = ('<think>', '</think>', 'Según', ' el', ' documento', ',', ' el', ' salón',
+                 ' de', ' actos', ' tiene', ' doscientos', ' metros', ' cuadrados', '.')
+
+    def __init__(self, prompt_latency=0.05, token_latency=0.005, tokens=RESPUESTA):
+        self.prompt_latency = prompt_latency
+        self.token_latency = token_latency
+        self.tokens = list(tokens)
+        self.requests = 0
+        self._lock = threading.Lock()
+        super().__init__(_OllamaHandler)
+
+
+# --- SSH/SFTP ---
+
+class _SFTPHandle(paramiko.SFTPHandle):
+    def stat(self):
+        return paramiko.SFTPAttributes.from_stat(os.fstat(self.readfile.fileno()))
+
+
+class _SFTPServidor(paramiko.SFTPServerInterface):
+    def __init__(self, server, *args, **kwargs):
+        super().__init__(server, *args, **kwargs)
+        self._raiz = server.raiz
+
+    def _ruta(self, ruta):
+        return os.path.join(self._raiz, ruta.lstrip('/').replace(':', ''))
+
+    def open(self, ruta, flags, attr):
+        ruta = self._ruta(ruta)
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        f = os.fdopen(os.open(ruta, flags, 0o644), 'wb' if flags & os.O_WRONLY else 'rb')
+        handle = _SFTPHandle(flags)
+        handle.readfile = handle.writefile = f
+        return handle
+
+    def remove(self, ruta):
+        os.remove(self._ruta(ruta))
+        return paramiko.SFTP_OK
+
+    def rename(self, origen, destino):
+        os.rename(self._ruta(origen), self._ruta(destino))
+        return paramiko.SFTP_OK
+
+    def posix_rename(self, origen, destino):
+        os.replace(self._ruta(origen), self._ruta(destino))
+        return paramiko.SFTP_OK
+
+    def stat(self, ruta):
+        # Como un servidor real: NO_SUCH_FILE (y no FAILURE) si no existe
+        try:
+            return paramiko.SFTPAttributes.from_stat(os.stat(self._ruta(ruta)))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+    lstat = stat
+
+
+class _SSHServidor(paramiko.ServerInterface):
+    def __init__(self, stub):
+        self.stub = stub
+        self.raiz = stub.root
+
+    def check_auth_password(self, usuario, clave):
+        return paramiko.AUTH_SUCCESSFUL
+
+    def get_allowed_auths(self, usuario):
+        return 'password'
+
+    def check_channel_request(self, tipo, canal_id):
+        return paramiko.OPEN_SUCCEEDED
+
+    def check_channel_exec_request(self, canal, comando):
+        self.stub.commands.append(comando.decode('utf-8'))
+
+        def ejecutar():
+            time.sleep(self.stub.command_latency)
+            canal.sendall(b'ok\n')
+            canal.send_exit_status(0)
+            canal.close()
+
+        threading.Thread(target=ejecutar, daemon=True).start()
+        return True
+
+
+class SSHStub:
+    """
+    Servidor SSH/SFTP local que acepta cualquier usuario y clave. Los ficheros
+    subidos se guardan bajo `root`; los comandos se anotan en `commands` y
+    terminan tras command_latency segundos.
+    """
+
+    def __init__(self, root, command_latency=0.01):
+        self.root = root
+        self.command_latency = command_latency
+        self.commands = []
+        self.connections = 0
+        self._clave = paramiko.RSAKey.generate(2048)
+        self._socket = socket.socket()
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind(('127.0.0.1', 0))
+        self._socket.listen(16)
+        self.port = self._socket.getsockname()[1]
+        threading.Thread(target=self._aceptar, daemon=True).start()
+
+    def _aceptar(self):
+        while True:
+            try:
+                conexion, _ = self._socket.accept()
+            except OSError:
+                return
+            self.connections += 1
+            transporte = paramiko.Transport(conexion)
+            transporte.add_server_key(self._clave)
+            transporte.set_subsystem_handler('sftp', paramiko.SFTPServer, _SFTPServidor)
+            servidor = _SSHServidor(self)
+            transporte.start_server(server=servidor)
+
+    def close(self):
+        self._socket.close()
+
+
+# --- Preguntas ---
+
+ESPACIOS = ['el salón de actos', 'el planetario', 'la sala de conferencias', 'el patio central',
+            'la terraza', 'el cine 3D', 'la sala de exposiciones', 'el vestíbulo']
+PLANTILLAS = [
+    '¿Cuántos metros cuadrados tiene {espacio}?',
+    '¿Cuántas personas caben en {espacio}?',
+    '¿Se puede alquilar {espacio} para una boda?',
+    '¿Qué equipamiento tiene {espacio}?',
+    '¿{espacio} tiene acceso para sillas de ruedas?',
+    '¿Se puede poner catering en {espacio}?',
+    '¿Qué horario tiene {espacio} los {dia}?',
+    '¿Quién ganó la liga de fútbol en {anio}?',
+]
+DIAS = ['lunes', 'martes', 'miércoles', 'jueves', 'viernes', 'sábados', 'domingos']
+NOMBRES = ['Ana', 'Luis', 'Carmen', 'Javier', 'Lucía', 'Pedro', 'Marta', 'Sergio', 'Elena', 'Raúl']
+
+# Basadas en los ejemplos de first_stage.py: las tóxicas pasan el filtro
+# local (no usan la BLACKLIST) y las decide Perspective; el spam y las URLs
+# las rechaza el filtro local
+TOXICAS = [
+    '¿Por qué el presentador es tan idiota?',
+    'Esta charla es una basura, ¿cuándo acaba?',
+    '¿Quién ha sido el inútil que ha organizado esto?',
+]
+SPAM = ['¡¡¡¡¡¡holaaaaaaa!!!!!!', 'Eres un p0t0 de mierda', 'OK', 'jajajajaja siiiiiii']
+URLS = [
+    'Visita http://malicioso.com <script>alert(1)</script>',
+    'Mira www.ofertas-gratis.com para ganar premios',
+    'javascript:alert(document.cookie)',
+]
+
+
+def generate_questions(n, duplicate_rate=0.1, toxic_share=0.05, spam_share=0.05, url_share=0.02, seed=7):
+    """
+    Devuelve n dicts {name, question, kind}. kind es clean, toxic, spam, url
+    o duplicate (texto repetido de una pregunta anterior, con otro nombre).
+    """
+    rng = random.Random(seed)
+    preguntas = []
+    for i in range(n):
+        nombre = f"{rng.choice(NOMBRES)} {i}"
+        tirada = rng.random()
+        if preguntas and tirada < duplicate_rate:
+            texto, tipo = rng.choice(preguntas)['question'], 'duplicate'
+        elif tirada < duplicate_rate + toxic_share:
+            texto, tipo = rng.choice(TOXICAS), 'toxic'
+        elif tirada < duplicate_rate + toxic_share + spam_share:
+            texto, tipo = rng.choice(SPAM), 'spam'
+        elif tirada < duplicate_rate + toxic_share + spam_share + url_share:
+            texto, tipo = rng.choice(URLS), 'url'
+        else:
+            texto = rng.choice(PLANTILLAS).format(
+                espacio=rng.choice(ESPACIOS), dia=rng.choice(DIAS), anio=rng.randint(1950, 2024))
+            texto = texto[0] + texto[1].upper() + texto[2:] if texto[0] == '¿' else texto
+            tipo = 'clean'
+        preguntas.append({'name': nombre, 'question': texto, 'kind': tipo})
+    return preguntas
+
+
+# --- Entorno ---
+
+def configure_environment(workdir, perspective, ollama, perspective_qps=None):
+    """
+    Prepara las variables que moderation y ollama_response leen al
+    importarse (llámese antes de importarlos): descubrimiento de Perspective
+    apuntando al stub, Ollama local y cachés e índice dentro de workdir, sin
+    tocar los del repositorio. Copia también response/document.txt a
+    workdir/response, porque ollama_response usa rutas relativas.
+    """
+    repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    os.environ['PERSPECTIVE_DISCOVERY_CACHE'] = perspective.write_discovery(
+        os.path.join(workdir, 'perspective_discovery.json'))
+    os.environ['OLLAMA_URL'] = ollama.url
+    if perspective_qps is not None:
+        os.environ['PERSPECTIVE_QPS'] = str(perspective_qps)
+    os.environ['VERDICT_CACHE_PATH'] = ''
+    os.environ['ANSWER_CACHE_PATH'] = ''
+    os.environ['TRASPASO_ESTADO_PATH'] = ''
+    os.environ['RAG_INDEX_DIR'] = os.path.join(workdir, 'index')
+    os.environ['RAG_CORPUS_DIR'] = os.path.join(workdir, 'corpus')
+    os.makedirs(os.path.join(workdir, 'response'), exist_ok=True)
+    shutil.copy(os.path.join(repo, 'response', 'document.txt'), os.path.join(workdir, 'response'))
+
+
+@contextlib.contextmanager
+def local_delivery(traspaso, ssh):
+    """Redirige traspaso.send_and_run (con su IP fija) al SSHStub local."""
+    original = traspaso.send_and_run
+
+    def envio_local(**kwargs):
+        kwargs.update(ip_destino='127.0.0.1', puerto=ssh.port)
+        return original(**kwargs)
+
+    traspaso.send_and_run = envio_local
+    try:
+        yield
+    finally:
+        traspaso.send_and_run = original
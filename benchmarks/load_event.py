@@ -0,0 +1,306 @@
+"""
+Generador de carga de una noche de evento: reproduce la avalancha de
+preguntas que llega cuando el código QR aparece en pantalla y mide cómo la
+absorbe la moderación en modo continuo (moderation.watch_pending_questions)
+y, opcionalmente, la generación de respuestas.
+
+Las preguntas (con la proporción pedida de duplicadas, tóxicas, spam y URLs,
+a partir de los ejemplos de first_stage.py) se escriben en 'questions' con
+la llegada que marque la curva:
+
+    pico      la mayoría en los primeros segundos y luego decae (exponencial)
+    rampa     sube hasta un máximo a 1/5 de la duración y baja (triangular)
+    uniforme  repartidas por igual en toda la duración
+
+Por defecto usa el Firestore en memoria de benchmarks/fakes.py; con
+--emulador HOST:PUERTO usa el emulador de Firestore (que se vacía al
+empezar). Perspective, Ollama y el PC del espectáculo son siempre los stubs
+locales. Informa de la cola (preguntas enviadas sin veredicto) a lo largo
+del tiempo, del tiempo hasta el veredicto y, con --responder, del tiempo
+hasta la respuesta, y lo guarda todo en JSON.
+
+Uso:
+    python benchmarks/load_event.py [--preguntas N] [--duracion S] [--curva pico]
+        [--duplicadas P] [--toxicas P] [--spam P] [--urls P]
+        [--perspective-qps Q] [--responder] [--emulador HOST:PUERTO] [--salida FICHERO]
+"""
+import os
+import sys
+import json
+import math
+import time
+import random
+import shutil
+import logging
+import argparse
+import tempfile
+import threading
+import warnings
+import contextlib
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+
+# Los módulos usan where() con argumentos posicionales; el aviso no aporta aquí
+warnings.filterwarnings('ignore', message='Detected filter using positional arguments')
+
+from bench_pipeline import commit_actual, resumen  # noqa: E402
+from fakes import (  # noqa: E402
+    FakeFirestore, OllamaStub, PerspectiveStub, SSHStub,
+    configure_environment, generate_questions, local_delivery,
+)
+
+EMULATOR_PROJECT = 'demo-bench'
+
+
+def llegadas(n, duracion, curva, rng):
+    """Segundos (desde el inicio) a los que llega cada una de las n preguntas, ordenados."""
+    if curva == 'uniforme':
+        tiempos = [rng.uniform(0, duracion) for _ in range(n)]
+    elif curva == 'rampa':
+        tiempos = [rng.triangular(0, duracion, duracion / 5) for _ in range(n)]
+    else:
+        # Exponencial truncada a la duración: la cuarta parte de la duración
+        # como constante de tiempo deja ~63% de las llegadas en ese primer cuarto
+        tau = duracion / 4
+        tope = 1 - math.exp(-duracion / tau)
+        tiempos = [-tau * math.log(1 - rng.random() * tope) for _ in range(n)]
+    return sorted(tiempos)
+
+
+def cliente_emulador(host):
+    """Cliente contra el emulador de Firestore, con 'questions' vacía."""
+    from google.cloud import firestore
+    os.environ['FIRESTORE_EMULATOR_HOST'] = host
+    requests.delete(
+        f"http://{host}/emulator/v1/projects/{EMULATOR_PROJECT}/databases/(default)/documents",
+        timeout=10,
+    ).raise_for_status()
+    return firestore.Client(project=EMULATOR_PROJECT)
+
+
+class Observador:
+    """
+    Escucha 'questions' y anota cuándo se envía cada pregunta, cuándo recibe
+    veredicto y cuándo queda respondida. muestrear() guarda la cola cada
+    cierto tiempo.
+    """
+
+    def __init__(self, client, inicio):
+        self.inicio = inicio
+        self.enviadas = {}
+        self.veredictos = {}
+        self.respuestas = {}
+        self.aprobadas = set()
+        self.muestras = []
+        self._lock = threading.Lock()
+        self._escucha = client.collection('questions').on_snapshot(self._cambios)
+
+    def enviada(self, doc_id):
+        with self._lock:
+            self.enviadas[doc_id] = time.monotonic()
+
+    def _cambios(self, documentos, cambios, read_time):
+        ahora = time.monotonic()
+        with self._lock:
+            for cambio in cambios:
+                if cambio.type.name == 'REMOVED':
+                    continue
+                doc_id = cambio.document.id
+                data = cambio.document.to_dict() or {}
+                if data.get('status') in ('approved', 'rejected') and doc_id not in self.veredictos:
+                    self.veredictos[doc_id] = ahora
+                    if data['status'] == 'approved':
+                        self.aprobadas.add(doc_id)
+                if data.get('answered') and doc_id not in self.respuestas:
+                    self.respuestas[doc_id] = ahora
+
+    def muestrear(self):
+        with self._lock:
+            muestra = {
+                't': round(time.monotonic() - self.inicio, 3),
+                'sent': len(self.enviadas),
+                'verdicts': len(self.veredictos),
+                'answered': len(self.respuestas),
+                'queue': len(self.enviadas) - len(self.veredictos),
+            }
+        self.muestras.append(muestra)
+        return muestra
+
+    def tiempos(self, hasta):
+        with self._lock:
+            return [hasta[d] - self.enviadas[d] for d in hasta if d in self.enviadas]
+
+    def cerrar(self):
+        self._escucha.unsubscribe()
+
+
+def enviar_preguntas(client, preguntas, tiempos, observador, inicio, hilos=8):
+    """Escribe cada pregunta en su instante de llegada, con varios hilos."""
+    coleccion = client.collection('questions')
+
+    def enviar(i, pregunta):
+        doc_id = f"carga{i:06d}"
+        observador.enviada(doc_id)
+        coleccion.document(doc_id).set({
+            'name': pregunta['name'], 'question': pregunta['question'], 'status': 'pending',
+            'timestamp': datetime.now(timezone.utc), 'device_id': f"carga-{i % 211}",
+        })
+
+    with ThreadPoolExecutor(max_workers=hilos) as executor:
+        for i, (pregunta, t) in enumerate(zip(preguntas, tiempos)):
+            espera = inicio + t - time.monotonic()
+            if espera > 0:
+                time.sleep(espera)
+            executor.submit(enviar, i, pregunta)
+
+
+def bucle_respuestas(ollama_response, parar, intervalo):
+    """Responde las aprobadas cada `intervalo` segundos, como el botón del panel."""
+    while True:
+        try:
+            ollama_response.main(incremental=True)
+        except Exception as e:
+            logging.error(f"Error en la pasada de respuestas: {e}")
+        if parar.wait(intervalo):
+            return
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--preguntas', type=int, default=1000)
+    parser.add_argument('--duracion', type=float, default=60.0, help="segundos en los que llegan todas")
+    parser.add_argument('--curva', choices=['pico', 'rampa', 'uniforme'], default='pico')
+    parser.add_argument('--duplicadas', type=float, default=0.15)
+    parser.add_argument('--toxicas', type=float, default=0.05)
+    parser.add_argument('--spam', type=float, default=0.05)
+    parser.add_argument('--urls', type=float, default=0.02)
+    parser.add_argument('--perspective-qps', type=float,
+                        help="cuota de Perspective; por defecto la configurada (PERSPECTIVE_QPS)")
+    parser.add_argument('--perspective-latencia', type=float, default=0.15)
+    parser.add_argument('--perspective-429', type=float, default=0.0)
+    parser.add_argument('--responder', action='store_true',
+                        help="responder también las aprobadas con el stub de Ollama")
+    parser.add_argument('--intervalo-respuestas', type=float, default=10.0)
+    parser.add_argument('--ollama-token-latencia', type=float, default=0.02)
+    parser.add_argument('--emulador', metavar='HOST:PUERTO', help="usar el emulador de Firestore")
+    parser.add_argument('--muestreo', type=float, default=1.0, help="segundos entre muestras de la cola")
+    parser.add_argument('--espera-max', type=float, default=600.0,
+                        help="segundos máximos para vaciar la cola tras la última llegada")
+    parser.add_argument('--semilla', type=int, default=7)
+    parser.add_argument('--salida', help="fichero JSON de resultados")
+    args = parser.parse_args()
+
+    rng = random.Random(args.semilla)
+    preguntas = generate_questions(
+        args.preguntas, duplicate_rate=args.duplicadas, toxic_share=args.toxicas,
+        spam_share=args.spam, url_share=args.urls, seed=args.semilla,
+    )
+    tiempos = llegadas(args.preguntas, args.duracion, args.curva, rng)
+
+    trabajo = tempfile.mkdtemp(prefix='load_event_')
+    directorio_inicial = os.getcwd()
+    perspective = PerspectiveStub(latency=args.perspective_latencia, error_rate=args.perspective_429)
+    ollama = OllamaStub(token_latency=args.ollama_token_latencia)
+    ssh = SSHStub(os.path.join(trabajo, 'remoto'))
+    salida = sys.stdout
+    configure_environment(trabajo, perspective, ollama, args.perspective_qps)
+    os.chdir(trabajo)
+
+    from moderation import moderation
+    from response import ollama_response, traspaso
+    logging.getLogger().setLevel(logging.WARNING)
+
+    client = cliente_emulador(args.emulador) if args.emulador else FakeFirestore().client
+    moderation.db = client
+    ollama_response.db = client
+
+    parar = threading.Event()
+    parar_respuestas = threading.Event()
+    inicio = time.monotonic()
+    observador = Observador(client, inicio)
+    moderador = threading.Thread(target=moderation.watch_pending_questions, args=(parar,), daemon=True)
+    respondedor = threading.Thread(
+        target=bucle_respuestas, args=(ollama_response, parar_respuestas, args.intervalo_respuestas), daemon=True)
+
+    print(f"Enviando {args.preguntas} preguntas en {args.duracion:.0f}s (curva {args.curva})...", file=salida)
+    try:
+        with open(os.devnull, 'w') as nulo, contextlib.redirect_stdout(nulo), local_delivery(traspaso, ssh):
+            moderador.start()
+            if args.responder:
+                respondedor.start()
+            emisor = threading.Thread(
+                target=enviar_preguntas, args=(client, preguntas, tiempos, observador, inicio), daemon=True)
+            emisor.start()
+            try:
+                limite = inicio + args.duracion + args.espera_max
+                while time.monotonic() < limite:
+                    time.sleep(args.muestreo)
+                    muestra = observador.muestrear()
+                    print(f"t={muestra['t']:>7.1f}s enviadas={muestra['sent']:>6} "
+                          f"veredictos={muestra['verdicts']:>6} cola={muestra['queue']:>6} "
+                          f"respondidas={muestra['answered']:>6}", file=salida)
+                    terminado = not emisor.is_alive() and muestra['queue'] == 0
+                    if terminado and args.responder:
+                        terminado = observador.aprobadas <= set(observador.respuestas)
+                    if terminado:
+                        break
+            finally:
+                parar.set()
+                parar_respuestas.set()
+                moderador.join(timeout=30)
+                if args.responder:
+                    respondedor.join(timeout=120)
+    finally:
+        observador.cerrar()
+        os.chdir(directorio_inicial)
+        perspective.close()
+        ollama.close()
+        ssh.close()
+        shutil.rmtree(trabajo, ignore_errors=True)
+
+    a_veredicto = observador.tiempos(observador.veredictos)
+    a_respuesta = observador.tiempos(observador.respuestas)
+    cola_max = max(observador.muestras, key=lambda m: m['queue'], default={'queue': 0, 't': 0})
+    resultado = {
+        'meta': {
+            'commit': commit_actual(),
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'backend': 'emulator' if args.emulador else 'fake',
+            'config': vars(args),
+        },
+        'sent': len(observador.enviadas),
+        'verdicts': len(observador.veredictos),
+        'approved': len(observador.aprobadas),
+        'answered': len(observador.respuestas),
+        'perspective_requests': perspective.requests,
+        'max_queue': cola_max['queue'],
+        'max_queue_at_s': cola_max['t'],
+        'time_to_verdict': resumen(a_veredicto),
+        'time_to_answer': resumen(a_respuesta),
+        'queue': observador.muestras,
+    }
+
+    print(f"\nVeredictos: {resultado['verdicts']}/{resultado['sent']} "
+          f"(llamadas a Perspective: {resultado['perspective_requests']})", file=salida)
+    print(f"Cola máxima: {resultado['max_queue']} preguntas a los {resultado['max_queue_at_s']:.1f}s", file=salida)
+    for nombre, clave in (('veredicto', 'time_to_verdict'), ('respuesta', 'time_to_answer')):
+        r = resultado[clave]
+        if r['count']:
+            print(f"Tiempo hasta {nombre}: p50 {r['p50_ms'] / 1000:.2f}s  p95 {r['p95_ms'] / 1000:.2f}s  "
+                  f"p99 {r['p99_ms'] / 1000:.2f}s  ({r['count']} preguntas)", file=salida)
+
+    fichero = args.salida or os.path.join(BENCH_DIR, 'results', f"load_event-{resultado['meta']['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(fichero)), exist_ok=True)
+    with open(fichero, 'w', encoding='utf-8') as f:
+        json.dump(resultado, f, indent=2, ensure_ascii=False)
+    print(f"Resultados guardados en {fichero}", file=salida)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,7 @@
+"""
+Código compartido por moderation/ y response/: métricas del proceso,
+lectura paginada y escritura por lotes en Firestore y la caché en SQLite.
+
+Los tres directorios son paquetes: los scripts se ejecutan desde la raíz del
+proyecto con ``python -m``, por ejemplo ``python -m moderation.backend``.
+"""
@@ -0,0 +1,124 @@
+"""
+Escritura por lotes en Firestore con BatchWrite, compartida por los
+veredictos de moderation/ y las respuestas de response/.
+"""
+import os
+import time
+import random
+import threading
+from google.cloud.firestore_v1.bulk_batch import BulkWriteBatch
+from . import metrics
+
+# Máximo de operaciones por commit (límite de Firestore), segundos máximos que
+# una escritura espera en el búfer, reintentos y espera base de su backoff
+FIRESTORE_BATCH_SIZE = 500
+FIRESTORE_FLUSH_INTERVAL = float(os.getenv('FIRESTORE_FLUSH_INTERVAL', '2'))
+FIRESTORE_WRITE_RETRIES = 3
+FIRESTORE_BACKOFF_BASE = 0.5
+
+# Códigos gRPC de error transitorio: ABORTED, UNAVAILABLE, RESOURCE_EXHAUSTED,
+# DEADLINE_EXCEEDED e INTERNAL. El resto (p.ej. NOT_FOUND) no se reintenta.
+RETRYABLE_WRITE_CODES = {10, 14, 8, 4, 13}
+
+
+class BatchWriter:
+    """
+    Acumula actualizaciones de documentos y las confirma en lotes de hasta
+    FIRESTORE_BATCH_SIZE operaciones con BatchWrite, que no es atómico y
+    devuelve el resultado de cada escritura: si alguna falla, solo esas se
+    reintentan. Un lote se envía al llenarse o cuando su primera escritura
+    lleva más de `flush_interval` segundos esperando. `operation` etiqueta los
+    commits en firestore_write_seconds. `on_failure(reference, message)`, si
+    se da, se llama por cada escritura que falla definitivamente.
+    """
+
+    def __init__(self, client, operation, batch_size=FIRESTORE_BATCH_SIZE,
+                 flush_interval=FIRESTORE_FLUSH_INTERVAL, on_failure=None):
+        self._client = client
+        self.operation = operation
+        self._on_failure = on_failure
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending = []
+        self._oldest = None
+        # Protege el búfer y las estadísticas; no se mantiene durante los commits
+        self._lock = threading.Lock()
+        # Estadísticas
+        self.commits = 0
+        self.commit_seconds = 0.0
+        self.written = 0
+        self.failed = []
+
+    def update(self, reference, data: dict):
+        """Encola la actualización de un documento."""
+        with self._lock:
+            if not self._pending:
+                self._oldest = time.monotonic()
+            self._pending.append((reference, data))
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self.flush()
+        else:
+            self.flush_if_due()
+
+    def flush_if_due(self):
+        """Envía el búfer si la escritura más antigua ha superado flush_interval."""
+        with self._lock:
+            due = bool(self._pending) and time.monotonic() - self._oldest >= self.flush_interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Envía todo lo pendiente."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        for i in range(0, len(pending), self.batch_size):
+            self._commit(pending[i:i + self.batch_size])
+
+    def _commit(self, writes):
+        attempt = 0
+        while writes:
+            batch = BulkWriteBatch(self._client)
+            for reference, data in writes:
+                batch.update(reference, data)
+
+            start = time.perf_counter()
+            try:
+                statuses = batch.commit().status
+                results = [(w, st.code, st.message) for w, st in zip(writes, statuses)]
+            except Exception as e:
+                # Ha fallado la llamada completa: todo el lote cuenta como transitorio
+                results = [(w, 14, str(e)) for w in writes]
+            elapsed = time.perf_counter() - start
+            metrics.FIRESTORE_WRITE_SECONDS.labels(self.operation).observe(elapsed)
+
+            failed = [(w, code, message) for w, code, message in results if code != 0]
+            # Varios hilos pueden estar confirmando lotes a la vez (flush desde
+            # update, flush_if_due y el flush final)
+            with self._lock:
+                self.commits += 1
+                self.commit_seconds += elapsed
+                self.written += len(writes) - len(failed)
+            retry = [w for w, code, _ in failed if code in RETRYABLE_WRITE_CODES]
+
+            if retry and attempt < FIRESTORE_WRITE_RETRIES:
+                for w, code, message in failed:
+                    if code not in RETRYABLE_WRITE_CODES:
+                        self._record_failure(w, message)
+                attempt += 1
+                time.sleep(random.uniform(0, FIRESTORE_BACKOFF_BASE * 2 ** attempt))
+                writes = retry
+                continue
+
+            for w, _, message in failed:
+                self._record_failure(w, message)
+            return
+
+    def _record_failure(self, write, message):
+        reference, _ = write
+        print(f"Error al actualizar el documento {reference.id}: {message}")
+        metrics.FIRESTORE_WRITE_ERRORS.labels(self.operation).inc()
+        with self._lock:
+            self.failed.append(reference.id)
+        if self._on_failure is not None:
+            self._on_failure(reference, message)
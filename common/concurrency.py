@@ -0,0 +1,15 @@
+"""
+Pool de hilos que conserva el contexto (contextvars) de quien encola el
+trabajo. El backend guarda en una variable de contexto el búfer de salida del
+trabajo en curso; con este pool, lo que imprimen o registran los hilos
+auxiliares de los motores también acaba en /jobs/<id>.
+"""
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ContextThreadPoolExecutor(ThreadPoolExecutor):
+    """ThreadPoolExecutor que ejecuta cada tarea en una copia del contexto de submit()."""
+
+    def submit(self, fn, /, *args, **kwargs):
+        return super().submit(contextvars.copy_context().run, fn, *args, **kwargs)
@@ -0,0 +1,39 @@
+"""
+Lectura paginada de consultas de Firestore, compartida por moderation/ y
+response/ para que el cursor, el timeout y las métricas no se desincronicen.
+"""
+import os
+import time
+from google.api_core.retry import Retry
+from google.api_core.exceptions import DeadlineExceeded
+from google.cloud.firestore_v1.field_path import FieldPath
+from . import metrics
+
+# Documentos por página al leer de Firestore
+FIRESTORE_PAGE_SIZE = int(os.getenv("FIRESTORE_PAGE_SIZE", "300"))
+
+
+def leer_paginado(query, timeout: float, page_size: int = FIRESTORE_PAGE_SIZE, operacion: str = "page"):
+    """
+    Recorre la consulta por páginas ordenadas por id de documento; cada página
+    continúa tras el último documento de la anterior. El timeout cubre la
+    lectura completa, no solo la creación del generador. Cada página se anota
+    en firestore_read_seconds con la etiqueta `operacion`.
+    """
+    inicio = time.monotonic()
+    query = query.order_by(FieldPath.document_id()).limit(page_size)
+    ultimo = None
+    while True:
+        restante = timeout - (time.monotonic() - inicio)
+        if restante <= 0:
+            raise RuntimeError(f"Timeout de {timeout}s excedido al leer preguntas de Firestore.")
+        pagina = query if ultimo is None else query.start_after(ultimo)
+        try:
+            with metrics.FIRESTORE_READ_SECONDS.labels(operacion).time():
+                docs = list(pagina.stream(retry=Retry(deadline=restante), timeout=restante))
+        except DeadlineExceeded:
+            raise RuntimeError(f"Timeout de {timeout}s excedido al leer preguntas de Firestore.")
+        yield from docs
+        if len(docs) < page_size:
+            return
+        ultimo = docs[-1]
@@ -0,0 +1,247 @@
+"""
+Métricas del proceso (contadores, medidores e histogramas) en el formato de
+texto de Prometheus, para el endpoint /metrics del backend.
+
+No tiene dependencias ni efectos secundarios al importarse, así que la usan
+tanto moderation/ como response/. Registrar una observación cuesta una
+búsqueda binaria en los cubos y un lock sin contención; no hay nada que
+reste tiempo a quien mide.
+"""
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+
+# ------------------ CUBOS ------------------
+
+# Llamadas de red (Perspective, Firestore, Ollama, SFTP), en segundos
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+# Trabajo local por pregunta (filtrado), en segundos
+FAST_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.01, 0.1)
+
+# ------------------ TIPOS ------------------
+
+_registro = []
+_registro_lock = threading.Lock()
+
+
+def _etiquetas(nombres, valores, extra=''):
+    pares = [f'{n}="{_escapar(str(v))}"' for n, v in zip(nombres, valores)]
+    if extra:
+        pares.append(extra)
+    return '{' + ','.join(pares) + '}' if pares else ''
+
+
+def _escapar(texto):
+    return texto.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _numero(valor):
+    if valor == float('inf'):
+        return '+Inf'
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class _Metrica:
+    tipo = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._hijos = {}
+        self._lock = threading.Lock()
+        with _registro_lock:
+            _registro.append(self)
+
+    def labels(self, *valores):
+        """Serie de la métrica para esos valores de etiqueta (se crea la primera vez)."""
+        clave = tuple(str(v) for v in valores)
+        hijo = self._hijos.get(clave)
+        if hijo is None:
+            if len(clave) != len(self.labelnames):
+                raise ValueError(f"{self.name} espera las etiquetas {self.labelnames}")
+            with self._lock:
+                hijo = self._hijos.setdefault(clave, self._nuevo_hijo())
+        return hijo
+
+    def _sin_etiquetas(self):
+        return self.labels()
+
+    def render(self):
+        lineas = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.tipo}"]
+        for clave, hijo in sorted(self._hijos.items()):
+            lineas.extend(hijo._muestras(self.name, self.labelnames, clave))
+        return lineas
+
+
+class _Valor:
+    def __init__(self):
+        self._valor = 0
+        self._lock = threading.Lock()
+
+    def inc(self, cantidad=1):
+        with self._lock:
+            self._valor += cantidad
+
+    def dec(self, cantidad=1):
+        with self._lock:
+            self._valor -= cantidad
+
+    def set(self, valor):
+        self._valor = valor
+
+    def _muestras(self, nombre, nombres, valores):
+        return [f"{nombre}{_etiquetas(nombres, valores)} {_numero(self._valor)}"]
+
+
+class Counter(_Metrica):
+    """Contador que solo sube (el nombre debe acabar en _total)."""
+    tipo = 'counter'
+
+    def _nuevo_hijo(self):
+        return _Valor()
+
+    def inc(self, cantidad=1):
+        self._sin_etiquetas().inc(cantidad)
+
+
+class Gauge(_Metrica):
+    """Valor que sube y baja (por ejemplo, el tamaño de una cola)."""
+    tipo = 'gauge'
+
+    def _nuevo_hijo(self):
+        return _Valor()
+
+    def inc(self, cantidad=1):
+        self._sin_etiquetas().inc(cantidad)
+
+    def dec(self, cantidad=1):
+        self._sin_etiquetas().dec(cantidad)
+
+    def set(self, valor):
+        self._sin_etiquetas().set(valor)
+
+
+class _Distribucion:
+    def __init__(self, cubos):
+        self._cubos = cubos
+        self._cuentas = [0] * (len(cubos) + 1)
+        self._suma = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, valor):
+        indice = bisect.bisect_left(self._cubos, valor)
+        with self._lock:
+            self._cuentas[indice] += 1
+            self._suma += valor
+
+    @contextmanager
+    def time(self):
+        """Observa la duración del bloque with, aunque termine con excepción."""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - inicio)
+
+    def _muestras(self, nombre, nombres, valores):
+        with self._lock:
+            cuentas, suma = list(self._cuentas), self._suma
+        lineas = []
+        acumulado = 0
+        for limite, cuenta in zip(self._cubos + (float('inf'),), cuentas):
+            acumulado += cuenta
+            etiqueta_le = f'le="{_numero(limite)}"'
+            lineas.append(f"{nombre}_bucket{_etiquetas(nombres, valores, etiqueta_le)} {acumulado}")
+        lineas.append(f"{nombre}_sum{_etiquetas(nombres, valores)} {_numero(suma)}")
+        lineas.append(f"{nombre}_count{_etiquetas(nombres, valores)} {acumulado}")
+        return lineas
+
+
+class Histogram(_Metrica):
+    """Histograma de cubos acumulados, con _sum y _count."""
+    tipo = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _nuevo_hijo(self):
+        return _Distribucion(self.buckets)
+
+    def observe(self, valor):
+        self._sin_etiquetas().observe(valor)
+
+    def time(self):
+        return self._sin_etiquetas().time()
+
+
+def render() -> str:
+    """Todas las métricas registradas, en formato de texto de Prometheus."""
+    with _registro_lock:
+        metricas = list(_registro)
+    lineas = []
+    for metrica in metricas:
+        lineas.extend(metrica.render())
+    return '\n'.join(lineas) + '\n'
+
+# ------------------ MÉTRICAS ------------------
+
+# Moderación
+LOCAL_FILTER_SECONDS = Histogram(
+    'moderation_local_filter_seconds', 'Tiempo del filtrado local (normalización y filtros) por pregunta.',
+    buckets=FAST_BUCKETS)
+VERDICTS = Counter(
+    'moderation_verdicts_total', 'Veredictos por estado y por quién los ha decidido '
+    '(local, cache, perspective o fallback).', ['status', 'source'])
+QUEUE_DEPTH = Gauge(
+    'moderation_queue_depth', 'Preguntas esperando moderador en el modo continuo.')
+WATCH_UP = Gauge(
+    'moderation_watch_up', '1 mientras la moderación continua está escuchando en este proceso, 0 si no.')
+WATCH_RESTARTS = Counter(
+    'moderation_watch_restarts_total', 'Reinicios de la moderación continua del backend tras detenerse por un error.')
+
+# Perspective
+PERSPECTIVE_SECONDS = Histogram(
+    'perspective_request_seconds', 'Duración de cada petición a Perspective API.')
+PERSPECTIVE_QUOTA_WAIT_SECONDS = Histogram(
+    'perspective_quota_wait_seconds', 'Espera en el limitador de PERSPECTIVE_QPS antes de cada petición.')
+PERSPECTIVE_ERRORS = Counter(
+    'perspective_errors_total', 'Peticiones a Perspective fallidas, por código HTTP (o network/other).', ['code'])
+PERSPECTIVE_RETRIES = Counter(
+    'perspective_retries_total', 'Reintentos de peticiones a Perspective.')
+PERSPECTIVE_FALLBACKS = Counter(
+    'perspective_fallbacks_total', 'Preguntas sin score de Perspective, tratadas como no tóxicas (0.0).')
+
+# Firestore
+FIRESTORE_READ_SECONDS = Histogram(
+    'firestore_read_seconds', 'Duración de cada lectura de Firestore (consulta o página).', ['operation'])
+FIRESTORE_WRITE_SECONDS = Histogram(
+    'firestore_write_seconds', 'Duración de cada commit de escrituras en Firestore.', ['operation'])
+FIRESTORE_WRITE_ERRORS = Counter(
+    'firestore_write_errors_total', 'Escrituras en Firestore que no se han podido aplicar.', ['operation'])
+
+# Ollama
+OLLAMA_REQUEST_SECONDS = Histogram(
+    'ollama_request_seconds', 'Duración de cada llamada a /api/chat.', ['model'])
+OLLAMA_PROMPT_EVAL_SECONDS = Histogram(
+    'ollama_prompt_eval_seconds', 'prompt_eval_duration de Ollama (evaluación del prompt).', ['model'])
+OLLAMA_EVAL_SECONDS = Histogram(
+    'ollama_eval_seconds', 'eval_duration de Ollama (generación de la respuesta).', ['model'])
+OLLAMA_PROMPT_TOKENS = Counter(
+    'ollama_prompt_eval_tokens_total', 'Tokens de prompt evaluados (prompt_eval_count).', ['model'])
+OLLAMA_EVAL_TOKENS = Counter(
+    'ollama_eval_tokens_total', 'Tokens generados (eval_count).', ['model'])
+OLLAMA_ERRORS = Counter(
+    'ollama_errors_total', 'Intentos de respuesta fallidos (incluidos los que se reintentan).')
+
+# Entrega al PC del espectáculo
+DELIVERY_SECONDS = Histogram(
+    'delivery_seconds', 'Duración de cada entrega (subida SFTP y script remoto).')
+DELIVERIES = Counter(
+    'deliveries_total', 'Entregas por resultado (sent, unchanged o error).', ['result'])
+
+# Backend
+JOB_SECONDS = Histogram(
+    'backend_job_seconds', 'Duración de los trabajos lanzados desde la interfaz.', ['kind', 'status'])
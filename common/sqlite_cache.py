@@ -0,0 +1,141 @@
+"""
+Caché LRU respaldada en SQLite, compartida por los veredictos de moderation/
+y las respuestas de response/. Aquí solo se guardan cadenas; cada módulo da
+forma a sus claves y valores (JSON, plantillas...) en su subclase.
+"""
+import time
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+
+# Columnas de cada tabla; si un fichero antiguo tiene otras, la tabla se
+# recrea (es una caché: perderla solo cuesta volver a calcular)
+_COLUMNAS = ['key', 'value', 'stored_at', 'used_at']
+
+
+class SQLiteCache:
+    """
+    Caché LRU de cadenas con `max_entries` entradas en memoria y en disco.
+    Opcionalmente, con caducidad (`ttl` segundos desde que se guardó) y con
+    una huella de la configuración que determina los valores: si cambia, la
+    caché se vacía (ver check_fingerprint). Con `path` vacío solo vive en
+    memoria. `table` separa varias cachés en el mismo fichero y `label` las
+    nombra en los avisos. Segura para usarse desde varios hilos.
+    """
+
+    def __init__(self, path: str, table: str, max_entries: int, ttl: float = None,
+                 fingerprint: str = None, label: str = 'caché'):
+        self.table = table
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.fingerprint = None
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # clave -> (guardado_en, valor)
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            try:
+                self._db = sqlite3.connect(path, check_same_thread=False)
+                self._crear_tablas()
+            except sqlite3.Error as e:
+                logging.warning(f"{label.capitalize()} solo en memoria ({path}: {e})")
+                self._db = None
+        if fingerprint is not None:
+            self.check_fingerprint(fingerprint)
+
+    def _crear_tablas(self):
+        columnas = [row[1] for row in self._db.execute(f"PRAGMA table_info({self.table})")]
+        if columnas and columnas != _COLUMNAS:
+            self._db.execute(f"DROP TABLE {self.table}")
+        self._db.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+            " stored_at REAL NOT NULL, used_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+        self._db.commit()
+
+    def check_fingerprint(self, fingerprint: str):
+        """Vacía la caché si la configuración ha cambiado desde que se llenó."""
+        with self._lock:
+            if fingerprint == self.fingerprint:
+                return
+            self._entries.clear()
+            self.fingerprint = fingerprint
+            if self._db is None:
+                return
+            nombre = f"{self.table}.fingerprint"
+            row = self._db.execute("SELECT value FROM meta WHERE name = ?", (nombre,)).fetchone()
+            if row is None or row[0] != fingerprint:
+                self._db.execute(f"DELETE FROM {self.table}")
+                self._db.execute("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (nombre, fingerprint))
+                self._db.commit()
+
+    def get(self, key: str):
+        """Devuelve el valor guardado para la clave, o None."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and self._db is not None:
+                entry = self._db.execute(
+                    f"SELECT stored_at, value FROM {self.table} WHERE key = ?", (key,)
+                ).fetchone()
+                if entry is not None:
+                    self._remember(key, entry)
+
+            if entry is None or self._caducada(entry, now):
+                if entry is not None:
+                    self._forget(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            if self._db is not None:
+                self._db.execute(f"UPDATE {self.table} SET used_at = ? WHERE key = ?", (now, key))
+                self._db.commit()
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, value: str):
+        """Guarda un valor."""
+        now = time.time()
+        with self._lock:
+            self._remember(key, (now, value))
+            if self._db is None:
+                return
+            self._db.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, stored_at, used_at) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            # Caducados fuera y, si sobra, los menos usados recientemente
+            if self.ttl is not None:
+                self._db.execute(f"DELETE FROM {self.table} WHERE stored_at < ?", (now - self.ttl,))
+            self._db.execute(
+                f"DELETE FROM {self.table} WHERE key IN ("
+                f" SELECT key FROM {self.table} ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _caducada(self, entry, now):
+        return self.ttl is not None and now - entry[0] > self.ttl
+
+    def _remember(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _forget(self, key):
+        self._entries.pop(key, None)
+        if self._db is not None:
+            self._db.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            self._db.commit()
@@ -0,0 +1,7 @@
+"""
+Moderación de preguntas: filtros locales (engine), Perspective API
+(moderation) y el backend Flask de la interfaz de administración.
+
+Se ejecuta desde la raíz del proyecto, p. ej. ``python -m moderation.backend``
+o ``python -m moderation.moderation --watch``.
+"""
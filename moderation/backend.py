@@ -1,8 +1,15 @@
 import sys
 import os
-from flask import Flask, request, jsonify
+import io
+import json
+import uuid
+import time
+import threading
+import contextvars
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS, cross_origin
-import subprocess
 
 # ----------------------------
 # Configuración de rutas
@@ -10,31 +17,233 @@ import subprocess
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.abspath(os.path.join(BASE_DIR, os.pardir))
 
+# Filtros locales y métricas: no inicializan Firebase ni Perspective al importarse.
+# Los motores (moderation, response.ollama_response) se importan en este mismo
+# proceso; el backend se arranca desde la raíz con `python -m moderation.backend`
+from common import metrics  # noqa: E402
+from . import engine  # noqa: E402
+
+# ----------------------------
+# Configuración de trabajos
+# ----------------------------
+MAX_WORKERS = int(os.getenv('BACKEND_WORKERS', '2'))  # trabajos simultáneos
+MAX_TRABAJOS_GUARDADOS = 50                            # historial consultable
+# Con MODERATION_WATCH=1 el backend modera cada pregunta en cuanto llega
+MODERATION_WATCH = os.getenv('MODERATION_WATCH') == '1'
+WATCH_RESTART_BASE = 1                                 # espera base y máxima (segundos)
+WATCH_RESTART_MAX = 60                                 # antes de reiniciarla si se detiene
+SSE_KEEPALIVE = 15                                     # segundos entre latidos SSE
+
 # ----------------------------
 # Inicialización de Flask
 # ----------------------------
 app = Flask(__name__)
 CORS(app)
 
+# ----------------------------
+# Captura de salida por trabajo
+# ----------------------------
+# Búfer de salida del trabajo en curso. Los motores reparten el trabajo con
+# common.concurrency.ContextThreadPoolExecutor, que copia este contexto a sus
+# hilos, así que su salida también llega al trabajo
+_buffer_trabajo = contextvars.ContextVar('buffer_trabajo', default=None)
+
+
+class _SalidaPorTrabajo(io.TextIOBase):
+    """
+    Sustituye a sys.stdout/sys.stderr y envía lo que se escribe en el contexto
+    de un trabajo (su hilo y los hilos auxiliares que lanza) a su búfer. El
+    resto escribe en el flujo original.
+    """
+
+    def __init__(self, original):
+        self._original = original
+
+    def write(self, texto):
+        buffer = _buffer_trabajo.get()
+        if buffer is None:
+            return self._original.write(texto)
+        buffer.write(texto)
+        return len(texto)
+
+    def flush(self):
+        self._original.flush()
+
+    def writable(self):
+        return True
+
+    @property
+    def encoding(self):
+        return getattr(self._original, 'encoding', 'utf-8')
+
+
+def _instalar_captura():
+    """
+    Sustituye sys.stdout/sys.stderr por _SalidaPorTrabajo. Se llama al
+    arrancar el backend, antes de importar los motores para que su logging
+    también se capture; importar este módulo no toca los flujos del proceso.
+    """
+    if not isinstance(sys.stdout, _SalidaPorTrabajo):
+        sys.stdout = _SalidaPorTrabajo(sys.stdout)
+    if not isinstance(sys.stderr, _SalidaPorTrabajo):
+        sys.stderr = _SalidaPorTrabajo(sys.stderr)
+
+# ----------------------------
+# Motores calientes (se importan una sola vez)
+# ----------------------------
+_motores_lock = threading.Lock()
+
+
+def _motor_moderacion():
+    """
+    Importa moderation.py una vez. Firebase y el cliente de Perspective no se
+    inicializan aquí, sino al primer uso (get_db, get_perspective_client).
+    """
+    with _motores_lock:
+        from . import moderation
+    return moderation
+
+
+def _motor_respuestas():
+    """Importa ollama_response.py una vez y reutiliza su cliente de Firestore."""
+    with _motores_lock:
+        from response import ollama_response
+    return ollama_response
+
+
+def _ejecutar_moderacion(trabajo):
+    return _motor_moderacion().main()
+
+
+def _ejecutar_respuestas(trabajo):
+    # Cada token y respuesta se publica como evento del trabajo (ver /events)
+    return _motor_respuestas().main(on_event=trabajo.emitir)
+
+
+TIPOS_TRABAJO = {
+    'moderation': _ejecutar_moderacion,
+    'ollama-response': _ejecutar_respuestas,
+}
+
+# ----------------------------
+# Registro de trabajos
+# ----------------------------
+class Trabajo:
+    """Estado de una ejecución lanzada desde la interfaz de administración."""
+
+    def __init__(self, tipo):
+        self.id = uuid.uuid4().hex
+        self.tipo = tipo
+        self.estado = 'queued'  # queued -> running -> finished | failed
+        self.salida = io.StringIO()
+        self.resultado = None
+        self.error = None
+        self.creado = time.time()
+        self.iniciado = None
+        self.terminado = None
+        self.eventos = []
+        self._cambios = threading.Condition()
+
+    @property
+    def activo(self):
+        return self.estado in ('queued', 'running')
+
+    def emitir(self, evento):
+        """Añade un evento (un dict serializable) y despierta a quien lo espera."""
+        with self._cambios:
+            self.eventos.append(evento)
+            self._cambios.notify_all()
+
+    def cambiar_estado(self, estado):
+        """Cambia el estado y lo publica como evento en un solo paso."""
+        with self._cambios:
+            self.estado = estado
+            tipo = 'status' if self.activo else 'end'
+            self.eventos.append({"type": tipo, "job_id": self.id, "status": estado, "error": self.error})
+            self._cambios.notify_all()
+
+    def esperar_eventos(self, desde, timeout):
+        """
+        Devuelve (eventos a partir de la posición desde, sigue activo). Si aún
+        no hay ninguno y el trabajo sigue en marcha, espera hasta timeout.
+        """
+        with self._cambios:
+            if len(self.eventos) <= desde and self.activo:
+                self._cambios.wait(timeout)
+            return self.eventos[desde:], self.activo
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "kind": self.tipo,
+            "status": self.estado,
+            "success": self.estado != 'failed',
+            "output": self.salida.getvalue(),
+            "result": self.resultado,
+            "error": self.error,
+            "created_at": self.creado,
+            "started_at": self.iniciado,
+            "finished_at": self.terminado,
+        }
+
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='trabajo')
+_trabajos = OrderedDict()
+_trabajos_lock = threading.Lock()
+
+
+def _ejecutar_trabajo(trabajo):
+    trabajo.iniciado = time.time()
+    trabajo.cambiar_estado('running')
+    captura = _buffer_trabajo.set(trabajo.salida)
+    try:
+        trabajo.resultado = TIPOS_TRABAJO[trabajo.tipo](trabajo)
+        estado = 'finished'
+    except Exception as e:
+        app.logger.exception("ERROR en el trabajo %s (%s)", trabajo.id, trabajo.tipo)
+        trabajo.error = str(e)
+        trabajo.salida.write(f"\n{e}\n")
+        estado = 'failed'
+    finally:
+        _buffer_trabajo.reset(captura)
+        trabajo.terminado = time.time()
+    metrics.JOB_SECONDS.labels(trabajo.tipo, estado).observe(trabajo.terminado - trabajo.iniciado)
+    trabajo.cambiar_estado(estado)
+
+
+def lanzar_trabajo(tipo):
+    """
+    Encola un trabajo del tipo indicado y lo devuelve sin esperar a que termine.
+    Si ya hay uno del mismo tipo en cola o en curso, se devuelve ese.
+    """
+    with _trabajos_lock:
+        for trabajo in _trabajos.values():
+            if trabajo.tipo == tipo and trabajo.activo:
+                return trabajo
+
+        trabajo = Trabajo(tipo)
+        _trabajos[trabajo.id] = trabajo
+        # Olvidar los trabajos terminados más antiguos
+        while len(_trabajos) > MAX_TRABAJOS_GUARDADOS:
+            antiguo_id = next(iter(_trabajos))
+            if _trabajos[antiguo_id].activo:
+                break
+            del _trabajos[antiguo_id]
+
+    _executor.submit(_ejecutar_trabajo, trabajo)
+    return trabajo
+
+
+def _respuesta_trabajo(trabajo):
+    return jsonify(trabajo.to_dict()), 202
+
 # ----------------------------
 # Endpoint: run-moderation
 # ----------------------------
 @app.route('/run-moderation', methods=['POST'])
 @cross_origin()
 def run_moderation():
-    script_path = os.path.join(PROJECT_ROOT, 'moderation', 'moderation.py')
-    try:
-        result = subprocess.run(
-            [sys.executable, script_path],
-            capture_output=True, text=True, check=True
-        )
-        return jsonify({"output": result.stdout, "success": True})
-    except subprocess.CalledProcessError as e:
-        app.logger.error("ERROR en moderation.py:\n%s\n%s", e.stdout, e.stderr)
-        return jsonify({
-            "output": e.stdout + "\n" + e.stderr,
-            "success": False
-        }), 500
+    return _respuesta_trabajo(lanzar_trabajo('moderation'))
 
 # ----------------------------
 # Endpoint: run-ollama-response
@@ -42,19 +251,92 @@ def run_moderation():
 @app.route('/run-ollama-response', methods=['POST'])
 @cross_origin()
 def run_ollama_response():
-    script_path = os.path.join(PROJECT_ROOT, 'response', 'ollama_response.py')
-    try:
-        result = subprocess.run(
-            [sys.executable, script_path],
-            capture_output=True, text=True, check=True
-        )
-        return jsonify({"output": result.stdout, "success": True})
-    except subprocess.CalledProcessError as e:
-        app.logger.error("ERROR en ollama_response.py:\n%s\n%s", e.stdout, e.stderr)
-        return jsonify({
-            "output": e.stdout + "\n" + e.stderr,
-            "success": False
-        }), 500
+    return _respuesta_trabajo(lanzar_trabajo('ollama-response'))
+
+# ----------------------------
+# Endpoint: estado de un trabajo
+# ----------------------------
+@app.route('/jobs/<job_id>', methods=['GET'])
+@cross_origin()
+def job_status(job_id):
+    trabajo = _trabajos.get(job_id)
+    if trabajo is None:
+        return jsonify({"output": f"Trabajo {job_id} no encontrado", "success": False}), 404
+    return jsonify(trabajo.to_dict())
+
+# ----------------------------
+# Endpoints: eventos en vivo (Server-Sent Events)
+# ----------------------------
+def _flujo_eventos(trabajo, desde):
+    """Genera los eventos del trabajo en formato SSE hasta que termina."""
+    yield f"retry: {SSE_KEEPALIVE * 1000 // 3}\n\n"
+    while True:
+        eventos, activo = trabajo.esperar_eventos(desde, SSE_KEEPALIVE)
+        for evento in eventos:
+            yield f"id: {trabajo.id}:{desde}\ndata: {json.dumps(evento, ensure_ascii=False)}\n\n"
+            desde += 1
+        if not activo and not eventos:
+            return
+        if not eventos:
+            yield ": keepalive\n\n"
+
+
+def _respuesta_sse(trabajo):
+    # Al reconectar, el navegador envía el último id recibido y se continúa desde ahí
+    desde = 0
+    ultimo_id = request.headers.get('Last-Event-ID', '')
+    if trabajo is not None and ultimo_id.startswith(f"{trabajo.id}:"):
+        try:
+            desde = int(ultimo_id.rsplit(':', 1)[1]) + 1
+        except ValueError:
+            desde = 0
+
+    cuerpo = _flujo_eventos(trabajo, desde) if trabajo is not None else f"retry: {SSE_KEEPALIVE * 1000 // 3}\n\n"
+    return Response(cuerpo, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+
+
+@app.route('/jobs/<job_id>/events', methods=['GET'])
+@cross_origin()
+def job_events(job_id):
+    trabajo = _trabajos.get(job_id)
+    if trabajo is None:
+        return jsonify({"output": f"Trabajo {job_id} no encontrado", "success": False}), 404
+    return _respuesta_sse(trabajo)
+
+
+@app.route('/run-ollama-response/events', methods=['GET'])
+@cross_origin()
+def ollama_response_events():
+    """Eventos del último trabajo de respuestas; si no hay ninguno, el navegador reintenta."""
+    with _trabajos_lock:
+        trabajo = next((t for t in reversed(_trabajos.values()) if t.tipo == 'ollama-response'), None)
+    return _respuesta_sse(trabajo)
+
+# ----------------------------
+# Endpoint: filtrado local de preguntas
+# ----------------------------
+@app.route('/check-questions', methods=['POST'])
+@cross_origin()
+def check_questions():
+    textos = (request.get_json(silent=True) or {}).get('questions')
+    if not isinstance(textos, list) or not all(isinstance(t, str) for t in textos):
+        return jsonify({"output": "Se esperaba {\"questions\": [texto, ...]}", "success": False}), 400
+    veredictos = engine.is_clean_batch(textos)
+    return jsonify({
+        "success": True,
+        "results": [{"clean": v.clean, "reasons": v.motivos} for v in veredictos],
+    })
+
+# ----------------------------
+# Endpoint: métricas (formato de texto de Prometheus)
+# ----------------------------
+@app.route('/metrics', methods=['GET'])
+@cross_origin()
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 # ----------------------------
 # Manejador global de errores
@@ -64,11 +346,49 @@ def handle_exception(e):
     app.logger.error("EXCEPCIÓN NO CONTROLADA: %s", str(e))
     return jsonify({"output": str(e), "success": False}), 500
 
+# ----------------------------
+# Precarga de motores
+# ----------------------------
+def _precargar_motores():
+    """Importa los motores en segundo plano para que el primer clic no pague el arranque."""
+    for cargar in (_motor_moderacion, _motor_respuestas):
+        try:
+            cargar()
+        except Exception as e:
+            app.logger.error("No se pudo precargar %s: %s", cargar.__name__, e)
+
+def _vigilar_moderacion():
+    """
+    Mantiene la moderación continua (moderation.py --watch) dentro del backend.
+    Si se detiene por un error, se reinicia con backoff exponencial; su estado
+    se ve en /metrics (moderation_watch_up, moderation_watch_restarts_total).
+    """
+    intento = 0
+    while True:
+        inicio = time.monotonic()
+        try:
+            _motor_moderacion().watch_pending_questions()
+            return
+        except Exception as e:
+            app.logger.error("La moderación continua se ha detenido: %s", e)
+        # Si llevaba un rato funcionando, el fallo no viene del arranque
+        if time.monotonic() - inicio > WATCH_RESTART_MAX:
+            intento = 0
+        espera = min(WATCH_RESTART_MAX, WATCH_RESTART_BASE * 2 ** intento)
+        intento += 1
+        metrics.WATCH_RESTARTS.inc()
+        app.logger.warning("Reiniciando la moderación continua en %ss", espera)
+        time.sleep(espera)
+
 # ----------------------------
 # Arranque de la aplicación
 # ----------------------------
 if __name__ == '__main__':
     # forzar cwd a raíz del proyecto
     os.chdir(PROJECT_ROOT)
+    _instalar_captura()
+    threading.Thread(target=_precargar_motores, daemon=True).start()
+    if MODERATION_WATCH:
+        threading.Thread(target=_vigilar_moderacion, daemon=True).start()
     # desactivar reloader para evitar errores de ruta al reiniciar
-    app.run(port=5000, debug=True, use_reloader=False)
+    app.run(port=5000, debug=True, use_reloader=False, threaded=True)
@@ -0,0 +1,73 @@
+import re
+
+# Generar variantes l33t: sustituir números por letras
+LEET_MAP = str.maketrans({'4': 'a', '3': 'e', '1': 'i', '0': 'o', '5': 's', '@': 'a', '$': 's', '¥': 'y'})
+
+
+def _trie_pattern(node: dict) -> str:
+    """
+    Convierte un trie {carácter: subárbol} en una expresión regular con los
+    prefijos factorizados, de modo que el motor no prueba cada término por
+    separado. La clave '' marca el final de un término.
+    """
+    alternatives = []
+    for ch in sorted(k for k in node if k):
+        # Un espacio del término admite cualquier separación en el texto
+        atom = r'\s+' if ch == ' ' else re.escape(ch)
+        alternatives.append(atom + _trie_pattern(node[ch]))
+
+    if not alternatives:
+        return ''
+    if len(alternatives) == 1 and '' not in node:
+        return alternatives[0]
+    body = '(?:' + '|'.join(alternatives) + ')'
+    return body + '?' if '' in node else body
+
+
+class BlacklistMatcher:
+    """
+    Buscador de términos prohibidos compilado una sola vez en una única
+    expresión regular (un trie). Encuentra palabras y expresiones de varias
+    palabras completas en una pasada sobre el texto normalizado y sin l33t.
+    """
+
+    def __init__(self, terms, normalize=str.lower):
+        # término normalizado -> término original, para informar de lo encontrado.
+        # Si varias variantes comparten clave ('porno', 'p0rno', 'p0rn0'), se
+        # informa de la escrita sin l33t, no de la primera en orden alfabético
+        self.terms = {}
+        canonical = set()
+        for term in sorted(terms):
+            plain = ' '.join(normalize(term).split())
+            key = plain.translate(LEET_MAP)
+            if not key or key in canonical:
+                continue
+            if plain == key:
+                canonical.add(key)
+                self.terms[key] = term
+            else:
+                self.terms.setdefault(key, term)
+
+        trie = {}
+        for key in self.terms:
+            node = trie
+            for ch in key:
+                node = node.setdefault(ch, {})
+            node[''] = {}
+
+        pattern = _trie_pattern(trie) or r'(?!)'
+        self._regex = re.compile(r'(?<!\w)(?:' + pattern + r')(?!\w)')
+
+    def find(self, normalized_text: str) -> list:
+        """Términos de la lista presentes en un texto ya normalizado (sin repetir)."""
+        deleet = normalized_text.translate(LEET_MAP)
+        found = []
+        for match in self._regex.finditer(deleet):
+            term = self.terms[' '.join(match.group().split())]
+            if term not in found:
+                found.append(term)
+        return found
+
+    def search(self, normalized_text: str) -> bool:
+        """Indica si el texto ya normalizado contiene algún término de la lista."""
+        return self._regex.search(normalized_text.translate(LEET_MAP)) is not None
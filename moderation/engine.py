@@ -0,0 +1,134 @@
+"""
+Motor de moderación local: normalización, BLACKLIST, patrones y longitud.
+
+No tiene efectos secundarios al importarse (ni Firebase ni googleapiclient),
+así que lo pueden usar el backend, el modo continuo, los benchmarks y las
+pruebas sin coste de arranque. Todos los patrones se compilan una vez aquí.
+"""
+import re
+import time
+from typing import NamedTuple
+from common import metrics
+from .blacklist import BlacklistMatcher
+from .normalization import normalize_text
+
+# ------------------ BLACKLIST / PALABROTAS ------------------
+
+BLACKLIST = {
+    # ejemplos básicos; ampliar según necesidades
+    'puto', 'puta', 'mierda', 'joder', 'coño', 'hostia',
+    'polla', 'pene', 'órgano', 'p0rn0', 'p0rno', 'porno', 'p0rn',
+    'follar', 'f4ll4r', 'cojones', 'hijo de puta'
+}
+
+# Buscador compilado una sola vez a partir de BLACKLIST (incluye variantes l33t)
+BLACKLIST_MATCHER = BlacklistMatcher(BLACKLIST, normalize_text)
+
+def contains_blacklisted_word(text: str) -> bool:
+    """Detecta palabras y expresiones de la BLACKLIST, incluidas variantes l33t."""
+    return BLACKLIST_MATCHER.search(normalize_text(text))
+
+# ------------------ PATRONES Y REGEX ------------------
+
+# Los grupos (?=(X+))\N emulan grupos atómicos: lo que consume X no se
+# devuelve al retroceder, así que cada patrón recorre el texto en tiempo lineal
+# (X nunca puede contener el carácter que viene detrás).
+
+# Repetición excesiva de caracteres (5 o más veces)
+RE_REPEAT = re.compile(r"(.)\1{4,}")
+# Palabras con símbolos intercalados: detectar secuencia letra, símbolo, letra
+# Incluimos letras acentuadas y ñ para evitar falsos positivos en español
+RE_SYMBOLS = re.compile(r"[a-zA-ZáéíóúüñÁÉÍÓÚÜÑ](?=([^a-zA-ZáéíóúüñÁÉÍÓÚÜÑ0-9\s]+))\1[a-zA-ZáéíóúüñÁÉÍÓÚÜÑ]")
+
+# HTML/JS y URLs sospechosas en un único patrón, sobre el texto en minúsculas:
+# etiqueta <script, esquema javascript: o URL (http(s):// o www.) con dominio
+RE_UNSAFE = re.compile(
+    r"<(?=(\s*))\1script\b"
+    r"|javascript:"
+    r"|(?:https?://|www\.)(?=([\w\-]+))\2\.[\w\-]"
+)
+# Todo lo que detecta RE_UNSAFE contiene alguna de estas subcadenas
+_UNSAFE_MARKERS = ('<', 'javascript:', '://', 'www.')
+
+
+def contains_unsafe_content(text: str) -> bool:
+    """Detecta etiquetas <script>, esquemas javascript: y URLs."""
+    lowered = text.lower()
+    # Filtro previo con búsquedas de subcadena (C puro): casi ninguna pregunta
+    # llega a la expresión regular
+    if not any(marker in lowered for marker in _UNSAFE_MARKERS):
+        return False
+    return RE_UNSAFE.search(lowered) is not None
+
+# ------------------ LONGITUD Y SPAM ------------------
+
+MIN_LENGTH = 3    # mínimo de caracteres (sin espacios)
+MAX_LENGTH = 500  # máximo razonable
+
+def validate_length(text: str) -> bool:
+    """Valida longitud mínima y máxima."""
+    length = len(text.strip())
+    return MIN_LENGTH <= length <= MAX_LENGTH
+
+# ------------------ PIPELINE DE FILTRADO LOCAL ------------------
+
+def is_clean(text: str, norm: str = None) -> (bool, list):
+    """
+    Comprueba si el texto pasa todos los filtros básicos.
+    `norm` es normalize_text(text) si ya se ha calculado antes.
+    Retorna (True, []) si está limpio, o (False, [motivos]).
+    """
+    motivos = []
+    # Normalización para blacklist (sin acentos)
+    if norm is None:
+        norm = normalize_text(text)
+
+    # 1. Blacklist (sobre el texto ya normalizado)
+    prohibidas = BLACKLIST_MATCHER.find(norm)
+    if prohibidas:
+        motivos.append(f"Contiene palabra o expresión prohibida ({', '.join(prohibidas)})")
+
+    # 2. Repeticiones abusivas
+    if RE_REPEAT.search(norm):
+        motivos.append('Repetición excesiva de caracteres')
+
+    # 3. Símbolos en palabras - usamos el texto original, no el normalizado
+    # porque ya hemos incluido las letras acentuadas en el patrón RE_SYMBOLS
+    if RE_SYMBOLS.search(text):
+        motivos.append('Uso de símbolos intercalados en palabras')
+
+    # 4. URLs y etiquetas HTML/JS
+    if contains_unsafe_content(text):
+        motivos.append('Posible URL o código malicioso')
+
+    # 5. Longitud
+    if not validate_length(text):
+        motivos.append('Longitud fuera de los límites permitidos')
+
+    return (len(motivos) == 0, motivos)
+
+# ------------------ PROCESAMIENTO POR LOTES ------------------
+
+class LocalVerdict(NamedTuple):
+    """Resultado del filtrado local de una pregunta."""
+    clean: bool
+    motivos: list
+    norm: str
+
+
+def is_clean_batch(texts) -> list:
+    """
+    Aplica is_clean a una lista de preguntas en una sola llamada.
+    Cada texto se normaliza una vez; el resultado incluye esa normalización
+    para que el resto del pipeline (caché, Perspective) la reutilice.
+    Retorna una lista de LocalVerdict en el mismo orden que `texts`.
+    """
+    verdicts = []
+    observe = metrics.LOCAL_FILTER_SECONDS.observe
+    for text in texts:
+        start = time.perf_counter()
+        norm = normalize_text(text)
+        clean, motivos = is_clean(text, norm)
+        observe(time.perf_counter() - start)
+        verdicts.append(LocalVerdict(clean, motivos, norm))
+    return verdicts
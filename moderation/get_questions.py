@@ -1,6 +1,8 @@
 import firebase_admin
 from firebase_admin import credentials, firestore
 import os
+import time
+from common.firestore_paging import leer_paginado
 
 def _inicializar_firebase():
     """
@@ -31,11 +33,11 @@ def _inicializar_firebase():
                 "o de ejecutar en un entorno de Google Cloud con credenciales válidas."
             )
 
-def obtener_preguntas_aprobadas() -> dict:
+def obtener_preguntas_aprobadas(timeout: float = 30.0) -> dict:
     """
-    Lee todos los documentos de la colección 'questions' en Firestore
-    y devuelve un diccionario { name: question } solo para aquellos
-    cuyo campo 'status' sea 'approved'.
+    Lee de la colección 'questions' en Firestore los documentos cuyo campo
+    'status' sea 'approved' y devuelve un diccionario { name: question }.
+    El filtro se aplica en el servidor y solo se descargan name y question.
 
     Retorna:
         dict: claves = name, valores = question de preguntas aprobadas.
@@ -44,18 +46,22 @@ def obtener_preguntas_aprobadas() -> dict:
     _inicializar_firebase()
     db = firestore.client()
 
-    preguntas_ref = db.collection('questions')
-    docs = preguntas_ref.stream()
+    preguntas_ref = (
+        db.collection('questions')
+        .where('status', '==', 'approved')
+        .select(['name', 'question'])
+    )
 
+    inicio = time.monotonic()
     aprobadas = {}
-    for doc in docs:
+    for doc in leer_paginado(preguntas_ref, timeout, operacion='approved_page'):
         data = doc.to_dict() or {}
-        if data.get('status') == 'approved':
-            nombre = data.get('name')
-            pregunta = data.get('question')
-            # Solo añadimos si ambos campos existen
-            if nombre is not None and pregunta is not None:
-                aprobadas[nombre] = pregunta
+        nombre = data.get('name')
+        pregunta = data.get('question')
+        # Solo añadimos si ambos campos existen
+        if nombre is not None and pregunta is not None:
+            aprobadas[nombre] = pregunta
+    print(f"Lectura de preguntas aprobadas completada en {time.monotonic() - inicio:.2f}s")
 
     return aprobadas
 
@@ -0,0 +1,63 @@
+import unicodedata
+
+# ------------------ NORMALIZACIÓN EN UNA PASADA ------------------
+
+# Caracteres cuya minúscula depende del contexto (sigma final griega); si
+# aparecen, se usa la normalización completa para no cambiar el resultado
+_CONTEXT_SENSITIVE = frozenset('Σ')
+
+# Límite de caracteres distintos que se recuerdan en la tabla
+_MAX_CACHED_CHARS = 20000
+
+
+def _legacy_normalize(text: str) -> str:
+    """Normalización por pasos (NFKC, control, minúsculas, acentos, espacios)."""
+    text = unicodedata.normalize('NFKC', text)
+    text = ''.join(ch for ch in text if unicodedata.category(ch) not in ('Cf', 'Cc'))
+    text = text.lower()
+    text = ''.join(ch for ch in unicodedata.normalize('NFD', text) if unicodedata.category(ch) != 'Mn')
+    return text.strip()
+
+
+def _normalize_char(ch: str):
+    """
+    Resultado de los pasos 2-4 de normalize_text para un carácter ya en NFKC,
+    en el formato de str.translate (None = eliminar).
+    """
+    if unicodedata.category(ch) in ('Cf', 'Cc'):
+        return None
+    return ''.join(c for c in unicodedata.normalize('NFD', ch.lower()) if unicodedata.category(c) != 'Mn')
+
+
+class _CharTable(dict):
+    """Tabla para str.translate que calcula y recuerda cada carácter la primera vez."""
+
+    def __missing__(self, codepoint):
+        value = _normalize_char(chr(codepoint))
+        if len(self) < _MAX_CACHED_CHARS:
+            self[codepoint] = value
+        return value
+
+
+# Precalculada para ASCII, Latin-1 y Latin extendido (lo que se ve en español);
+# el resto se va añadiendo según aparece
+_TABLE = _CharTable()
+for _cp in range(0x250):
+    _TABLE[_cp]
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normaliza el texto:
+      1. Unicode NFKC (solo si hay caracteres no ASCII)
+      2. Elimina caracteres invisibles y de control
+      3. Minúsculas
+      4. Quita acentos
+      5. Recorta espacios
+    Los pasos 2-4 se hacen en una sola pasada con str.translate.
+    """
+    if not text.isascii():
+        text = unicodedata.normalize('NFKC', text)
+        if not _CONTEXT_SENSITIVE.isdisjoint(text):
+            return _legacy_normalize(text)
+    return text.translate(_TABLE).strip()
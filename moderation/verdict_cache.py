@@ -0,0 +1,57 @@
+import os
+import json
+import hashlib
+from common.sqlite_cache import SQLiteCache
+
+# ------------------ CONFIGURACIÓN ------------------
+
+# Entradas máximas en memoria y en disco
+VERDICT_CACHE_MAX_ENTRIES = int(os.getenv('VERDICT_CACHE_MAX_ENTRIES', '10000'))
+# Vida de un veredicto en segundos (por defecto, una semana)
+VERDICT_CACHE_TTL = float(os.getenv('VERDICT_CACHE_TTL', str(7 * 24 * 3600)))
+# Fichero SQLite para conservar la caché entre ejecuciones; vacío = solo memoria
+VERDICT_CACHE_PATH = os.getenv(
+    'VERDICT_CACHE_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'verdict_cache.sqlite3')
+)
+
+# ------------------ UTILIDADES ------------------
+
+def config_fingerprint(*parts) -> str:
+    """
+    Huella de la configuración que determina un veredicto. Si cambia (otra
+    BLACKLIST, otro umbral...), los veredictos guardados dejan de ser válidos.
+    """
+    canonical = json.dumps(
+        [sorted(p) if isinstance(p, (set, frozenset)) else p for p in parts],
+        ensure_ascii=False, sort_keys=True,
+    )
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def text_key(normalized_text: str) -> str:
+    """Clave de caché para un texto ya pasado por normalize_text."""
+    return hashlib.sha256(' '.join(normalized_text.split()).encode('utf-8')).hexdigest()
+
+# ------------------ CACHÉ ------------------
+
+class VerdictCache(SQLiteCache):
+    """
+    Caché LRU con caducidad de veredictos de moderación, indexada por el hash
+    del texto normalizado (ver common.sqlite_cache). Los veredictos se
+    guardan como JSON.
+    """
+
+    def __init__(self, fingerprint: str, path: str = VERDICT_CACHE_PATH,
+                 max_entries: int = VERDICT_CACHE_MAX_ENTRIES, ttl: float = VERDICT_CACHE_TTL):
+        super().__init__(path, 'verdicts', max_entries, ttl=ttl, fingerprint=fingerprint,
+                         label='caché de veredictos')
+
+    def get(self, key: str):
+        """Devuelve el veredicto guardado para la clave, o None."""
+        value = super().get(key)
+        return None if value is None else json.loads(value)
+
+    def put(self, key: str, verdict: dict):
+        """Guarda un veredicto (un dict serializable en JSON)."""
+        super().put(key, json.dumps(verdict, ensure_ascii=False))
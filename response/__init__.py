@@ -0,0 +1,6 @@
+"""
+Respuestas a las preguntas aprobadas con Ollama y entrega al PC del
+espectáculo.
+
+Se ejecuta desde la raíz del proyecto: ``python -m response.ollama_response``.
+"""
@@ -0,0 +1,93 @@
+import os
+import re
+import json
+import hashlib
+import unicodedata
+from common.sqlite_cache import SQLiteCache
+
+# ——— Configuración ———
+
+# Respuestas máximas en memoria y en disco
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "5000"))
+# Fichero SQLite para conservar la caché entre ejecuciones; vacío = solo memoria
+ANSWER_CACHE_PATH = os.getenv(
+    "ANSWER_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "answer_cache.sqlite3")
+)
+
+# Marca que sustituye al nombre de quien preguntó en las respuestas guardadas,
+# para poder reutilizarlas cuando otra persona hace la misma pregunta
+MARCA_NOMBRE = "{{nombre}}"
+# Versión del formato de las respuestas guardadas; entra en la clave, así que
+# subirla deja sin usar (y acaban saliendo por LRU) las guardadas con otro formato
+FORMATO_RESPUESTAS = 2
+
+# Entradilla con la que la respuesta se dirige a quien preguntó: signos de
+# apertura y, opcionalmente, un saludo ("Hola, Ana: ..."). El nombre solo se
+# busca justo detrás; ver plantilla
+_ENTRADILLA = r"^[\s¡¿\"'«(]*(?:(?:hola|buenas|buenos días|buenas tardes|buenas noches)[\s,]+)?"
+
+# ——— Claves ———
+
+def normalizar_pregunta(pregunta: str) -> str:
+    """Minúsculas, sin acentos, sin signos de puntuación y con los espacios colapsados."""
+    texto = unicodedata.normalize("NFKD", pregunta.lower())
+    texto = "".join(ch for ch in texto if unicodedata.category(ch) != "Mn")
+    return " ".join(re.findall(r"\w+", texto))
+
+
+def answer_key(pregunta: str, *contexto) -> str:
+    """
+    Clave de una respuesta: la pregunta normalizada más todo lo que determina
+    la respuesta (versión del documento, modelo, instrucciones...). Si cambia
+    cualquiera de ellos la clave es otra, así que editar el documento invalida
+    las respuestas anteriores sin tener que borrarlas.
+    """
+    canonical = json.dumps([FORMATO_RESPUESTAS, normalizar_pregunta(pregunta), *contexto], ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _patron_nombre(nombre: str):
+    return re.compile(rf"{_ENTRADILLA}({re.escape(nombre)})(?!\w)", re.IGNORECASE)
+
+
+def plantilla(respuesta: str, nombre: str) -> str:
+    """
+    Sustituye por MARCA_NOMBRE el nombre de quien preguntó, solo donde la
+    respuesta se dirige a esa persona: al principio ("Ana ha preguntado, ...")
+    o tras un saludo. El resto no se toca, porque un nombre que también es
+    palabra corriente (Luz, Rosa, Victoria...) puede formar parte de la
+    respuesta. Si no aparece ahí, la respuesta se guarda tal cual.
+    """
+    nombre = nombre.strip()
+    if not nombre:
+        return respuesta
+    encontrado = _patron_nombre(nombre).search(respuesta)
+    if encontrado is None:
+        return respuesta
+    return respuesta[:encontrado.start(1)] + MARCA_NOMBRE + respuesta[encontrado.end(1):]
+
+
+def rellenar(respuesta: str, nombre: str) -> str:
+    """Inverso de plantilla: pone el nombre de quien pregunta ahora."""
+    return respuesta.replace(MARCA_NOMBRE, nombre)
+
+# ——— Caché ———
+
+class AnswerCache(SQLiteCache):
+    """
+    Caché LRU de respuestas de Ollama (ver common.sqlite_cache). Se guardan
+    sin el nombre de quien preguntó, con MARCA_NOMBRE en su lugar.
+    """
+
+    def __init__(self, path: str = ANSWER_CACHE_PATH, max_entries: int = ANSWER_CACHE_MAX_ENTRIES):
+        super().__init__(path, 'answers', max_entries, label='caché de respuestas')
+
+    def get(self, key: str, nombre: str):
+        """Devuelve la respuesta guardada, dirigida a nombre, o None."""
+        respuesta = super().get(key)
+        return None if respuesta is None else rellenar(respuesta, nombre)
+
+    def put(self, key: str, respuesta: str, nombre: str):
+        """Guarda la respuesta que se dio a nombre, sin su nombre."""
+        super().put(key, plantilla(respuesta, nombre))
@@ -0,0 +1,319 @@
+import os
+import re
+import sys
+import json
+import math
+import mmap
+import glob
+import hashlib
+import logging
+import threading
+import unicodedata
+from contextlib import contextmanager
+from collections import Counter, defaultdict
+
+# ——— Configuración ———
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Documentos adicionales (catálogo de eventos, etc.) que se indexan junto a document.txt
+CORPUS_DIR = os.getenv("RAG_CORPUS_DIR", os.path.join(BASE_DIR, "corpus"))
+INDEX_DIR = os.getenv("RAG_INDEX_DIR", os.path.join(BASE_DIR, "index"))
+# Tamaño objetivo de cada fragmento, en caracteres
+CHUNK_CHARS = 1200
+# Parámetros estándar de BM25
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+STOPWORDS = frozenset("""
+a al algo algun alguna algunas alguno algunos ante antes como con contra cual cuales cuando de del desde
+donde durante e el ella ellas ellos en entre era es esa esas ese eso esos esta estas este esto estos fue
+ha hay la las le les lo los mas me mi mis muy nada ni no nos o os otra otro para pero poco por porque
+que quien se ser si sin sobre son su sus tambien te tiene tienen tu un una unas uno unos y ya yo
+""".split())
+
+# Palabras interrogativas y de cortesía: no dicen nada sobre el tema de la pregunta
+PALABRAS_PREGUNTA = frozenset("""
+cual cuanto cuanta cuantos cuantas puedo puede pueden hola gracias saber quiero gustaria
+""".split())
+
+# Terminaciones que se quitan para comparar raíces (de más larga a más corta)
+SUFIJOS = (
+    "aciones", "iciones", "amiento", "imiento", "amente", "acion", "icion", "mente",
+    "ables", "ibles", "able", "ible", "ando", "iendo", "ados", "idos", "adas", "idas",
+    "ado", "ido", "ada", "ida", "ar", "er", "ir", "es", "os", "as", "s", "o", "a", "e",
+)
+# Longitud mínima de una raíz: las palabras cortas se dejan tal cual
+MIN_RAIZ = 4
+
+# ——— Tokenización y fragmentado ———
+
+def tokenizar(texto: str) -> list:
+    """Minúsculas, sin acentos ni palabras vacías."""
+    texto = unicodedata.normalize("NFD", texto.lower())
+    texto = "".join(ch for ch in texto if unicodedata.category(ch) != "Mn")
+    return [t for t in re.findall(r"\w+", texto) if len(t) > 1 and t not in STOPWORDS]
+
+
+def raiz(termino: str) -> str:
+    """
+    Raíz aproximada de un término ya tokenizado: quita la primera terminación
+    de SUFIJOS que deje al menos MIN_RAIZ caracteres ("alquilar" y "alquiler"
+    dan "alquil"). No resuelve sinónimos ("aforo" / "capacidad").
+    """
+    for sufijo in SUFIJOS:
+        if termino.endswith(sufijo) and len(termino) - len(sufijo) >= MIN_RAIZ:
+            return termino[:-len(sufijo)]
+    return termino
+
+
+def fragmentar(texto: str, max_chars: int = CHUNK_CHARS) -> list:
+    """
+    Divide el texto en fragmentos de hasta max_chars caracteres respetando los
+    párrafos; un párrafo demasiado largo se corta por frases.
+    """
+    piezas = []
+    for parrafo in re.split(r"\n\s*\n", texto):
+        parrafo = parrafo.strip()
+        if not parrafo:
+            continue
+        if len(parrafo) <= max_chars:
+            piezas.append(parrafo)
+        else:
+            piezas.extend(f for f in re.split(r"(?<=[.!?])\s+", parrafo) if f)
+
+    fragmentos, actual = [], ""
+    for pieza in piezas:
+        if actual and len(actual) + len(pieza) + 2 > max_chars:
+            fragmentos.append(actual)
+            actual = pieza
+        else:
+            actual = f"{actual}\n\n{pieza}" if actual else pieza
+    if actual:
+        fragmentos.append(actual)
+    return fragmentos
+
+# ——— Índice ———
+
+def fuentes_corpus(doc_path: str) -> list:
+    """El documento principal más los .txt de CORPUS_DIR, en orden estable."""
+    return [doc_path] + sorted(glob.glob(os.path.join(CORPUS_DIR, "*.txt")))
+
+
+def huella_fuentes(paths: list) -> str:
+    """Hash del contenido de las fuentes; cambia si se edita cualquiera."""
+    h = hashlib.sha256()
+    for path in paths:
+        h.update(os.path.basename(path).encode("utf-8"))
+        with open(path, "rb") as f:
+            h.update(hashlib.sha256(f.read()).digest())
+    return h.hexdigest()
+
+
+def construir_indice(paths: list, index_dir: str = INDEX_DIR) -> "ChunkIndex":
+    """
+    Fragmenta las fuentes y guarda en index_dir:
+      - chunks.bin: los textos de los fragmentos, concatenados en UTF-8
+      - index.json: desplazamientos, longitudes y listas invertidas de BM25
+    """
+    os.makedirs(index_dir, exist_ok=True)
+    offsets, longitudes, postings = [], [], defaultdict(list)
+
+    tmp_chunks = os.path.join(index_dir, "chunks.bin.tmp")
+    with open(tmp_chunks, "wb") as out:
+        for path in paths:
+            with open(path, encoding="utf-8") as f:
+                texto = f.read()
+            for fragmento in fragmentar(texto):
+                chunk_id = len(offsets)
+                data = fragmento.encode("utf-8")
+                offsets.append([out.tell(), len(data)])
+                out.write(data)
+
+                tokens = tokenizar(fragmento)
+                longitudes.append(len(tokens))
+                for termino, tf in Counter(tokens).items():
+                    postings[termino].append([chunk_id, tf])
+
+    meta = {
+        "fuentes": huella_fuentes(paths),
+        "offsets": offsets,
+        "longitudes": longitudes,
+        "postings": postings,
+    }
+    tmp_index = os.path.join(index_dir, "index.json.tmp")
+    with open(tmp_index, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+    os.replace(tmp_chunks, os.path.join(index_dir, "chunks.bin"))
+    os.replace(tmp_index, os.path.join(index_dir, "index.json"))
+    logging.info(f"Índice construido: {len(offsets)} fragmentos, {len(postings)} términos")
+    return ChunkIndex(index_dir)
+
+
+class ChunkIndex:
+    """
+    Índice BM25 persistido en disco. Los textos de los fragmentos se leen
+    bajo demanda de un fichero mapeado en memoria, así que solo las listas
+    invertidas ocupan RAM aunque el corpus tenga cientos de páginas.
+    """
+
+    def __init__(self, index_dir: str = INDEX_DIR):
+        with open(os.path.join(index_dir, "index.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        self.fuentes = meta["fuentes"]
+        self._offsets = meta["offsets"]
+        self._longitudes = meta["longitudes"]
+        self._postings = meta["postings"]
+        self._media = (sum(self._longitudes) / len(self._longitudes)) if self._longitudes else 0.0
+        self._raices = frozenset(raiz(t) for t in self._postings)
+
+        self._file = open(os.path.join(index_dir, "chunks.bin"), "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._chunks = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+        # Lecturas en curso (ver usar_indice): close() espera a que terminen
+        self._lock = threading.Lock()
+        self._lectores = 0
+        self._cerrar = False
+
+    def close(self):
+        """
+        Libera el mmap y el fichero de chunks.bin. Si hay lecturas en curso,
+        lo hace la última al terminar.
+        """
+        with self._lock:
+            self._cerrar = True
+            if not self._lectores:
+                self._liberar()
+
+    def _adquirir(self):
+        with self._lock:
+            if self._cerrar:
+                raise ValueError("Índice cerrado")
+            self._lectores += 1
+
+    def _soltar(self):
+        with self._lock:
+            self._lectores -= 1
+            if self._cerrar and not self._lectores:
+                self._liberar()
+
+    def _liberar(self):
+        if isinstance(self._chunks, mmap.mmap):
+            self._chunks.close()
+        self._file.close()
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def fragmento(self, chunk_id: int) -> str:
+        inicio, longitud = self._offsets[chunk_id]
+        return self._chunks[inicio:inicio + longitud].decode("utf-8")
+
+    def puntuar(self, consulta: str) -> dict:
+        """Puntuación BM25 de cada fragmento que comparte algún término con la consulta."""
+        n = len(self._offsets)
+        scores = defaultdict(float)
+        for termino in set(tokenizar(consulta)):
+            postings = self._postings.get(termino)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for chunk_id, tf in postings:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self._longitudes[chunk_id] / self._media)
+                scores[chunk_id] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+        return scores
+
+    def cobertura(self, consulta: str) -> float:
+        """
+        Fracción de los términos de la consulta cuya raíz aparece en algún
+        fragmento (1.0 si la consulta no tiene términos con contenido).
+        """
+        raices = {raiz(t) for t in tokenizar(consulta) if t not in PALABRAS_PREGUNTA}
+        if not raices:
+            return 1.0
+        return sum(1 for r in raices if r in self._raices) / len(raices)
+
+    def buscar(self, consulta: str, k: int = 4) -> list:
+        """Los k fragmentos más relevantes como [(score, texto)], de mayor a menor."""
+        scores = self.puntuar(consulta)
+        mejores = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(score, self.fragmento(chunk_id)) for chunk_id, score in mejores]
+
+
+_huellas = {}
+_huellas_lock = threading.Lock()
+
+
+def huella_corpus(doc_path: str) -> str:
+    """
+    Huella del corpus de doc_path (ver huella_fuentes). Mientras las fuentes
+    no cambien de tamaño ni de fecha se reutiliza sin volver a leerlas.
+    """
+    paths = fuentes_corpus(doc_path)
+    firma = tuple((p, os.stat(p).st_mtime_ns, os.stat(p).st_size) for p in paths)
+    with _huellas_lock:
+        cached = _huellas.get(doc_path)
+        if cached is None or cached[0] != firma:
+            cached = _huellas[doc_path] = (firma, huella_fuentes(paths))
+    return cached[1]
+
+
+_indice = None
+_indice_lock = threading.Lock()
+
+
+def _indice_actual(doc_path: str, index_dir: str) -> ChunkIndex:
+    """Carga o reconstruye el índice si hace falta. Llamar con _indice_lock."""
+    global _indice
+    huella = huella_corpus(doc_path)
+    if _indice is not None and _indice.fuentes == huella:
+        return _indice
+
+    paths = fuentes_corpus(doc_path)
+    try:
+        indice = ChunkIndex(index_dir)
+        if indice.fuentes != huella:
+            indice.close()
+            indice = construir_indice(paths, index_dir)
+    except (OSError, ValueError, KeyError):
+        indice = construir_indice(paths, index_dir)
+
+    # El índice anterior ya no se usa: fuera su mmap y su fichero, que con
+    # os.replace apunta a un chunks.bin borrado que seguiría ocupando disco
+    anterior, _indice = _indice, indice
+    if anterior is not None:
+        anterior.close()
+    return _indice
+
+
+def obtener_indice(doc_path: str, index_dir: str = INDEX_DIR) -> ChunkIndex:
+    """
+    Devuelve el índice del proceso para el corpus de doc_path, cargándolo de
+    disco o reconstruyéndolo si alguna fuente ha cambiado desde que se creó.
+    Si otro hilo lo reemplaza, el devuelto se cierra; para leer fragmentos
+    usar usar_indice.
+    """
+    with _indice_lock:
+        return _indice_actual(doc_path, index_dir)
+
+
+@contextmanager
+def usar_indice(doc_path: str, index_dir: str = INDEX_DIR):
+    """Como obtener_indice, pero el índice no se cierra hasta salir del bloque."""
+    with _indice_lock:
+        indice = _indice_actual(doc_path, index_dir)
+        indice._adquirir()
+    try:
+        yield indice
+    finally:
+        indice._soltar()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    doc_path = os.path.join(BASE_DIR, "document.txt")
+    indice = construir_indice(fuentes_corpus(doc_path))
+    if len(sys.argv) > 1:
+        for score, texto in indice.buscar(" ".join(sys.argv[1:])):
+            print(f"--- {score:.2f} ---\n{texto[:300]}\n")
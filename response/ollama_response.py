@@ -1,15 +1,22 @@
 import os
 import re
+import argparse
 import time
 import json
 import random
 import logging
+import threading
+from concurrent.futures import as_completed
 import requests
 import firebase_admin
 from firebase_admin import credentials, firestore
-from google.api_core.retry import Retry
-from google.api_core.exceptions import DeadlineExceeded
-import traspaso
+from common import metrics
+from common.batch_writer import BatchWriter
+from common.concurrency import ContextThreadPoolExecutor
+from common.firestore_paging import leer_paginado
+from . import traspaso
+from . import indexing
+from .answer_cache import AnswerCache, answer_key, plantilla, rellenar
 
 # ——— Configuración de logging ———
 logging.basicConfig(
@@ -18,7 +25,49 @@ logging.basicConfig(
     datefmt="%Y-%m-%d %H:%M:%S",
 )
 
-# ——— Inicialización de Firebase (una vez) ———
+# ——— Configuración de Ollama ———
+
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434")
+OLLAMA_MODEL = "qwen3:32b"
+# Preguntas que se envían a la vez; debe coincidir con OLLAMA_NUM_PARALLEL del servidor
+OLLAMA_NUM_PARALLEL = int(os.getenv("OLLAMA_NUM_PARALLEL", "4"))
+# Reintentos por pregunta ante errores de red, timeouts o 5xx
+OLLAMA_MAX_RETRIES = 2
+# Tiempo que Ollama mantiene el modelo (y la caché KV del prefijo) en memoria
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+# Hasta este tamaño (bytes) el corpus se envía entero, como prefijo cacheable;
+# por encima solo van los RAG_TOP_K fragmentos más relevantes de cada pregunta
+RAG_FULL_DOC_BYTES = int(os.getenv("RAG_FULL_DOC_BYTES", "8000"))
+RAG_TOP_K = int(os.getenv("RAG_TOP_K", "4"))
+# Con OLLAMA_STREAM=1 las respuestas se reciben token a token (NDJSON)
+OLLAMA_STREAM = os.getenv("OLLAMA_STREAM", "1") == "1"
+# Comprobación previa de si la pregunta se puede responder con el documento:
+#   "off"    -> se genera siempre
+#   "ollama" -> llamada de un token a ANSWERABILITY_MODEL
+#   "bm25"   -> cobertura de las raíces de la pregunta en el índice (sin llamadas).
+#               No ve sinónimos ("aforo" / "capacidad"), así que por defecto solo
+#               descarta las preguntas sin ningún término en el documento
+# Las descartadas no se marcan como respondidas: se vuelven a mirar en la siguiente pasada
+ANSWERABILITY_MODE = os.getenv("ANSWERABILITY_MODE", "off")
+ANSWERABILITY_MIN_COVERAGE = float(os.getenv("ANSWERABILITY_MIN_COVERAGE", "0.01"))
+ANSWERABILITY_MODEL = os.getenv("ANSWERABILITY_MODEL", "qwen3:1.7b")
+
+NO_EN_DOCUMENTO = "No está en el documento"
+
+SYSTEM_PROMPT = (
+    "Eres una asistente que responde preguntas SÓLO basándote en el siguiente documento. "
+    "Aunque la respuesta sea corta, no seas muy directa. "
+    "Si la respuesta no puedes obtenerla del texto, di ‘No está en el documento’. "
+    "Asegúrate de no inventarte preguntas, solo responder las que se te dan. "
+    "Además, como solo vamos a usar el texto que generes, no hace falta que lo formatees. "
+    "También, si hay algún número (100, 12, 34...) lo escribiras foneticamente (cien, doce, trenta y cuatro)"
+    "Las preguntas tienen el formato de Nombre : Pregunta. "
+    "Si la respuesta sí puedes obtenerla del texto, darás la respuesta haciendo alusión a quien la preguntó, "
+    "por ejemplo: 'Nombre ha preguntado, ¿cuántos metros cuadrados tiene el salón de actos? Pues este cuenta con doscientos metros cuadrados de superficie.' "
+    "Pero recuerda, si no la puedes sacar del documento, tu respuesta debe ser solamente 'No está en el documento' y nada más."
+)
+
+# ——— Inicialización de Firebase (una vez, al primer uso) ———
 
 def _inicializar_firebase():
     """
@@ -48,102 +97,389 @@ def _inicializar_firebase():
                 "o de ejecutar en un entorno de Google Cloud con credenciales válidas."
             )
 
-_inicializar_firebase()
-db = firestore.client()
+db = None
 
-# ——— Lectura de preguntas aprobadas con timeout ———
 
-def obtener_preguntas_aprobadas(timeout: float = 30.0) -> dict:
+def get_db():
     """
-    Lee todos los documentos de la colección 'questions' en Firestore
-    y devuelve un dict { name: question } solo para aquellos
-    cuyo campo 'status' sea 'approved'.
-    Aplica un deadline explícito al streaming.
+    Cliente de Firestore del proceso. Firebase se inicializa la primera vez
+    que se necesita, no al importar el módulo.
     """
-    preguntas_ref = db.collection('questions')
-    retry = Retry(deadline=timeout)
+    global db
+    if db is None:
+        _inicializar_firebase()
+        db = firestore.client()
+    return db
 
-    start = time.time()
-    try:
-        docs = preguntas_ref.stream(retry=retry)
-    except DeadlineExceeded:
-        raise RuntimeError(f"Timeout de {timeout}s excedido al leer preguntas de Firestore.")
-    elapsed = time.time() - start
-    logging.info(f"Lectura de preguntas completada en {elapsed:.2f}s")
+# ——— Lectura de preguntas aprobadas con timeout ———
 
+def obtener_preguntas_aprobadas(timeout: float = 30.0, solo_sin_responder: bool = False) -> dict:
+    """
+    Lee de la colección 'questions' en Firestore las preguntas cuyo campo
+    'status' sea 'approved' y devuelve un dict { doc_id: (name, question) }.
+    Con solo_sin_responder, únicamente las que aún tienen answered == False.
+    Los filtros se aplican en el servidor y solo se descargan name y question.
+    """
+    preguntas_ref = get_db().collection('questions').where('status', '==', 'approved')
+    if solo_sin_responder:
+        preguntas_ref = preguntas_ref.where('answered', '==', False)
+    preguntas_ref = preguntas_ref.select(['name', 'question'])
+
+    start = time.monotonic()
     aprobadas = {}
-    for doc in docs:
+    leidos = 0
+    for doc in leer_paginado(preguntas_ref, timeout, operacion='approved_page'):
+        leidos += 1
         data = doc.to_dict() or {}
-        if data.get('status') == 'approved':
-            nombre = data.get('name')
-            pregunta = data.get('question')
-            if nombre and pregunta:
-                aprobadas[nombre] = pregunta
+        nombre = data.get('name')
+        pregunta = data.get('question')
+        if nombre and pregunta:
+            aprobadas[doc.id] = (nombre, pregunta)
+    elapsed = time.monotonic() - start
+    logging.info(f"Lectura de preguntas completada en {elapsed:.2f}s ({leidos} documentos leídos)")
 
     logging.info(f"Preguntas aprobadas encontradas: {len(aprobadas)}")
     return aprobadas
 
+
+def guardar_respuestas(escritor: BatchWriter, respuestas: dict):
+    """
+    Encola en escritor cada respuesta ({ doc_id: respuesta }) para el documento
+    de su pregunta y la marca como respondida, para que las siguientes
+    ejecuciones incrementales la salten. Se escriben por lotes (ver BatchWriter).
+    """
+    preguntas_ref = get_db().collection('questions')
+    for doc_id, respuesta in respuestas.items():
+        escritor.update(preguntas_ref.document(doc_id), {
+            'answered': True, 'answer': respuesta, 'answered_at': firestore.SERVER_TIMESTAMP,
+        })
+
+
+def marcar_sin_responder() -> int:
+    """
+    Añade answered = False a las preguntas aprobadas antes de que existiera el
+    campo, para que el modo incremental las vea. Devuelve cuántas ha marcado.
+    """
+    aprobadas = get_db().collection('questions').where('status', '==', 'approved').select(['answered'])
+    escritor = BatchWriter(get_db(), 'answered_backfill')
+    for doc in leer_paginado(aprobadas, timeout=300.0, operacion='answered_backfill'):
+        if 'answered' not in (doc.to_dict() or {}):
+            escritor.update(doc.reference, {'answered': False})
+    escritor.flush()
+    logging.info(f"Preguntas aprobadas marcadas como sin responder: {escritor.written}")
+    return escritor.written
+
 # ——— Función para preguntar a Ollama ———
 
-def answer_question_from_doc(doc_path: str, question: str) -> str:
+_documentos = {}
+_documentos_lock = threading.Lock()
+
+
+def cargar_documento(doc_path: str) -> str:
     """
-    Envía el documento y la pregunta a Ollama y devuelve la respuesta limpia.
+    Devuelve el contenido del documento, leyéndolo del disco solo la primera
+    vez o cuando el fichero ha cambiado.
     """
-    with open(doc_path, encoding="utf-8") as f:
-        doc = f.read()
+    stat = os.stat(doc_path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    with _documentos_lock:
+        cached = _documentos.get(doc_path)
+        if cached is None or cached[0] != version:
+            with open(doc_path, encoding="utf-8") as f:
+                cached = _documentos[doc_path] = (version, f.read())
+    return cached[1]
 
-    system_prompt = (
-        "Eres una asistente que responde preguntas SÓLO basándote en el siguiente documento. "
-        "Aunque la respuesta sea corta, no seas muy directa. "
-        "Si la respuesta no puedes obtenerla del texto, di ‘No está en el documento’. "
-        "Asegúrate de no inventarte preguntas, solo responder las que se te dan. "
-        "Además, como solo vamos a usar el texto que generes, no hace falta que lo formatees. "
-        "También, si hay algún número (100, 12, 34...) lo escribiras foneticamente (cien, doce, trenta y cuatro)"
-        "Las preguntas tienen el formato de Nombre : Pregunta. "
-        "Si la respuesta sí puedes obtenerla del texto, darás la respuesta haciendo alusión a quien la preguntó, "
-        "por ejemplo: 'Nombre ha preguntado, ¿cuántos metros cuadrados tiene el salón de actos? Pues este cuenta con doscientos metros cuadrados de superficie.' "
-        "Pero recuerda, si no la puedes sacar del documento, tu respuesta debe ser solamente 'No está en el documento' y nada más."
-    )
 
+def _mensajes_prefijo(doc: str) -> list:
+    """
+    Mensajes comunes a todas las preguntas. Se construyen siempre igual para
+    que Ollama reconozca el prefijo y reutilice su caché KV en lugar de volver
+    a evaluar el documento completo en cada pregunta.
+    """
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user",   "content": f"DOCUMENTO:\n\n{doc}"},
+    ]
+
+
+def _chat(messages: list, **extra) -> dict:
     payload = {
-        "model": "qwen3:32b",
-        "messages": [
-            {"role": "system", "content": system_prompt},
-            {"role": "user",   "content": f"DOCUMENTO:\n\n{doc}"},
-            {"role": "user",   "content": f"Ahora, {question} \\no_think"}
-        ],
-        "stream": False
+        "model": OLLAMA_MODEL,
+        "messages": messages,
+        "stream": False,
+        "keep_alive": OLLAMA_KEEP_ALIVE,
+        **extra,
     }
 
-    url = "http://localhost:11434/api/chat"
+    url = f"{OLLAMA_URL}/api/chat"
     headers = {"Content-Type": "application/json"}
 
-    resp = requests.post(url, headers=headers, json=payload, timeout=600)
+    inicio = time.perf_counter()
+    resp = _session().post(url, headers=headers, json=payload, timeout=600)
     resp.raise_for_status()
     data = resp.json()
+    _registrar_metricas(payload["model"], data, time.perf_counter() - inicio)
+    return data
+
+
+def _registrar_metricas(modelo: str, data: dict, segundos: float):
+    """Anota la duración de la llamada y las estadísticas que devuelve Ollama (en ns)."""
+    metrics.OLLAMA_REQUEST_SECONDS.labels(modelo).observe(segundos)
+    if "prompt_eval_duration" in data:
+        metrics.OLLAMA_PROMPT_EVAL_SECONDS.labels(modelo).observe(data["prompt_eval_duration"] / 1e9)
+    if "eval_duration" in data:
+        metrics.OLLAMA_EVAL_SECONDS.labels(modelo).observe(data["eval_duration"] / 1e9)
+    metrics.OLLAMA_PROMPT_TOKENS.labels(modelo).inc(data.get("prompt_eval_count", 0))
+    metrics.OLLAMA_EVAL_TOKENS.labels(modelo).inc(data.get("eval_count", 0))
+
+
+class ThinkFilter:
+    """
+    Quita los bloques <think>...</think> de una respuesta que llega a trozos.
+    Solo retiene el final de un trozo cuando puede ser una etiqueta a medias.
+    """
+    ABRE, CIERRA = "<think>", "</think>"
+
+    def __init__(self):
+        self._pendiente = ""
+        self._dentro = False
+
+    def feed(self, trozo: str) -> str:
+        """Devuelve la parte visible de lo recibido hasta ahora."""
+        texto = self._pendiente + trozo
+        self._pendiente = ""
+        visible = []
+        while texto:
+            etiqueta = self.CIERRA if self._dentro else self.ABRE
+            pos = texto.find(etiqueta)
+            if pos >= 0:
+                if not self._dentro:
+                    visible.append(texto[:pos])
+                texto = texto[pos + len(etiqueta):]
+                self._dentro = not self._dentro
+                continue
+
+            corte = len(texto)
+            for n in range(min(len(etiqueta) - 1, len(texto)), 0, -1):
+                if texto.endswith(etiqueta[:n]):
+                    corte -= n
+                    break
+            if not self._dentro:
+                visible.append(texto[:corte])
+            self._pendiente = texto[corte:]
+            break
+        return "".join(visible)
+
+    def finish(self) -> str:
+        """Lo que quedaba retenido al terminar la respuesta."""
+        resto, self._pendiente = self._pendiente, ""
+        return "" if self._dentro else resto
+
+
+def _chat_stream(messages: list, on_token, **extra) -> dict:
+    """
+    Como _chat, pero consume el flujo NDJSON de Ollama y llama a on_token con
+    cada trozo de texto visible (sin <think>) en cuanto llega. Devuelve el
+    último objeto del flujo, con las estadísticas y el mensaje completo.
+    """
+    payload = {
+        "model": OLLAMA_MODEL,
+        "messages": messages,
+        "stream": True,
+        "keep_alive": OLLAMA_KEEP_ALIVE,
+        **extra,
+    }
+
+    filtro = ThinkFilter()
+    partes = []
+    final = {}
+    inicio = time.perf_counter()
+    with _session().post(f"{OLLAMA_URL}/api/chat", json=payload, timeout=600, stream=True) as resp:
+        resp.raise_for_status()
+        for linea in resp.iter_lines():
+            if not linea:
+                continue
+            data = json.loads(linea)
+            if "error" in data:
+                raise RuntimeError(f"Ollama: {data['error']}")
+            texto = filtro.feed(data.get("message", {}).get("content", ""))
+            if data.get("done"):
+                texto += filtro.finish()
+                final = data
+            if not partes:
+                texto = texto.lstrip()
+            if texto:
+                partes.append(texto)
+                on_token(texto)
+
+    _registrar_metricas(payload["model"], final, time.perf_counter() - inicio)
+    final["message"] = {"role": "assistant", "content": "".join(partes)}
+    return final
+
+
+def usar_documento_completo(doc_path: str) -> bool:
+    """True si el corpus es lo bastante pequeño para enviarlo entero en cada pregunta."""
+    total = sum(os.path.getsize(p) for p in indexing.fuentes_corpus(doc_path))
+    return total <= RAG_FULL_DOC_BYTES
+
+
+def contexto_para(doc_path: str, question: str) -> str:
+    """
+    Texto de referencia para una pregunta: el documento completo si el corpus
+    es pequeño, o los fragmentos más relevantes del índice si no lo es.
+    """
+    if usar_documento_completo(doc_path):
+        return cargar_documento(doc_path)
+    with indexing.usar_indice(doc_path) as indice:
+        fragmentos = indice.buscar(question, RAG_TOP_K)
+    return "\n\n---\n\n".join(texto for _, texto in fragmentos)
+
+
+def precalentar_documento(doc_path: str):
+    """
+    Evalúa una vez el prefijo (instrucciones + documento) con una respuesta de
+    un solo token, para que las preguntas lleguen con el modelo cargado y el
+    prefijo ya en caché. Con un corpus grande el prefijo cambia en cada
+    pregunta, así que solo se prepara el índice y se carga el modelo.
+    """
+    if usar_documento_completo(doc_path):
+        messages = _mensajes_prefijo(cargar_documento(doc_path))
+    else:
+        indice = indexing.obtener_indice(doc_path)
+        logging.info(f"Índice cargado: {len(indice)} fragmentos")
+        messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+    data = _chat(messages, options={"num_predict": 1})
+    logging.info(
+        f"Prefijo precalentado: {data.get('prompt_eval_count', '?')} tokens en "
+        f"{data.get('prompt_eval_duration', 0) / 1e6:.0f} ms"
+    )
+
+
+def es_respondible(doc_path: str, pregunta: str) -> bool:
+    """
+    Decide, sin la generación completa, si merece la pena preguntar al modelo
+    grande. Ante cualquier duda o error responde True: saltarse una pregunta
+    que sí estaba en el documento es peor que generar de más.
+    """
+    try:
+        if ANSWERABILITY_MODE == "bm25":
+            cobertura = indexing.obtener_indice(doc_path).cobertura(pregunta)
+            return cobertura >= ANSWERABILITY_MIN_COVERAGE
+        if ANSWERABILITY_MODE == "ollama":
+            messages = _mensajes_prefijo(contexto_para(doc_path, pregunta)) + [{
+                "role": "user",
+                "content": f"¿Se puede responder con el documento a esta pregunta? "
+                           f"Contesta solo SI o NO.\n\n{pregunta}",
+            }]
+            data = _chat(messages, model=ANSWERABILITY_MODEL, think=False,
+                         options={"num_predict": 1, "temperature": 0})
+            return not data["message"]["content"].strip().upper().startswith("NO")
+    except Exception as e:
+        logging.warning(f"Comprobación previa fallida, se genera igualmente: {e}")
+    return True
+
+
+def answer_question_from_doc(doc_path: str, question: str, on_token=None) -> str:
+    """
+    Envía a Ollama la pregunta junto con el documento (o sus fragmentos más
+    relevantes) y devuelve la respuesta limpia. En modo streaming, on_token
+    recibe cada trozo de la respuesta según se genera.
+    """
+    messages = _mensajes_prefijo(contexto_para(doc_path, question)) + [
+        {"role": "user", "content": f"Ahora, {question} \\no_think"}
+    ]
+    if OLLAMA_STREAM:
+        data = _chat_stream(messages, on_token or (lambda texto: None))
+    else:
+        data = _chat(messages)
+
+    # Con el prefijo en caché, prompt_eval_count solo cuenta los tokens nuevos
+    logging.info(
+        f"prompt_eval: {data.get('prompt_eval_count', '?')} tokens en "
+        f"{data.get('prompt_eval_duration', 0) / 1e6:.0f} ms"
+    )
 
     content = data["message"]["content"]
     clean = re.sub(r"<think>.*?</think>", "", content, flags=re.DOTALL).strip()
     return clean
 
-# ——— Función para filtrar y seleccionar respuestas ———
 
-def generar_resultados_final(input_path: str, output_path: str, muestras: int = 2):
+_sesiones = threading.local()
+
+
+def _session() -> requests.Session:
+    """Sesión HTTP (conexión persistente) propia de cada hilo."""
+    session = getattr(_sesiones, "session", None)
+    if session is None:
+        session = _sesiones.session = requests.Session()
+    return session
+
+
+def _es_reintentable(error: Exception) -> bool:
+    if isinstance(error, requests.HTTPError):
+        return error.response is not None and error.response.status_code >= 500
+    return isinstance(error, (requests.ConnectionError, requests.Timeout))
+
+
+def answer_with_retry(doc_path: str, question: str, on_token=None, on_attempt=None) -> str:
     """
-    Lee un archivo con resultados (formato nombre;pregunta; respuesta) y genera
-    un archivo final con solo respuestas válidas, seleccionando aleatoriamente muestras.
+    answer_question_from_doc con reintentos y backoff con jitter. on_attempt
+    se llama antes de cada intento, para descartar el texto de uno fallido.
     """
-    with open(input_path, "r", encoding="utf-8") as f:
-        lines = [l.strip() for l in f if l.strip()]
+    intento = 0
+    while True:
+        try:
+            if on_attempt is not None:
+                on_attempt(intento)
+            return answer_question_from_doc(doc_path, question, on_token)
+        except Exception as e:
+            metrics.OLLAMA_ERRORS.inc()
+            if intento >= OLLAMA_MAX_RETRIES or not _es_reintentable(e):
+                raise
+            intento += 1
+            espera = random.uniform(0, 2 ** intento)
+            logging.warning(f"Reintentando ({intento}/{OLLAMA_MAX_RETRIES}) en {espera:.1f}s: {e}")
+            time.sleep(espera)
+
+
+def clave_respuesta(doc_path: str, pregunta: str) -> str:
+    """Clave de caché de una pregunta con el corpus, modelo e instrucciones actuales."""
+    return answer_key(
+        pregunta, indexing.huella_corpus(doc_path), OLLAMA_MODEL, SYSTEM_PROMPT,
+        RAG_FULL_DOC_BYTES, RAG_TOP_K,
+    )
 
-    respondidas = [
-        l for l in lines
-        if not l.lower().startswith("no está en el documento")
-    ]
+
+def _escribir_respuesta(out_file, nombre: str, pregunta: str, respuesta: str) -> str:
+    """Añade la respuesta a resultados.txt y devuelve la línea escrita."""
+    if respuesta.lower().startswith(NO_EN_DOCUMENTO.lower()):
+        linea = f"{nombre};{pregunta}; {respuesta}"
+    else:
+        linea = f"{respuesta.rstrip('.')}."
+    out_file.write(f"{linea}\n")
+    out_file.flush()
+    return linea
+
+# ——— Función para filtrar y seleccionar respuestas ———
+
+def _es_no_respuesta(linea: str) -> bool:
+    """True para las líneas 'nombre;pregunta; No está en el documento' de _escribir_respuesta."""
+    respuesta = linea.split(";", 2)[-1].strip().lower()
+    return respuesta.startswith(NO_EN_DOCUMENTO.lower()) or linea.lower().startswith(NO_EN_DOCUMENTO.lower())
+
+
+def generar_resultados_final(lineas: list, output_path: str, muestras: int = 2) -> bool:
+    """
+    Genera el archivo final con `muestras` respuestas válidas elegidas al azar
+    entre las líneas de resultados.txt de esta pasada (no las de pasadas o
+    eventos anteriores, que ya se pudieron entregar). Devuelve False si no hay
+    ninguna y el archivo no se ha tocado.
+    """
+    respondidas = [l for l in (l.strip() for l in lineas) if l and not _es_no_respuesta(l)]
 
     if not respondidas:
-        logging.warning("No hay preguntas respondidas para incluir en resultados_final.txt.")
-        return
+        logging.warning("No hay preguntas respondidas en esta pasada para incluir en resultados_final.txt.")
+        return False
 
     seleccion = random.sample(respondidas, min(muestras, len(respondidas)))
 
@@ -152,46 +488,154 @@ def generar_resultados_final(input_path: str, output_path: str, muestras: int =
             f.write(f"{linea}\n")
 
     logging.info(f"resultados_final.txt generado con {len(seleccion)} entradas: {output_path}")
+    return True
 
 # ——— Script principal ———
 
-def main():
+def main(on_event=None, incremental: bool = True):
+    """
+    Responde las preguntas aprobadas. on_event, si se da, recibe cada paso
+    como un dict (tipos start, token, answer y error) para mostrarlo en vivo.
+
+    Cada respuesta se guarda en el documento de su pregunta (answered = True).
+    En modo incremental solo se leen las aprobadas que aún no tienen respuesta
+    y se añaden al final de resultados.txt; sin él se responden todas y se
+    reescribe el fichero.
+    """
+    emitir = on_event or (lambda evento: None)
     doc_path    = os.path.join("response", "document.txt")
     out_path    = os.path.join("response", "resultados.txt")
     final_path  = os.path.join("response", "resultados_final.txt")
 
-    preguntas_aprobadas = obtener_preguntas_aprobadas(timeout=30.0)
+    preguntas_aprobadas = obtener_preguntas_aprobadas(timeout=30.0, solo_sin_responder=incremental)
     if not preguntas_aprobadas:
-        logging.info("No se encontraron preguntas con status 'approved'.")
-        return
-
-    # Generar resultados.txt
-    with open(out_path, "w", encoding="utf-8") as out_file:
-        for nombre, pregunta in preguntas_aprobadas.items():
-            logging.info(f"Procesando pregunta de {nombre!r}...")
-            respuesta = answer_question_from_doc(doc_path, f"{nombre} : {pregunta}")
-
-            if respuesta.lower().startswith("no está en el documento"):
-                out_file.write(f"{nombre};{pregunta}; {respuesta}\n")
+        logging.info("No se encontraron preguntas con status 'approved' sin responder."
+                     if incremental else "No se encontraron preguntas con status 'approved'.")
+        return {"total": 0, "cached": 0, "generated": 0, "skipped": 0}
+
+    # Líneas escritas en resultados.txt en esta pasada; solo de ellas sale resultados_final.txt
+    lineas_pasada = []
+    # Las respuestas van a Firestore por lotes: un commit por lote lleno o cada
+    # FIRESTORE_FLUSH_INTERVAL segundos, no uno por respuesta
+    escritor = BatchWriter(get_db(), 'answers')
+
+    def registrar(out_file, respuestas: list):
+        """Escribe [(doc_id, nombre, pregunta, respuesta, cached), ...] en el fichero y en Firestore."""
+        try:
+            for doc_id, nombre, pregunta, respuesta, cached in respuestas:
+                lineas_pasada.append(_escribir_respuesta(out_file, nombre, pregunta, respuesta))
+                emitir({"type": "answer", "id": doc_id, "name": nombre, "question": pregunta,
+                        "answer": respuesta, "cached": cached})
+            guardar_respuestas(escritor, {doc_id: respuesta for doc_id, _, _, respuesta, _ in respuestas})
+        except Exception as e:
+            # Las demás respuestas y la entrega siguen; esta se repite en la próxima pasada
+            logging.error(f"No se pudieron guardar {len(respuestas)} respuestas: {e}")
+
+    cache = AnswerCache()
+    # Preguntas sin respuesta en caché, agrupadas por clave: si varias personas
+    # hacen la misma pregunta, se genera una sola vez
+    pendientes = {}
+
+    with open(out_path, "a" if incremental else "w", encoding="utf-8") as out_file:
+        desde_cache = []
+        for doc_id, (nombre, pregunta) in preguntas_aprobadas.items():
+            clave = clave_respuesta(doc_path, pregunta)
+            respuesta = cache.get(clave, nombre)
+            if respuesta is not None:
+                desde_cache.append((doc_id, nombre, pregunta, respuesta, True))
             else:
-                texto_resp = respuesta.rstrip(".")
-                out_file.write(f"{texto_resp}.\n")
-
+                pendientes.setdefault(clave, []).append((doc_id, nombre, pregunta))
+        registrar(out_file, desde_cache)
+        logging.info(f"Respuestas desde caché: {cache.hits}; preguntas a generar: {len(pendientes)}")
+
+        if pendientes:
+            try:
+                precalentar_documento(doc_path)
+            except Exception as e:
+                logging.warning(f"No se pudo precalentar el documento: {e}")
+
+        def generar(doc_id, nombre, pregunta):
+            """Devuelve la respuesta, o None si la comprobación previa la descarta."""
+            if not es_respondible(doc_path, pregunta):
+                return None
+            respuesta = answer_with_retry(
+                doc_path, f"{nombre} : {pregunta}",
+                on_token=lambda texto: emitir({"type": "token", "id": doc_id, "text": texto}),
+                on_attempt=lambda intento: emitir(
+                    {"type": "start", "id": doc_id, "name": nombre, "question": pregunta}),
+            )
+            return respuesta
+
+        # El resto se responde en paralelo y cada respuesta se escribe en
+        # cuanto llega, sin esperar a las más lentas
+        generadas = evitadas = 0
+        with ContextThreadPoolExecutor(max_workers=OLLAMA_NUM_PARALLEL) as executor:
+            futures = {
+                executor.submit(generar, *grupo[0]): clave
+                for clave, grupo in pendientes.items()
+            }
+            for future in as_completed(futures):
+                clave = futures[future]
+                doc_id, nombre, _ = pendientes[clave][0]
+                try:
+                    respuesta = future.result()
+                except Exception as e:
+                    logging.error(f"No se pudo responder la pregunta de {nombre!r}: {e}")
+                    emitir({"type": "error", "id": doc_id, "name": nombre, "error": str(e)})
+                    continue
+
+                if respuesta is None:
+                    # Sin guardar nada: sigue con answered == False y se reintenta
+                    evitadas += 1
+                    logging.info(f"Pregunta de {nombre!r} descartada por la comprobación previa")
+                    continue
+                generadas += 1
+                logging.info(f"Respuesta recibida para {nombre!r}")
+                cache.put(clave, respuesta, nombre)
+                generica = plantilla(respuesta, nombre)
+                registrar(out_file, [
+                    (otro_id, otro, pregunta, rellenar(generica, otro), otro_id != doc_id)
+                    for otro_id, otro, pregunta in pendientes[clave]
+                ])
+
+    escritor.flush()
+    if escritor.failed:
+        logging.error(f"Respuestas sin guardar en Firestore (se repetirán): {', '.join(escritor.failed)}")
+    logging.info(
+        f"Generaciones: {generadas} hechas, {evitadas} evitadas por la comprobación previa "
+        f"({ANSWERABILITY_MODE}), {cache.hits} respuestas desde caché"
+    )
+    cache.close()
     logging.info(f"Proceso completado. Resultados guardados en: {out_path}")
 
-    # Generar resultados_final.txt con 2 respuestas aleatorias
-    generar_resultados_final(out_path, final_path, muestras=2)
-
-    # Envío de archivo
-    traspaso.send_and_run(
-        ip_destino="172.16.2.251",
-        archivo_origen="response/resultados_final.txt",
-        usuario="HASSSIO",
-        clave="99779977",
-        destino_archivo="C:/Users/HASSSIO/Desktop/Asistente/ShowIA/resultados_final.txt",
-        ruta_script_remoto="C:/Users/HASSSIO/Desktop/Asistente/respuestaIA.py",
-        interpreter="python"  
-    )
+    # Generar resultados_final.txt con 2 respuestas aleatorias de esta pasada; si
+    # no hay ninguna nueva, no se vuelve a entregar nada
+    if generar_resultados_final(lineas_pasada, final_path, muestras=2):
+        traspaso.send_and_run(
+            ip_destino="172.16.2.251",
+            archivo_origen="response/resultados_final.txt",
+            usuario="HASSSIO",
+            clave="99779977",
+            destino_archivo="C:/Users/HASSSIO/Desktop/Asistente/ShowIA/resultados_final.txt",
+            ruta_script_remoto="C:/Users/HASSSIO/Desktop/Asistente/respuestaIA.py",
+            interpreter="python"
+        )
+
+    return {
+        "total": len(preguntas_aprobadas),
+        "cached": cache.hits,
+        "generated": generadas,
+        "skipped": evitadas,
+    }
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Responde con Ollama las preguntas aprobadas.")
+    parser.add_argument("--todas", action="store_true",
+                        help="responder todas las aprobadas y reescribir resultados.txt")
+    parser.add_argument("--marcar-pendientes", action="store_true",
+                        help="añadir answered=False a las aprobadas que no tienen el campo y salir")
+    args = parser.parse_args()
+    if args.marcar_pendientes:
+        marcar_sin_responder()
+    else:
+        main(incremental=not args.todas)
@@ -1,47 +1,231 @@
 import os
+import json
+import time
+import atexit
+import hashlib
+import threading
 import paramiko
-from scp import SCPClient
+from common import metrics
 
-def send_and_run(ip_destino, archivo_origen, usuario, clave,
-                 destino_archivo, ruta_script_remoto, interpreter="python3"):
+# Puerto SSH del PC del espectáculo
+SSH_PORT = int(os.getenv("TRASPASO_PORT", "22"))
+# Segundos entre paquetes keepalive para que la conexión no se cierre por inactividad
+SSH_KEEPALIVE = int(os.getenv("TRASPASO_KEEPALIVE", "30"))
+SSH_TIMEOUT = 10
+# Huella de lo último entregado a cada destino, para no volver a subir un
+# fichero que no ha cambiado aunque el proceso se reinicie; vacío = solo memoria
+TRASPASO_ESTADO_PATH = os.getenv(
+    "TRASPASO_ESTADO_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "traspaso_estado.json")
+)
+
+
+def safe_decode(raw_bytes):
+    """Decodifica la salida remota con fallback."""
+    try:
+        return raw_bytes.decode('utf-8')
+    except UnicodeDecodeError:
+        try:
+            # Prueba con otra codificación típica en Windows
+            return raw_bytes.decode('cp1252')
+        except UnicodeDecodeError:
+            # Finalmente, reemplaza los bytes no decodificables
+            return raw_bytes.decode('utf-8', errors='replace')
+
+
+def _sha256(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+class ConexionSSH:
     """
-    Envía un archivo con SCP y luego ejecuta un script remoto,
-    decodificando la salida con manejo de errores.
+    Conexión SSH persistente a un equipo, con su canal SFTP. Se abre la
+    primera vez que se usa y se vuelve a abrir sola si el transporte se ha
+    caído, así que cada envío se ahorra el handshake y la autenticación.
     """
-    cliente_ssh = None
-    try:
-        cliente_ssh = paramiko.SSHClient()
-        cliente_ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        cliente_ssh.connect(ip_destino, username=usuario, password=clave)
-        print(f"[+] Conectado a {ip_destino}")
-
-        # 1) Transferencia SCP
-        with SCPClient(cliente_ssh.get_transport()) as scp:
-            scp.put(archivo_origen, remote_path=destino_archivo, recursive=True)
-        print(f"[+] Archivo enviado a {destino_archivo}")
-
-        # 2) Ejecución del script
-        comando = f'{interpreter} "{ruta_script_remoto}"'
-        stdin, stdout, stderr = cliente_ssh.exec_command(comando)
-
-        # Leer bytes crudos
-        raw_out = stdout.read()
-        raw_err = stderr.read()
-
-        # Función helper para decodificar con fallback
-        def safe_decode(raw_bytes):
+
+    def __init__(self, host, usuario, clave, puerto=SSH_PORT):
+        self.host = host
+        self.usuario = usuario
+        self.clave = clave
+        self.puerto = puerto
+        self._cliente = None
+        self._sftp = None
+        self._lock = threading.Lock()
+
+    def _conectar(self):
+        self.cerrar()
+        cliente = paramiko.SSHClient()
+        cliente.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        cliente.connect(self.host, port=self.puerto, username=self.usuario, password=self.clave,
+                        timeout=SSH_TIMEOUT, look_for_keys=False, allow_agent=False)
+        cliente.get_transport().set_keepalive(SSH_KEEPALIVE)
+        self._cliente = cliente
+        print(f"[+] Conectado a {self.host}:{self.puerto}")
+
+    def _activa(self):
+        transporte = self._cliente.get_transport() if self._cliente else None
+        return transporte is not None and transporte.is_active()
+
+    def cliente(self):
+        """SSHClient conectado (reconecta si hace falta)."""
+        if not self._activa():
+            self._conectar()
+        return self._cliente
+
+    def sftp(self):
+        """Canal SFTP persistente sobre la conexión."""
+        if not self._activa():
+            self._conectar()
+        if self._sftp is None or self._sftp.get_channel().closed:
+            self._sftp = self._cliente.open_sftp()
+        return self._sftp
+
+    def subir(self, origen, destino):
+        """
+        Sube el fichero a un temporal y lo renombra sobre el destino, para que
+        el equipo remoto nunca lea un fichero a medio escribir.
+        """
+        sftp = self.sftp()
+        temporal = f"{destino}.tmp"
+        sftp.put(origen, temporal)
+        try:
+            sftp.posix_rename(temporal, destino)
+        except IOError:
+            # Servidores sin la extensión posix-rename
             try:
-                return raw_bytes.decode('utf-8')
-            except UnicodeDecodeError:
+                sftp.remove(destino)
+            except IOError:
+                pass
+            sftp.rename(temporal, destino)
+
+    def ejecutar(self, comando):
+        """Ejecuta el comando y devuelve (salida, errores) ya decodificados."""
+        stdin, stdout, stderr = self.cliente().exec_command(comando)
+        return safe_decode(stdout.read()).strip(), safe_decode(stderr.read()).strip()
+
+    def tamano_remoto(self, destino):
+        """Tamaño del fichero remoto, o None si no existe."""
+        try:
+            return self.sftp().stat(destino).st_size
+        except FileNotFoundError:
+            return None
+
+    def entregar(self, origen, destino, comando, tamano_entregado=None):
+        """
+        Sube el fichero y ejecuta el comando, si lo hay; devuelve (subido,
+        salida, errores). Con tamano_entregado (el contenido ya se entregó
+        antes) solo se sube si el remoto no tiene ese tamaño, p.ej. porque lo
+        han borrado. Si la conexión se había caído entre envíos, reconecta y
+        lo intenta una vez más.
+        """
+        with self._lock:
+            for intento in (1, 2):
                 try:
-                    # Prueba con otra codificación típica en Windows
-                    return raw_bytes.decode('cp1252')
-                except UnicodeDecodeError:
-                    # Finalmente, reemplaza los bytes no decodificables
-                    return raw_bytes.decode('utf-8', errors='replace')
+                    subir = tamano_entregado is None or self.tamano_remoto(destino) != tamano_entregado
+                    if subir:
+                        self.subir(origen, destino)
+                        print(f"[+] Archivo enviado a {destino}")
+                    else:
+                        print(f"[*] {origen} no ha cambiado; no se vuelve a subir")
+                    salida, errores = self.ejecutar(comando) if comando else ("", "")
+                    return subir, salida, errores
+                except (paramiko.SSHException, EOFError, OSError) as e:
+                    self.cerrar()
+                    if intento == 2:
+                        raise
+                    print(f"[*] Conexión perdida ({e}); reconectando")
+
+    def cerrar(self):
+        if self._sftp is not None:
+            self._sftp.close()
+            self._sftp = None
+        if self._cliente is not None:
+            self._cliente.close()
+            self._cliente = None
+
+
+_conexiones = {}
+_conexiones_lock = threading.Lock()
+# "host:puerto:destino" -> hash del último contenido entregado (se carga de
+# TRASPASO_ESTADO_PATH la primera vez que se usa)
+_entregados = None
+_entregados_lock = threading.Lock()
+
+
+def _huella_entregada(clave_envio):
+    global _entregados
+    with _entregados_lock:
+        if _entregados is None:
+            _entregados = {}
+            if TRASPASO_ESTADO_PATH and os.path.exists(TRASPASO_ESTADO_PATH):
+                try:
+                    with open(TRASPASO_ESTADO_PATH, encoding="utf-8") as f:
+                        _entregados = json.load(f)
+                except (OSError, ValueError) as e:
+                    print(f"[*] Estado de entregas ilegible ({e}); se vuelve a subir todo")
+        return _entregados.get(clave_envio)
+
+
+def _anotar_entrega(clave_envio, huella):
+    with _entregados_lock:
+        _entregados[clave_envio] = huella
+        if not TRASPASO_ESTADO_PATH:
+            return
+        temporal = f"{TRASPASO_ESTADO_PATH}.tmp"
+        try:
+            with open(temporal, "w", encoding="utf-8") as f:
+                json.dump(_entregados, f)
+            os.replace(temporal, TRASPASO_ESTADO_PATH)
+        except OSError as e:
+            print(f"[*] No se pudo guardar el estado de entregas: {e}")
+
+
+def obtener_conexion(host, usuario, clave, puerto=SSH_PORT):
+    """Conexión compartida del proceso para (host, puerto, usuario)."""
+    with _conexiones_lock:
+        clave_pool = (host, puerto, usuario)
+        conexion = _conexiones.get(clave_pool)
+        if conexion is None or conexion.clave != clave:
+            conexion = _conexiones[clave_pool] = ConexionSSH(host, usuario, clave, puerto)
+        return conexion
+
+
+@atexit.register
+def cerrar_conexiones():
+    with _conexiones_lock:
+        for conexion in _conexiones.values():
+            conexion.cerrar()
+        _conexiones.clear()
+
+
+def send_and_run(ip_destino, archivo_origen, usuario, clave,
+                 destino_archivo, ruta_script_remoto, interpreter="python3",
+                 puerto=SSH_PORT, forzar=False, ejecutar=True):
+    """
+    Envía un archivo por SFTP y luego ejecuta un script remoto, decodificando
+    la salida con manejo de errores. Reutiliza la conexión de envíos
+    anteriores. Si el contenido no ha cambiado desde el último envío (y sigue
+    en el destino), solo se salta la subida, salvo con forzar; el script se
+    ejecuta igualmente, salvo con ejecutar=False. Devuelve True si ha ido bien.
+    """
+    inicio = time.perf_counter()
+    try:
+        huella = _sha256(archivo_origen)
+        clave_envio = f"{ip_destino}:{puerto}:{destino_archivo}"
+        conexion = obtener_conexion(ip_destino, usuario, clave, puerto)
+        entregado = not forzar and _huella_entregada(clave_envio) == huella
+        tamano_entregado = os.path.getsize(archivo_origen) if entregado else None
 
-        salida = safe_decode(raw_out).strip()
-        errores = safe_decode(raw_err).strip()
+        # 1) Transferencia SFTP y 2) ejecución del script, sobre la misma conexión
+        comando = f'{interpreter} "{ruta_script_remoto}"' if ejecutar else None
+        subido, salida, errores = conexion.entregar(
+            archivo_origen, destino_archivo, comando, tamano_entregado=tamano_entregado)
+        if subido:
+            _anotar_entrega(clave_envio, huella)
+        metrics.DELIVERY_SECONDS.observe(time.perf_counter() - inicio)
+        metrics.DELIVERIES.labels('sent' if subido else 'unchanged').inc()
 
         if salida:
             print("=== Salida del script ===")
@@ -49,13 +233,12 @@ def send_and_run(ip_destino, archivo_origen, usuario, clave,
         if errores:
             print("=== Errores del script ===")
             print(errores)
+        return True
 
     except Exception as e:
         print(f"[ERROR] {e}")
-    finally:
-        if cliente_ssh:
-            cliente_ssh.close()
-            print("[*] Conexión SSH cerrada")
+        metrics.DELIVERIES.labels('error').inc()
+        return False
 
 
 if __name__ == "__main__":
@@ -74,5 +257,6 @@ if __name__ == "__main__":
         clave=clave,
         destino_archivo=destino_archivo,
         ruta_script_remoto=ruta_script_remoto,
-        interpreter="python"   # ó "python3", según tu entorno remoto
+        interpreter="python",  # ó "python3", según tu entorno remoto
+        forzar=True,
     )
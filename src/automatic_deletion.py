@@ -1,7 +1,16 @@
 import firebase_admin
 from firebase_admin import credentials
 from firebase_admin import firestore
+import os
+import signal
+import threading
 import time # Importar la librería time para pausas si es necesario
+from datetime import datetime, timedelta, timezone
+
+# Script suelto, no un paquete (src/ es el código del frontend): se ejecuta
+# por ruta desde la raíz, `python src/automatic_deletion.py`, e importa a sus vecinos por nombre
+from deletion_engine import DELETION_PAGE_SIZE, delete_query
+from export_engine import EXPORT_BEFORE_DELETE, export_and_delete
 
 # --- Configuración ---
 # Inicializa Firebase Admin SDK.
@@ -25,49 +34,97 @@ except ValueError as e:
 db = firestore.client()
 collection_ref = db.collection('questions')
 
+# --- Retención ---
+# Segundos entre ciclos de borrado
+RETENTION_INTERVAL = float(os.getenv('RETENTION_INTERVAL', '3600'))
+# Antigüedad (en horas, según 'timestamp') a partir de la cual se borra
+# cualquier pregunta. Debe cubrir de sobra la duración de un espectáculo.
+RETENTION_MAX_AGE_HOURS = float(os.getenv('RETENTION_MAX_AGE_HOURS', '12'))
+# Estados terminales (separados por comas) que se borran antes, pasadas
+# RETENTION_TERMINAL_AGE_HOURS. Vacío para desactivarlo. Esta consulta
+# (status + rango en timestamp) necesita un índice compuesto en 'questions':
+# status ASC, timestamp ASC.
+RETENTION_TERMINAL_STATES = [
+    s.strip() for s in os.getenv('RETENTION_TERMINAL_STATES', 'rejected').split(',') if s.strip()
+]
+RETENTION_TERMINAL_AGE_HOURS = float(os.getenv('RETENTION_TERMINAL_AGE_HOURS', '1'))
+
 # --- Función para borrar todos los documentos ---
-def delete_collection(coll_ref, batch_size=10):
+def delete_collection(coll_ref, page_size=DELETION_PAGE_SIZE):
     """
-    Borra todos los documentos de una colección en lotes.
-    Eliminar en lotes es más eficiente y reduce el riesgo de agotar la memoria.
+    Borra todos los documentos de una colección con el motor de borrado
+    masivo: recorre los ids con un cursor (sin volver a leer desde el
+    principio) y los borra con un BulkWriter con varios lotes en paralelo.
     """
-    deletes_count = 0
     print(f"Iniciando borrado de la colección: {coll_ref.id}")
+    stats = delete_query(db, coll_ref, page_size)
+    print(f"Borrado completado. Total de documentos borrados: {stats['deleted']}.")
+    return stats
 
-    while True:
-        # Obtiene un lote de documentos
-        docs = coll_ref.limit(batch_size).stream()
-
-        # Verifica si hay documentos para borrar
-        deleted = 0
-        batch = db.batch()
-        for doc in docs:
-            print(f'Borrando documento {doc.id}')
-            batch.delete(doc.reference)
-            deleted += 1
-            deletes_count += 1
 
-        if deleted == 0:
-            # No hay más documentos para borrar
-            break
-
-        # Confirma el lote de borrado
-        batch.commit()
-        print(f"Lote de {deleted} documentos borrado.")
+def delete_expired(coll_ref, now=None, page_size=DELETION_PAGE_SIZE):
+    """
+    Borra solo las preguntas caducadas: las de más de RETENTION_MAX_AGE_HOURS
+    y, si hay estados terminales configurados, las de esos estados con más de
+    RETENTION_TERMINAL_AGE_HOURS. Son consultas de rango sobre 'timestamp',
+    así que solo se leen los documentos caducados. Salvo que
+    EXPORT_BEFORE_DELETE esté desactivado, se exportan antes de borrarlos.
+    Devuelve cuántos se han borrado.
+    """
+    now = now or datetime.now(timezone.utc)
+    queries = [
+        ("expired", coll_ref.where('timestamp', '<', now - timedelta(hours=RETENTION_MAX_AGE_HOURS))),
+    ]
+    if RETENTION_TERMINAL_STATES and RETENTION_TERMINAL_AGE_HOURS < RETENTION_MAX_AGE_HOURS:
+        cutoff = now - timedelta(hours=RETENTION_TERMINAL_AGE_HOURS)
+        queries.append((
+            "terminal",
+            coll_ref.where('status', 'in', RETENTION_TERMINAL_STATES).where('timestamp', '<', cutoff),
+        ))
 
-        # Es una buena práctica hacer una pequeña pausa entre lotes grandes
-        # time.sleep(0.1)
+    deleted = 0
+    for label, query in queries:
+        print(f"Borrando preguntas caducadas ({label})...")
+        if EXPORT_BEFORE_DELETE:
+            stats = export_and_delete(db, query, f"{coll_ref.id}-{label}",
+                                      page_size=page_size, order_field='timestamp')
+        else:
+            stats = delete_query(db, query, page_size, order_field='timestamp')
+        deleted += stats['deleted']
+    return deleted
 
-    print(f"Borrado completado. Total de documentos borrados: {deletes_count}.")
 
+# --- Lógica principal: borrado periódico por retención ---
+def run_retention(stop_event, coll_ref=None, interval=RETENTION_INTERVAL):
+    """
+    Ejecuta delete_expired cada `interval` segundos hasta que se active
+    stop_event. Los ciclos van anclados al instante de arranque (inicio + k ·
+    interval), así que la duración de cada borrado no acumula deriva; si un
+    ciclo se alarga más que el intervalo, se saltan los ciclos perdidos en
+    vez de encadenarlos.
+    """
+    coll_ref = coll_ref or collection_ref
+    start = time.monotonic()
+    cycle = 0
+    while not stop_event.is_set():
+        print("Iniciando ciclo de borrado por retención...")
+        try:
+            deleted = delete_expired(coll_ref)
+            print(f"Ciclo completado. Preguntas caducadas borradas: {deleted}.")
+        except Exception as e:
+            print(f"Error durante el ciclo de borrado: {e}")
 
-# --- Lógica principal para borrar cada hora ---
+        elapsed = time.monotonic() - start
+        cycle = max(cycle + 1, int(elapsed // interval) + 1)
+        wait = start + cycle * interval - time.monotonic()
+        print(f"Próximo ciclo en {wait:.0f}s.")
+        stop_event.wait(max(wait, 0))
+    print("Borrado automático detenido.")
 
 
 if __name__ == "__main__":
-    while True:
-        print("Iniciando ciclo de borrado horario...")
-        delete_collection(collection_ref)
-        print("Esperando 1 hora para el próximo ciclo...")
-        time.sleep(3600) # Espera 3600 segundos (1 hora)
-
+    stop = threading.Event()
+    # Ctrl+C o SIGTERM detienen el bucle sin esperar al siguiente ciclo
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    run_retention(stop)
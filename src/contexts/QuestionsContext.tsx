@@ -101,6 +101,8 @@ export const QuestionsProvider = ({ children }: { children: ReactNode }) => {
     await updateDoc(ref, {
       status,
       processedAt: Timestamp.now(),
+      // Las aprobadas quedan pendientes de respuesta para ollama_response.py
+      ...(status === "approved" ? { answered: false } : {}),
     });
     const statusMessage = {
       approved: "Pregunta aprobada",
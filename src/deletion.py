@@ -4,12 +4,18 @@ from firebase_admin import credentials
 from firebase_admin import firestore
 import sys
 
-try:
-    # Usa una credencial de servicio para autenticar si no estás en un entorno de Google Cloud
-    # Si estás en un entorno como Cloud Functions o Compute Engine, Application Default Credentials
-    # se manejarán automáticamente.
-    # Si ejecutas esto localmente, necesitas descargar un archivo JSON de credenciales
-    # desde la configuración de tu proyecto de Firebase/Google Cloud y apuntar a él:
+# Script suelto, no un paquete (src/ es el código del frontend): se ejecuta
+# por ruta desde la raíz, `python src/deletion.py`, e importa a sus vecinos por nombre
+from deletion_engine import DELETION_PAGE_SIZE, delete_query
+from export_engine import EXPORT_BEFORE_DELETE, export_and_delete
+
+
+def get_db():
+    """
+    Inicializa Firebase (si no lo está ya) y devuelve el cliente de Firestore.
+    Si ejecutas esto localmente, necesitas descargar un archivo JSON de credenciales
+    desde la configuración de tu proyecto de Firebase/Google Cloud y apuntar a él.
+    """
     try:
         # Intenta inicializar la app, pero si ya está inicializada, captura la excepción
         cred = credentials.Certificate("src/cred.json")
@@ -17,67 +23,46 @@ try:
     except ValueError:
         # La app ya está inicializada o hay otro problema
         pass
+    return firestore.client()
 
-    # Obtén una referencia a la base de datos
-    db = firestore.client()
-
-    def delete_collection(coll_ref, batch_size):
-        """
-        Borra documentos en lotes de una colección dada.
-        Recibe una referencia a la colección y el tamaño del lote.
-        """
-        # Lee un lote de documentos
-        docs = coll_ref.limit(batch_size).stream()
-
-        deleted = 0
-        # Itera sobre los documentos en el lote
-        for doc in docs:
-            print(f"Borrando documento {doc.id}")
-            # Borra el documento actual
-            doc.reference.delete()
-            deleted = deleted + 1
-
-        # Si borramos tantos documentos como el tamaño del lote,
-        # significa que probablemente hay más y llamamos a la función recursivamente.
-        if deleted >= batch_size:
-            print(f"Borrados {deleted} documentos en este lote. Buscando más...")
-            return delete_collection(coll_ref, batch_size)
-        else:
-            print(f"Borrados {deleted} documentos en el último lote. Colección vacía o completamente borrada.")
-            return deleted
-
-    # --- Uso de la función para borrar la colección "questions" ---
-
-    # Obtén una referencia a la colección "questions"
-    questions_ref = db.collection("questions")
-
-    # Define el tamaño del lote (ej. 100 o 500)
-    batch_size = 10
-
-    print(f"Iniciando borrado de la colección 'questions' en lotes de {batch_size}...")
 
-    # Llama a la función para iniciar el borrado
-    total_deleted = delete_collection(questions_ref, batch_size)
+def delete_collection(coll_ref, page_size=DELETION_PAGE_SIZE):
+    """
+    Borra todos los documentos de una colección dada con el motor de borrado
+    masivo (páginas con cursor y BulkWriter). Salvo que EXPORT_BEFORE_DELETE
+    esté desactivado, cada página se exporta a disco antes de borrarla.
+    Devuelve cuántos se han borrado.
+    """
+    if EXPORT_BEFORE_DELETE:
+        stats = export_and_delete(get_db(), coll_ref, coll_ref.id, page_size=page_size)
+    else:
+        stats = delete_query(get_db(), coll_ref, page_size)
+    if stats['failed']:
+        raise RuntimeError(f"No se pudieron borrar {stats['failed']} documentos")
+    return stats['deleted']
 
-    print(f"Proceso de borrado de la colección 'questions' completado. Total de documentos eliminados: {total_deleted}")
-    sys.exit(0)
-    
-except Exception as e:
-    print(f"Error durante el proceso de borrado: {str(e)}", file=sys.stderr)
-    sys.exit(1)
 
-# Esta función permite ejecutar el script desde JavaScript
+# Esta función permite ejecutar el borrado desde otro módulo
 def run_deletion():
     try:
-        # Obtén una referencia a la colección "questions"
-        questions_ref = db.collection("questions")
-        batch_size = 10
-        total_deleted = delete_collection(questions_ref, batch_size)
+        questions_ref = get_db().collection("questions")
+        total_deleted = delete_collection(questions_ref)
         return {"success": True, "deleted": total_deleted}
     except Exception as e:
         return {"success": False, "error": str(e)}
 
-# Si este archivo se importa como un módulo, esta función estará disponible
+
 if __name__ == "__main__":
-    # Si se ejecuta directamente como script, el código ya se ha ejecutado arriba
-    pass
+    try:
+        # Obtén una referencia a la colección "questions"
+        questions_ref = get_db().collection("questions")
+
+        print("Iniciando borrado de la colección 'questions'...")
+        total_deleted = delete_collection(questions_ref)
+
+        print(f"Proceso de borrado de la colección 'questions' completado. Total de documentos eliminados: {total_deleted}")
+        sys.exit(0)
+
+    except Exception as e:
+        print(f"Error durante el proceso de borrado: {str(e)}", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,115 @@
+import os
+import time
+import threading
+from google.cloud.firestore_v1.bulk_writer import BulkRetry, BulkWriterOptions, SendMode
+from google.cloud.firestore_v1.field_path import FieldPath
+
+# --- Configuración ---
+# Documentos por página al recorrer la consulta (solo se leen los ids)
+DELETION_PAGE_SIZE = int(os.getenv('DELETION_PAGE_SIZE', '500'))
+# Operaciones por lote del BulkWriter (Firestore admite hasta 500)
+DELETION_BATCH_SIZE = int(os.getenv('DELETION_BATCH_SIZE', '500'))
+# Ritmo inicial y máximo de borrados por segundo; el BulkWriter sube desde el
+# inicial hasta el máximo y se frena solo cuando Firestore devuelve throttling
+DELETION_INITIAL_OPS = int(os.getenv('DELETION_INITIAL_OPS', '2000'))
+DELETION_MAX_OPS = int(os.getenv('DELETION_MAX_OPS', '10000'))
+# Reintentos por documento ante errores transitorios
+DELETION_MAX_ATTEMPTS = 8
+
+# Códigos gRPC transitorios: DEADLINE_EXCEEDED, RESOURCE_EXHAUSTED, ABORTED,
+# INTERNAL, UNAVAILABLE
+RETRYABLE_CODES = {4, 8, 10, 13, 14}
+
+
+def iter_pages(query, page_size=DELETION_PAGE_SIZE, order_field=None, start_after=None):
+    """
+    Recorre la consulta por páginas ordenadas por id de documento (o por
+    order_field y luego id, obligatorio si la consulta filtra por rango sobre
+    ese campo), cada una a continuación del último documento de la anterior.
+    No vuelve a leer desde el principio aunque los ya vistos se hayan borrado.
+    start_after permite empezar tras un cursor guardado ({campo: valor}).
+    """
+    if order_field is not None:
+        query = query.order_by(order_field)
+    query = query.order_by(FieldPath.document_id()).limit(page_size)
+    last = start_after
+    while True:
+        page = query if last is None else query.start_after(last)
+        docs = list(page.stream())
+        if docs:
+            yield docs
+        if len(docs) < page_size:
+            return
+        last = docs[-1]
+
+
+def bulk_delete(db, refs, progress_every=DELETION_PAGE_SIZE):
+    """
+    Borra las referencias dadas (cualquier iterable) con un BulkWriter que
+    mantiene varios lotes en vuelo a la vez. Los errores transitorios se
+    reintentan con backoff exponencial. Devuelve un dict con deleted, failed,
+    seconds y per_second.
+    """
+    writer = db.bulk_writer(options=BulkWriterOptions(
+        initial_ops_per_second=DELETION_INITIAL_OPS,
+        max_ops_per_second=DELETION_MAX_OPS,
+        mode=SendMode.parallel,
+        retry=BulkRetry.exponential,
+    ))
+    writer.batch_size = DELETION_BATCH_SIZE
+
+    lock = threading.Lock()
+    stats = {'deleted': 0, 'failed': 0}
+
+    def on_success(reference, result, bulk_writer):
+        with lock:
+            stats['deleted'] += 1
+
+    def on_error(error, bulk_writer):
+        if error.code in RETRYABLE_CODES and error.attempts < DELETION_MAX_ATTEMPTS:
+            return True
+        with lock:
+            stats['failed'] += 1
+        print(f"No se pudo borrar {error.operation.reference.id}: {error.message}")
+        return False
+
+    writer.on_write_result(on_success)
+    writer.on_write_error(on_error)
+
+    start = time.monotonic()
+    queued = 0
+    try:
+        for ref in refs:
+            writer.delete(ref)
+            queued += 1
+            if queued % progress_every == 0:
+                elapsed = time.monotonic() - start
+                print(f"Encolados {queued} borrados; confirmados {stats['deleted']} "
+                      f"({stats['deleted'] / elapsed:.0f} docs/s)")
+    finally:
+        # Aunque el iterable falle, se completan los borrados ya encolados.
+        # flush antes de close: close() rechaza los reintentos que aún queden pendientes
+        writer.flush()
+        writer.close()
+
+    elapsed = time.monotonic() - start
+    stats['seconds'] = elapsed
+    stats['per_second'] = stats['deleted'] / elapsed if elapsed > 0 else 0.0
+    return stats
+
+
+def delete_query(db, query, page_size=DELETION_PAGE_SIZE, order_field=None):
+    """
+    Borra todos los documentos que devuelve la consulta. Solo descarga los
+    ids (y order_field, que el cursor necesita) y los borra según se leen.
+    """
+    fields = [order_field] if order_field is not None else []
+    refs = (
+        doc.reference
+        for page in iter_pages(query.select(fields), page_size, order_field)
+        for doc in page
+    )
+    stats = bulk_delete(db, refs, progress_every=page_size)
+    print(f"Borrados {stats['deleted']} documentos en {stats['seconds']:.1f}s "
+          f"({stats['per_second']:.0f} docs/s); fallidos: {stats['failed']}")
+    return stats
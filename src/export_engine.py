@@ -0,0 +1,144 @@
+import os
+import gzip
+import json
+import time
+import base64
+from datetime import datetime
+
+from deletion_engine import DELETION_PAGE_SIZE, bulk_delete, iter_pages
+
+# --- Configuración ---
+# Carpeta donde se guardan los archivos exportados y sus checkpoints
+EXPORT_DIR = os.getenv('EXPORT_DIR', 'exports')
+# Los scripts de borrado exportan antes de borrar salvo que se ponga a 0
+EXPORT_BEFORE_DELETE = os.getenv('EXPORT_BEFORE_DELETE', '1') != '0'
+
+
+def _to_json(value):
+    """Convierte los tipos de Firestore que json no sabe serializar."""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode('ascii')
+    if hasattr(value, 'path'):  # DocumentReference
+        return value.path
+    if hasattr(value, 'latitude'):  # GeoPoint
+        return {'latitude': value.latitude, 'longitude': value.longitude}
+    return str(value)
+
+
+def _encode_cursor(value):
+    if isinstance(value, datetime):
+        return {'datetime': value.isoformat()}
+    return {'value': value}
+
+
+def _decode_cursor(encoded):
+    if 'datetime' in encoded:
+        return datetime.fromisoformat(encoded['datetime'])
+    return encoded['value']
+
+
+def _write_atomic(path, data):
+    """Escribe el JSON en un temporal, lo sincroniza y lo renombra encima."""
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def checkpoint_path(name, export_dir=EXPORT_DIR):
+    return os.path.join(export_dir, f"{name}.checkpoint.json")
+
+
+def export_pages(query, name, export_dir=EXPORT_DIR, page_size=DELETION_PAGE_SIZE, order_field=None):
+    """
+    Exporta la consulta a un archivo JSONL comprimido con gzip, página a
+    página, y va devolviendo cada página solo cuando ya está en disco: cada
+    página se escribe como un miembro gzip completo y se hace fsync antes de
+    guardar el checkpoint (último cursor, documentos exportados y tamaño del
+    archivo). En memoria solo hay una página, sea cual sea el tamaño de la
+    colección.
+
+    Si existe un checkpoint de una exportación interrumpida con el mismo
+    nombre, continúa en el mismo archivo desde el último cursor (recortando
+    lo que se hubiera escrito después). Al terminar se borra el checkpoint.
+    Una consulta con order_field debe ordenarse también así para reanudar.
+    """
+    os.makedirs(export_dir, exist_ok=True)
+    ckpt_path = checkpoint_path(name, export_dir)
+    if os.path.exists(ckpt_path):
+        with open(ckpt_path, encoding='utf-8') as f:
+            ckpt = json.load(f)
+        print(f"Reanudando exportación en {ckpt['file']} tras {ckpt['exported']} documentos")
+    else:
+        stamp = datetime.now().strftime('%Y%m%dT%H%M%S')
+        ckpt = {
+            'file': os.path.join(export_dir, f"{name}-{stamp}.jsonl.gz"),
+            'exported': 0, 'offset': 0, 'cursor': None,
+        }
+
+    start_cursor = None
+    if ckpt['cursor'] is not None:
+        start_cursor = {'__name__': ckpt['cursor']['id']}
+        if order_field is not None:
+            start_cursor = {order_field: _decode_cursor(ckpt['cursor']['order']), **start_cursor}
+
+    with open(ckpt['file'], 'ab') as out:
+        # Lo escrito después del último checkpoint no se llegó a confirmar
+        out.truncate(ckpt['offset'])
+        for page in iter_pages(query, page_size, order_field, start_cursor):
+            lines = [
+                json.dumps({'id': doc.id, 'data': doc.to_dict() or {}}, ensure_ascii=False, default=_to_json)
+                for doc in page
+            ]
+            out.write(gzip.compress(('\n'.join(lines) + '\n').encode('utf-8')))
+            out.flush()
+            os.fsync(out.fileno())
+
+            last = page[-1]
+            ckpt['exported'] += len(page)
+            ckpt['offset'] = out.tell()
+            ckpt['cursor'] = {'id': last.id}
+            if order_field is not None:
+                ckpt['cursor']['order'] = _encode_cursor(last.get(order_field))
+            _write_atomic(ckpt_path, ckpt)
+            yield page
+
+    if os.path.exists(ckpt_path):
+        os.remove(ckpt_path)
+    if ckpt['exported'] == 0:
+        os.remove(ckpt['file'])
+        return
+    print(f"Exportados {ckpt['exported']} documentos a {ckpt['file']}")
+
+
+def export_query(query, name, export_dir=EXPORT_DIR, page_size=DELETION_PAGE_SIZE, order_field=None):
+    """Exporta la consulta sin borrar nada. Devuelve cuántos documentos se han exportado."""
+    return sum(len(page) for page in export_pages(query, name, export_dir, page_size, order_field))
+
+
+def export_and_delete(db, query, name, export_dir=EXPORT_DIR, page_size=DELETION_PAGE_SIZE, order_field=None):
+    """
+    Exporta la consulta y borra los documentos a medida que quedan guardados
+    en disco: el BulkWriter solo recibe los de páginas ya sincronizadas, así
+    que nada se borra sin estar exportado. Devuelve las estadísticas de
+    bulk_delete más exported.
+    """
+    exported = 0
+
+    def refs():
+        nonlocal exported
+        for page in export_pages(query, name, export_dir, page_size, order_field):
+            exported += len(page)
+            for doc in page:
+                yield doc.reference
+
+    start = time.monotonic()
+    stats = bulk_delete(db, refs(), progress_every=page_size)
+    stats['exported'] = exported
+    print(f"Exportados y borrados {stats['deleted']} de {exported} documentos en "
+          f"{time.monotonic() - start:.1f}s; fallidos: {stats['failed']}")
+    return stats
@@ -1,15 +1,74 @@
 import { useQuestions } from "@/contexts/QuestionsContext";
-import React from "react";
+import { useBackendConfig } from "@/contexts/BackendConfigContext";
+import { subscribeToOllamaResponses, AnswerEvent } from "@/utils/scriptRunner";
+import React, { useEffect, useState } from "react";
+
+type LiveAnswer = {
+  id: string;
+  name: string;
+  question: string;
+  text: string;
+  done: boolean;
+  error?: string;
+};
+
+// Aplica un evento del backend a la lista de respuestas en vivo
+const applyEvent = (answers: LiveAnswer[], event: AnswerEvent): LiveAnswer[] => {
+  switch (event.type) {
+    case "status":
+      // Un trabajo nuevo empieza desde cero
+      return event.status === "running" ? [] : answers;
+    case "start": {
+      const fresh = { id: event.id, name: event.name, question: event.question, text: "", done: false };
+      return answers.some(a => a.id === event.id)
+        ? answers.map(a => a.id === event.id ? fresh : a)
+        : [...answers, fresh];
+    }
+    case "token":
+      return answers.map(a => a.id === event.id ? { ...a, text: a.text + event.text } : a);
+    case "answer": {
+      const done = { id: event.id, name: event.name, question: event.question, text: event.answer, done: true };
+      return answers.some(a => a.id === event.id)
+        ? answers.map(a => a.id === event.id ? done : a)
+        : [...answers, done];
+    }
+    case "error":
+      return answers.map(a => a.id === event.id ? { ...a, done: true, error: event.error } : a);
+    default:
+      return answers;
+  }
+};
+
 const Respuestas = () => {
   const {
     questions
   } = useQuestions();
+  const { backendUrl } = useBackendConfig();
+  const [answers, setAnswers] = useState<LiveAnswer[]>([]);
+
+  useEffect(() => {
+    return subscribeToOllamaResponses(backendUrl, event => setAnswers(prev => applyEvent(prev, event)));
+  }, [backendUrl]);
+
   return <div className="min-h-screen w-full flex flex-col items-center justify-center bg-background px-2 py-8">
       <div className="w-full max-w-2xl flex flex-col items-center justify-center animate-fade-in">
         <h1 className="text-3xl font-bold text-center mb-4 text-primary">
           Preguntas de la Exposición
         </h1>
         <p className="text-center text-muted-foreground mb-8">Se irán respondiendo una por una durante la exposición.</p>
+        {answers.length > 0 && <div className="flex flex-col w-full gap-5 mb-8">
+            {answers.map(a => <div key={a.id} className="w-full px-4 py-3 bg-card border border-border rounded-xl shadow-lg flex flex-col gap-2" style={{
+          minHeight: 60
+        }}>
+                <span className="text-base sm:text-lg md:text-xl font-medium text-foreground break-words">
+                  {a.name}: {a.question}
+                </span>
+                <span className="text-sm sm:text-base text-muted-foreground break-words whitespace-pre-wrap">
+                  {a.error ? "No se pudo generar la respuesta." : a.text.trim()}
+                  {!a.done && <span className="animate-pulse">▍</span>}
+                </span>
+              </div>)}
+          </div>}
         {questions.length === 0 ? <div className="text-center text-secondary-foreground py-12">
             No hay preguntas todavía.
           </div> : <div className="flex flex-col w-full gap-5">
@@ -24,4 +83,4 @@ const Respuestas = () => {
       </div>
     </div>;
 };
-export default Respuestas;
\ No newline at end of file
+export default Respuestas;
@@ -1,18 +1,45 @@
 
-export const runModerationScript = async (backendUrl: string = 'http://localhost:5000'): Promise<{ output: string; success: boolean }> => {
-  try {
-    const resp = await fetch(`${backendUrl}/run-moderation`, {
-      method: "POST",
-      headers: {
-        "Content-Type": "application/json",
-      },
-    });
-    
-    if (!resp.ok) {
-      throw new Error(`HTTP error! status: ${resp.status}`);
+type ScriptResult = { output: string; success: boolean };
+
+type JobStatus = ScriptResult & {
+  job_id: string;
+  status: "queued" | "running" | "finished" | "failed";
+};
+
+const POLL_INTERVAL_MS = 1500;
+
+const sleep = (ms: number) => new Promise((resolve) => setTimeout(resolve, ms));
+
+// Lanza un trabajo en el backend y consulta su estado hasta que termina,
+// sin mantener abierta una única petición HTTP durante toda la ejecución
+const runBackendJob = async (backendUrl: string, endpoint: string): Promise<ScriptResult> => {
+  const resp = await fetch(`${backendUrl}/${endpoint}`, {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+    },
+  });
+
+  if (!resp.ok) {
+    throw new Error(`HTTP error! status: ${resp.status}`);
+  }
+
+  let job: JobStatus = await resp.json();
+  while (job.status === "queued" || job.status === "running") {
+    await sleep(POLL_INTERVAL_MS);
+    const poll = await fetch(`${backendUrl}/jobs/${job.job_id}`);
+    if (!poll.ok) {
+      throw new Error(`HTTP error! status: ${poll.status}`);
     }
-    
-    return await resp.json();
+    job = await poll.json();
+  }
+
+  return { output: job.output, success: job.success };
+};
+
+export const runModerationScript = async (backendUrl: string = 'http://localhost:5000'): Promise<ScriptResult> => {
+  try {
+    return await runBackendJob(backendUrl, "run-moderation");
   } catch (error) {
     console.error("Error calling moderation endpoint:", error);
     return {
@@ -22,20 +49,9 @@ export const runModerationScript = async (backendUrl: string = 'http://localhost
   }
 };
 
-export const runOllamaResponseScript = async (backendUrl: string = 'http://localhost:5000'): Promise<{ output: string; success: boolean }> => {
+export const runOllamaResponseScript = async (backendUrl: string = 'http://localhost:5000'): Promise<ScriptResult> => {
   try {
-    const resp = await fetch(`${backendUrl}/run-ollama-response`, {
-      method: "POST",
-      headers: {
-        "Content-Type": "application/json",
-      },
-    });
-    
-    if (!resp.ok) {
-      throw new Error(`HTTP error! status: ${resp.status}`);
-    }
-    
-    return await resp.json();
+    return await runBackendJob(backendUrl, "run-ollama-response");
   } catch (error) {
     console.error("Error calling ollama response endpoint:", error);
     return {
@@ -44,3 +60,27 @@ export const runOllamaResponseScript = async (backendUrl: string = 'http://local
     };
   }
 };
+
+export type AnswerEvent =
+  | { type: "start"; id: string; name: string; question: string }
+  | { type: "token"; id: string; text: string }
+  | { type: "answer"; id: string; name: string; question: string; answer: string; cached: boolean }
+  | { type: "error"; id: string; name: string; error: string }
+  | { type: "status" | "end"; job_id: string; status: JobStatus["status"]; error: string | null };
+
+// Recibe por Server-Sent Events las respuestas del último trabajo de Ollama
+// según se generan. Devuelve la función que cierra la conexión.
+export const subscribeToOllamaResponses = (
+  backendUrl: string,
+  onEvent: (event: AnswerEvent) => void
+): (() => void) => {
+  const source = new EventSource(`${backendUrl}/run-ollama-response/events`);
+  source.onmessage = (message) => {
+    try {
+      onEvent(JSON.parse(message.data));
+    } catch (error) {
+      console.error("Evento de respuestas no válido:", error);
+    }
+  };
+  return () => source.close();
+};
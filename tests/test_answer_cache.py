@@ -0,0 +1,57 @@
+"""
+Plantillas de respuestas de response/answer_cache.py: el nombre de quien
+preguntó solo se cambia donde la respuesta se dirige a esa persona.
+"""
+from response.answer_cache import MARCA_NOMBRE, AnswerCache, plantilla, rellenar
+
+
+def test_nombre_al_principio():
+    respuesta = "Ana ha preguntado, ¿hay parking? Pues sí, hay parking gratuito."
+    generica = plantilla(respuesta, "Ana")
+    assert generica.startswith(MARCA_NOMBRE + " ha preguntado")
+    assert rellenar(generica, "Luis") == "Luis ha preguntado, ¿hay parking? Pues sí, hay parking gratuito."
+
+
+def test_nombre_que_es_palabra_corriente():
+    respuesta = "Luz ha preguntado, ¿hay ventanas? Pues la sala tiene mucha luz natural y la Luz del pasillo es LED."
+    generica = plantilla(respuesta, "Luz")
+    assert generica.count(MARCA_NOMBRE) == 1
+    assert rellenar(generica, "Pedro") == (
+        "Pedro ha preguntado, ¿hay ventanas? Pues la sala tiene mucha luz natural y la Luz del pasillo es LED."
+    )
+
+
+def test_tras_saludo():
+    respuesta = "¡Hola, Rosa! El salón tiene doscientos metros cuadrados y una rosa de los vientos."
+    assert rellenar(plantilla(respuesta, "Rosa"), "Eva") == (
+        "¡Hola, Eva! El salón tiene doscientos metros cuadrados y una rosa de los vientos."
+    )
+
+
+def test_sin_entradilla_no_se_toca():
+    respuesta = "La plaza Victoria está a diez minutos."
+    assert plantilla(respuesta, "Victoria") == respuesta
+
+
+def test_cache_sirve_a_otra_persona():
+    cache = AnswerCache(path="")
+    cache.put("k", "Victoria ha preguntado por el aforo. Pues caben cien personas en la sala Victoria.", "Victoria")
+    assert cache.get("k", "Marta") == (
+        "Marta ha preguntado por el aforo. Pues caben cien personas en la sala Victoria."
+    )
+
+
+def test_cache_persistente_y_lru(tmp_path):
+    ruta = str(tmp_path / "answers.sqlite3")
+    cache = AnswerCache(path=ruta, max_entries=2)
+    cache.put("a", "Ana ha preguntado por el aforo. Cien personas.", "Ana")
+    cache.put("b", "Luis ha preguntado por el parking. Es gratuito.", "Luis")
+    assert cache.get("a", "Eva") is not None  # 'a' pasa a ser la más reciente
+    cache.put("c", "Rosa ha preguntado por el bar. Abre a las ocho.", "Rosa")
+    cache.close()
+
+    cache = AnswerCache(path=ruta, max_entries=2)
+    assert cache.get("b", "Eva") is None
+    assert cache.get("a", "Eva") == "Eva ha preguntado por el aforo. Cien personas."
+    assert cache.get("c", "Eva") == "Eva ha preguntado por el bar. Abre a las ocho."
+    cache.close()
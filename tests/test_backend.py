@@ -0,0 +1,59 @@
+"""
+Backend de administración (moderation/backend.py) sin red: captura de la
+salida de los trabajos y reinicio de la moderación continua.
+"""
+import io
+import sys
+from types import SimpleNamespace
+
+from common import metrics
+from common.concurrency import ContextThreadPoolExecutor
+from moderation import backend
+
+
+def test_vigilancia_se_reinicia_tras_un_error(monkeypatch):
+    llamadas = []
+
+    def vigilar():
+        llamadas.append(1)
+        if len(llamadas) < 3:
+            raise RuntimeError("Firestore no disponible")
+
+    monkeypatch.setattr(backend, '_motor_moderacion', lambda: SimpleNamespace(watch_pending_questions=vigilar))
+    monkeypatch.setattr(backend, 'WATCH_RESTART_BASE', 0)
+    reinicios = metrics.WATCH_RESTARTS.labels()._valor
+
+    backend._vigilar_moderacion()
+
+    assert len(llamadas) == 3
+    assert metrics.WATCH_RESTARTS.labels()._valor == reinicios + 2
+
+
+def test_importar_no_sustituye_stdout():
+    assert not isinstance(sys.stdout, backend._SalidaPorTrabajo)
+    assert not isinstance(sys.stderr, backend._SalidaPorTrabajo)
+
+
+def test_salida_de_los_hilos_del_trabajo(monkeypatch):
+    monkeypatch.setattr(sys, 'stdout', io.StringIO())
+    monkeypatch.setattr(sys, 'stderr', io.StringIO())
+    backend._instalar_captura()
+    backend._instalar_captura()  # idempotente
+    assert isinstance(sys.stdout._original, io.StringIO)
+
+    def trabajo_con_hilos(trabajo):
+        print("desde el hilo del trabajo")
+        with ContextThreadPoolExecutor(max_workers=4) as pool:
+            list(pool.map(lambda i: print(f"auxiliar {i}"), range(4)))
+        return {"ok": True}
+
+    monkeypatch.setitem(backend.TIPOS_TRABAJO, 'prueba', trabajo_con_hilos)
+    trabajo = backend.Trabajo('prueba')
+    backend._ejecutar_trabajo(trabajo)
+    print("fuera del trabajo")
+
+    salida = trabajo.salida.getvalue()
+    assert trabajo.estado == 'finished'
+    assert "desde el hilo del trabajo" in salida
+    assert all(f"auxiliar {i}" in salida for i in range(4))
+    assert "fuera del trabajo" not in salida
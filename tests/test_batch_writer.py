@@ -0,0 +1,40 @@
+"""
+BatchWriter contra el Firestore en memoria de benchmarks/fakes.py, con varios
+hilos confirmando lotes a la vez.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fakes import FakeFirestore
+from common import batch_writer
+from common.batch_writer import BatchWriter
+
+
+def test_estadisticas_con_commits_concurrentes():
+    fake = FakeFirestore(write_latency=0.001)
+    for i in range(200):
+        fake.add('questions', f'q{i:03}', {'status': 'pending'})
+    # batch_size=1: cada update confirma su propio lote desde su hilo
+    writer = BatchWriter(fake.client, 'test', batch_size=1)
+    coleccion = fake.client.collection('questions')
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        for i in range(200):
+            pool.submit(writer.update, coleccion.document(f'q{i:03}'), {'status': 'approved'})
+    writer.flush()
+
+    assert writer.written == 200
+    assert writer.commits == 200
+    assert writer.failed == []
+    assert all(d['status'] == 'approved' for d in fake.docs['questions'].values())
+
+
+def test_fallo_tras_agotar_reintentos(monkeypatch):
+    monkeypatch.setattr(batch_writer, 'FIRESTORE_BACKOFF_BASE', 0)
+    fake = FakeFirestore(write_error_rate=1.0)
+    fake.add('questions', 'q1', {'status': 'pending'})
+    writer = BatchWriter(fake.client, 'test')
+    writer.update(fake.client.collection('questions').document('q1'), {'status': 'approved'})
+    writer.flush()
+
+    assert writer.written == 0
+    assert writer.failed == ['q1']
@@ -0,0 +1,23 @@
+"""
+BlacklistMatcher: las coincidencias se informan con el término canónico de
+la lista, no con la variante l33t que comparte su forma normalizada.
+"""
+from moderation.blacklist import BlacklistMatcher
+from moderation.normalization import normalize_text
+
+
+def test_variante_leet_informa_del_termino_canonico():
+    matcher = BlacklistMatcher({'p0rn0', 'p0rno', 'porno'}, normalize_text)
+    assert matcher.find(normalize_text('esto es p0rn0')) == ['porno']
+    assert matcher.find(normalize_text('esto es porno')) == ['porno']
+
+
+def test_sin_variante_canonica_se_usa_la_de_la_lista():
+    matcher = BlacklistMatcher({'f4ll4r'}, normalize_text)
+    assert matcher.find(normalize_text('vamos a fallar')) == ['f4ll4r']
+
+
+def test_expresion_de_varias_palabras():
+    matcher = BlacklistMatcher({'hijo de puta'}, normalize_text)
+    assert matcher.find(normalize_text('eres un hij0   de puta')) == ['hijo de puta']
+    assert not matcher.search(normalize_text('hijo de putin'))
@@ -0,0 +1,106 @@
+"""
+Filtrado local de moderation/engine.py: BLACKLIST (con acentos y l33t),
+patrones y longitud.
+"""
+import pytest
+
+from moderation.engine import RE_UNSAFE, contains_unsafe_content, is_clean, is_clean_batch
+from moderation.normalization import normalize_text
+
+MOTIVO_PROHIBIDA = 'Contiene palabra o expresión prohibida'
+MOTIVO_UNSAFE = 'Posible URL o código malicioso'
+
+
+def test_texto_limpio():
+    assert is_clean('¿A qué hora empieza la charla del salón de actos?') == (True, [])
+
+
+@pytest.mark.parametrize('texto, termino', [
+    ('Esto es una mierda', 'mierda'),
+    ('¡Qué COÑO pasa aquí!', 'coño'),            # acentos y mayúsculas
+    ('qué coño', 'coño'),
+    ('menuda m1erd4 de charla', 'mierda'),       # l33t
+    ('esto es p0rn0', 'porno'),                  # variante l33t de la lista -> término canónico
+    ('eres un hijo  de   puta', 'hijo de puta'),  # expresión de varias palabras
+    ('mi\u200berda de sonido', 'mierda'),        # carácter invisible intercalado
+])
+def test_termino_prohibido(texto, termino):
+    limpio, motivos = is_clean(texto)
+    assert not limpio
+    assert f'{MOTIVO_PROHIBIDA} ({termino})' in motivos
+
+
+def test_palabra_que_contiene_un_termino():
+    # Solo palabras completas: 'disputa' no es 'puta'
+    assert is_clean('¿Hay alguna disputa sobre el horario?') == (True, [])
+
+
+@pytest.mark.parametrize('texto', [
+    '<script>alert(1)</script>',
+    '< SCRIPT src=x>',
+    'pulsa javascript:alert(1)',
+    'más info en https://ejemplo.com/charla',
+    'visita www.ejemplo.es',
+])
+def test_contenido_inseguro(texto):
+    limpio, motivos = is_clean(texto)
+    assert not limpio
+    assert MOTIVO_UNSAFE in motivos
+
+
+@pytest.mark.parametrize('texto', [
+    '¿El aforo es < 100 personas?',
+    '¿Tenéis web del evento?',
+    'http://localhost',                          # sin dominio con punto
+    'www. separado',
+    '<scripts> no es una etiqueta script',
+])
+def test_sin_contenido_inseguro(texto):
+    assert not contains_unsafe_content(texto)
+
+
+@pytest.mark.parametrize('texto, detecta', [
+    ('<script>', True),
+    ('<   script>', True),
+    ('<scripting>', False),
+    ('javascript:void(0)', True),
+    ('https://a.b', True),
+    ('www.x-y.com', True),
+    ('https://', False),
+    ('www.sinpunto', False),
+])
+def test_re_unsafe(texto, detecta):
+    assert (RE_UNSAFE.search(texto) is not None) == detecta
+
+
+def test_re_unsafe_tiempo_lineal():
+    # Sin retroceso catastrófico con muchos espacios tras '<' o un dominio enorme
+    assert RE_UNSAFE.search('<' + ' ' * 100000 + 'x') is None
+    assert RE_UNSAFE.search('http://' + 'a' * 100000) is None
+
+
+def test_otros_motivos():
+    assert 'Repetición excesiva de caracteres' in is_clean('holaaaaaa, ¿qué tal?')[1]
+    assert 'Uso de símbolos intercalados en palabras' in is_clean('eres un t#nto')[1]
+    assert 'Longitud fuera de los límites permitidos' in is_clean('ok')[1]
+    assert 'Longitud fuera de los límites permitidos' in is_clean('a' * 250 + ' ' + 'b' * 250)[1]
+
+
+def test_is_clean_batch_igual_que_is_clean():
+    textos = [
+        '¿A qué hora empieza la charla?',
+        'Esto es una mierda',
+        'menuda m1erd4',
+        'visita www.ejemplo.es',
+        'ok',
+    ]
+    veredictos = is_clean_batch(textos)
+    assert len(veredictos) == len(textos)
+    for texto, veredicto in zip(textos, veredictos):
+        assert (veredicto.clean, veredicto.motivos) == is_clean(texto)
+        assert veredicto.norm == normalize_text(texto)
+    assert [v.clean for v in veredictos] == [True, False, False, False, False]
+
+
+def test_is_clean_batch_vacio():
+    assert is_clean_batch([]) == []
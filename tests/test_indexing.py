@@ -0,0 +1,42 @@
+"""
+Ciclo de vida del índice de response/indexing.py: al reconstruirse porque
+cambia el corpus, el anterior libera su mmap y su fichero.
+"""
+import pytest
+
+from response import indexing
+
+
+@pytest.fixture
+def corpus(tmp_path, monkeypatch):
+    doc = tmp_path / "document.txt"
+    doc.write_text("El salón de actos tiene doscientos metros cuadrados.", encoding="utf-8")
+    monkeypatch.setattr(indexing, "CORPUS_DIR", str(tmp_path / "corpus"))
+    monkeypatch.setattr(indexing, "_indice", None)
+    monkeypatch.setattr(indexing, "_huellas", {})
+    yield doc
+    if indexing._indice is not None:
+        indexing._indice.close()
+
+
+def test_reemplazo_cierra_el_anterior(corpus, tmp_path):
+    index_dir = str(tmp_path / "index")
+    anterior = indexing.obtener_indice(str(corpus), index_dir)
+
+    corpus.write_text("El parking es gratuito para los asistentes.", encoding="utf-8")
+    nuevo = indexing.obtener_indice(str(corpus), index_dir)
+
+    assert nuevo is not anterior
+    assert anterior._file.closed
+    assert not nuevo._file.closed
+    assert "parking" in nuevo.buscar("parking")[0][1]
+
+
+def test_lectura_en_curso_retrasa_el_cierre(corpus, tmp_path):
+    index_dir = str(tmp_path / "index")
+    with indexing.usar_indice(str(corpus), index_dir) as indice:
+        corpus.write_text("El parking es gratuito para los asistentes.", encoding="utf-8")
+        indexing.obtener_indice(str(corpus), index_dir)
+        assert not indice._file.closed
+        assert "salón" in indice.buscar("salón")[0][1]
+    assert indice._file.closed
@@ -0,0 +1,31 @@
+"""
+normalize_text de moderation/normalization.py: la versión de una pasada con
+str.translate da lo mismo que la normalización por pasos.
+"""
+import pytest
+
+from moderation.normalization import _legacy_normalize, normalize_text
+
+
+@pytest.mark.parametrize('texto, esperado', [
+    ('  ¿Dónde está el SALÓN?  ', '¿donde esta el salon?'),
+    ('Pingüino y niño', 'pinguino y nino'),
+    ('ＡＢＣ ﬁesta', 'abc fiesta'),             # NFKC: ancho completo y ligaduras
+    ('mi\u200berda\u00ad', 'mierda'),           # invisibles (Cf) fuera
+    ('hola\x00\x07 mundo', 'hola mundo'),        # caracteres de control fuera
+    ('', ''),
+])
+def test_normalize_text(texto, esperado):
+    assert normalize_text(texto) == esperado
+
+
+@pytest.mark.parametrize('texto', [
+    'Pregunta normal sin acentos',
+    'Ça va? Ñandú, ÁRBOL, café',
+    'ΟΔΟΣ ΣΟΦΟΣ',                                # sigma final: minúscula según el contexto
+    'İstanbul',                                  # minúscula de más de un carácter
+    'emoji 😀 y 中文',
+    '\tTabulado\n',
+])
+def test_igual_que_la_normalizacion_por_pasos(texto):
+    assert normalize_text(texto) == _legacy_normalize(texto)
@@ -0,0 +1,118 @@
+"""
+send_and_run contra el servidor SSH/SFTP local de benchmarks/fakes.py: la
+subida se salta si el fichero no ha cambiado, pero el script se ejecuta.
+"""
+import os
+import paramiko
+import pytest
+
+from benchmarks.fakes import SSHStub
+from response import traspaso
+
+DESTINO = "/show/resultados_final.txt"
+SCRIPT = "/show/respuestaIA.py"
+
+
+@pytest.fixture
+def ssh(tmp_path):
+    stub = SSHStub(str(tmp_path / "remoto"), command_latency=0)
+    yield stub
+    traspaso.cerrar_conexiones()
+    stub.close()
+
+
+@pytest.fixture(autouse=True)
+def estado(tmp_path, monkeypatch):
+    ruta = tmp_path / "traspaso_estado.json"
+    monkeypatch.setattr(traspaso, "TRASPASO_ESTADO_PATH", str(ruta))
+    monkeypatch.setattr(traspaso, "_entregados", None)
+    return ruta
+
+
+@pytest.fixture
+def origen(tmp_path):
+    ruta = tmp_path / "resultados_final.txt"
+    ruta.write_text("Ana ha preguntado por el aforo.\n", encoding="utf-8")
+    return ruta
+
+
+def enviar(ssh, origen, **kwargs):
+    return traspaso.send_and_run(
+        ip_destino="127.0.0.1", archivo_origen=str(origen), usuario="u", clave="c",
+        destino_archivo=DESTINO, ruta_script_remoto=SCRIPT, puerto=ssh.port, **kwargs,
+    )
+
+
+def remoto(ssh):
+    return os.path.join(ssh.root, DESTINO.lstrip("/"))
+
+
+def test_primer_envio_sube_y_ejecuta(ssh, origen):
+    assert enviar(ssh, origen)
+    with open(remoto(ssh), encoding="utf-8") as f:
+        assert f.read() == origen.read_text(encoding="utf-8")
+    assert ssh.commands == [f'python3 "{SCRIPT}"']
+
+
+def test_sin_cambios_no_sube_pero_ejecuta(ssh, origen):
+    assert enviar(ssh, origen)
+    inodo = os.stat(remoto(ssh)).st_ino
+
+    assert enviar(ssh, origen)
+    # La subida reemplaza el fichero (temporal + rename); sin subida sigue el mismo
+    assert os.stat(remoto(ssh)).st_ino == inodo
+    assert len(ssh.commands) == 2
+
+
+def test_sin_ejecutar(ssh, origen):
+    assert enviar(ssh, origen, ejecutar=False)
+    assert os.path.exists(remoto(ssh))
+    assert ssh.commands == []
+
+
+def test_cambio_de_contenido_vuelve_a_subir(ssh, origen):
+    assert enviar(ssh, origen)
+    origen.write_text("Luis ha preguntado por el parking.\n", encoding="utf-8")
+    assert enviar(ssh, origen)
+    with open(remoto(ssh), encoding="utf-8") as f:
+        assert f.read().startswith("Luis")
+
+
+def test_estado_persiste_entre_procesos(ssh, origen, estado, monkeypatch):
+    assert enviar(ssh, origen)
+    assert estado.exists()
+    inodo = os.stat(remoto(ssh)).st_ino
+
+    # Un proceso nuevo: sin estado en memoria ni conexiones abiertas
+    monkeypatch.setattr(traspaso, "_entregados", None)
+    traspaso.cerrar_conexiones()
+    assert enviar(ssh, origen)
+    assert os.stat(remoto(ssh)).st_ino == inodo
+
+
+def test_destino_borrado_se_vuelve_a_subir(ssh, origen):
+    assert enviar(ssh, origen)
+    os.remove(remoto(ssh))
+    assert enviar(ssh, origen)
+    assert os.path.exists(remoto(ssh))
+
+
+def test_transporte_caido_al_comprobar_el_remoto(ssh, origen, monkeypatch):
+    assert enviar(ssh, origen)
+    inodo = os.stat(remoto(ssh)).st_ino
+
+    original = traspaso.ConexionSSH.tamano_remoto
+    fallos = []
+
+    def tamano_remoto(self, destino):
+        if not fallos:
+            fallos.append(destino)
+            raise paramiko.SSHException("transporte caído")
+        return original(self, destino)
+
+    monkeypatch.setattr(traspaso.ConexionSSH, "tamano_remoto", tamano_remoto)
+    # Se reconecta y reintenta dentro de entregar, sin acabar en [ERROR]
+    assert enviar(ssh, origen)
+    assert fallos
+    assert os.stat(remoto(ssh)).st_ino == inodo
+    assert len(ssh.commands) == 2
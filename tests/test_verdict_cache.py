@@ -0,0 +1,57 @@
+"""
+VerdictCache sobre common.sqlite_cache: persistencia, caducidad, huella de
+configuración y ficheros con el esquema anterior.
+"""
+import sqlite3
+import time
+
+from moderation.verdict_cache import VerdictCache
+
+VEREDICTO = {'status': 'approved', 'toxicity_score': 0.1}
+
+
+def test_persistencia_y_huella(tmp_path):
+    ruta = str(tmp_path / "verdicts.sqlite3")
+    cache = VerdictCache('v1', path=ruta)
+    cache.put('k', VEREDICTO)
+    cache.close()
+
+    cache = VerdictCache('v1', path=ruta)
+    assert cache.get('k') == VEREDICTO
+    cache.check_fingerprint('v2')  # otra BLACKLIST u otro umbral
+    assert cache.get('k') is None
+    cache.close()
+
+    assert VerdictCache('v2', path=ruta).get('k') is None
+
+
+def test_caducidad(tmp_path, monkeypatch):
+    cache = VerdictCache('v1', path=str(tmp_path / "verdicts.sqlite3"), ttl=60)
+    cache.put('k', VEREDICTO)
+    assert cache.get('k') == VEREDICTO
+    ahora = time.time()
+    monkeypatch.setattr(time, 'time', lambda: ahora + 61)
+    assert cache.get('k') is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_devuelve_copias(tmp_path):
+    cache = VerdictCache('v1', path='')
+    cache.put('k', VEREDICTO)
+    cache.get('k')['status'] = 'rejected'
+    assert cache.get('k') == VEREDICTO
+
+
+def test_fichero_con_el_esquema_anterior(tmp_path):
+    ruta = str(tmp_path / "verdicts.sqlite3")
+    db = sqlite3.connect(ruta)
+    db.execute("CREATE TABLE verdicts (key TEXT PRIMARY KEY, verdict TEXT NOT NULL,"
+               " stored_at REAL NOT NULL, used_at REAL NOT NULL)")
+    db.execute("INSERT INTO verdicts VALUES ('k', '{}', 0, 0)")
+    db.commit()
+    db.close()
+
+    cache = VerdictCache('v1', path=ruta)
+    assert cache.get('k') is None
+    cache.put('k', VEREDICTO)
+    assert cache.get('k') == VEREDICTO
@@ -0,0 +1,94 @@
+"""
+Moderación continua (watch_pending_questions) contra el Firestore en memoria
+de benchmarks/fakes.py.
+"""
+import threading
+import time
+
+import pytest
+
+from benchmarks.fakes import FakeFirestore
+from common import batch_writer, metrics
+from moderation import moderation
+from moderation.verdict_cache import VerdictCache
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    fake = FakeFirestore()
+    monkeypatch.setattr(moderation, 'db', fake.client)
+    monkeypatch.setattr(moderation, '_verdict_cache', VerdictCache('test', path=''))
+    monkeypatch.setattr(moderation, 'WATCH_RETRY_BASE', 0.05)
+    return fake
+
+
+def esperar(condicion, timeout=10.0):
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        if condicion():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_reintenta_la_moderacion_fallida(fake, monkeypatch):
+    intentos = []
+
+    def moderar(texto, cache):
+        intentos.append(texto)
+        if len(intentos) < 3:
+            raise RuntimeError("Perspective no disponible")
+        return {'status': 'approved', 'toxicity_score': 0.0}
+
+    monkeypatch.setattr(moderation, 'moderate_question', moderar)
+    parar = threading.Event()
+    hilo = threading.Thread(target=moderation.watch_pending_questions, args=(parar,), daemon=True)
+    hilo.start()
+    try:
+        fake.add('questions', 'q1', {'question': '¿Hay parking?', 'status': 'pending'})
+        assert esperar(lambda: fake.docs['questions']['q1']['status'] == 'approved')
+    finally:
+        parar.set()
+        hilo.join(timeout=10)
+    assert len(intentos) == 3
+
+
+def test_reintenta_si_falla_la_escritura_del_veredicto(fake, monkeypatch):
+    monkeypatch.setattr(batch_writer, 'FIRESTORE_BACKOFF_BASE', 0)
+    intentos = []
+
+    def moderar(texto, cache):
+        intentos.append(texto)
+        if len(intentos) >= 2:
+            fake.write_error_rate = 0.0
+        return {'status': 'approved', 'toxicity_score': 0.0}
+
+    monkeypatch.setattr(moderation, 'moderate_question', moderar)
+    fake.write_error_rate = 1.0
+    parar = threading.Event()
+    hilo = threading.Thread(target=moderation.watch_pending_questions, args=(parar,), daemon=True)
+    hilo.start()
+    try:
+        fake.add('questions', 'q1', {'question': '¿Hay parking?', 'status': 'pending'})
+        assert esperar(lambda: fake.docs['questions']['q1']['status'] == 'approved')
+    finally:
+        parar.set()
+        hilo.join(timeout=10)
+    assert len(intentos) == 2
+
+
+def test_pasada_manual_omitida_durante_la_escucha(fake, monkeypatch):
+    monkeypatch.setattr(moderation, 'process_pending_questions',
+                        lambda: pytest.fail("no debe moderar con la escucha activa"))
+    parar = threading.Event()
+    hilo = threading.Thread(target=moderation.watch_pending_questions, args=(parar,), daemon=True)
+    hilo.start()
+    try:
+        assert esperar(moderation.is_watching)
+        assert metrics.WATCH_UP.labels()._valor == 1
+        assert moderation.main()['skipped']
+    finally:
+        parar.set()
+        hilo.join(timeout=10)
+    assert not moderation.is_watching()
+    assert metrics.WATCH_UP.labels()._valor == 0